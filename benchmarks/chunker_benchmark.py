@@ -0,0 +1,163 @@
+"""
+DocumentLoader 청크 분할 처리량 측정 (MB/s)
+
+    python benchmarks/chunker_benchmark.py --size-mb 20
+
+- current: 현재 DocumentLoader._split_text (스트리밍 청크 분할)
+- legacy: 이전 구현 (섹션 추출 -> 섹션별 문장 분할 -> 청크 조립)을 그대로 옮긴 기준선
+두 구현의 청크가 같은지도 함께 확인합니다.
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from DocumentLoader import DocumentLoader
+
+class LegacyChunker:
+    def __init__(self, chunk_size: int = 1500, chunk_overlap: int = 200):
+        """이전 DocumentLoader의 청크 분할 (비교 기준선)"""
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+
+    def _extract_sections(self, text: str) -> List[Dict[str, Any]]:
+        section_patterns = [
+            r'^#{1,6}\s+(.+)$',
+            r'^([A-Z][^.!?]*):$',
+            r'^\d+\.\s+([^.!?]+)$',
+            r'^[A-Z][^.!?]*\n[-=]+$',
+        ]
+
+        lines = text.split('\n')
+        sections = []
+        current_section = {'title': '', 'content': []}
+
+        for line in lines:
+            is_header = False
+            for pattern in section_patterns:
+                if re.match(pattern, line):
+                    if current_section['content']:
+                        sections.append(current_section)
+                        current_section = {'title': '', 'content': []}
+                    current_section['title'] = line
+                    is_header = True
+                    break
+
+            if not is_header:
+                current_section['content'].append(line)
+
+        if current_section['content']:
+            sections.append(current_section)
+
+        return sections
+
+    def _split_into_sentences(self, text: str) -> List[str]:
+        sentence_endings = r'[.!?][\'")\]]* *'
+        abbreviations = r'(?<!Mr)(?<!Mrs)(?<!Dr)(?<!Prof)(?<!Sr)(?<!Jr)'
+        pattern = f'{abbreviations}{sentence_endings}'
+        sentences = re.split(pattern, text)
+        sentences = [s.strip() for s in sentences if s.strip()]
+        return sentences
+
+    def _split_text(self, text: str) -> List[str]:
+        sections = self._extract_sections(text)
+
+        chunks = []
+        current_chunk = []
+        current_length = 0
+
+        for section in sections:
+            if section['title']:
+                if current_chunk and current_length > 0:
+                    chunks.append('\n'.join(current_chunk))
+                    current_chunk = []
+                    current_length = 0
+                current_chunk.append(section['title'])
+                current_length += len(section['title'])
+
+            content_text = '\n'.join(section['content'])
+            sentences = self._split_into_sentences(content_text)
+
+            for sentence in sentences:
+                if current_length + len(sentence) > self.chunk_size:
+                    if current_chunk:
+                        chunks.append('\n'.join(current_chunk))
+                        overlap_size = 0
+                        overlap_chunk = []
+                        for s in reversed(current_chunk):
+                            if overlap_size + len(s) <= self.chunk_overlap:
+                                overlap_chunk.insert(0, s)
+                                overlap_size += len(s)
+                            else:
+                                break
+                        current_chunk = overlap_chunk
+                        current_length = sum(len(s) for s in current_chunk)
+
+                current_chunk.append(sentence)
+                current_length += len(sentence)
+
+        if current_chunk:
+            chunks.append('\n'.join(current_chunk))
+
+        return chunks
+
+def make_text(size_bytes: int, seed: int = 0) -> str:
+    """섹션 제목, 목록, 약어, 인용부호, 긴 줄이 섞인 합성 문서"""
+    rng = random.Random(seed)
+    words = ["data", "search", "vector", "index", "query", "document", "chunk", "model",
+             "검색", "문서", "임베딩", "질문", "답변", "성능", "메모리"]
+    headers = ["# Overview", "## Details", "Summary:", "1. First item", "Results:"]
+    parts = []
+    size = 0
+    while size < size_bytes:
+        roll = rng.random()
+        if roll < 0.05:
+            line = rng.choice(headers)
+        elif roll < 0.1:
+            line = ""
+        else:
+            sentences = []
+            for _ in range(rng.randint(1, 6)):
+                sentence = " ".join(rng.choice(words) for _ in range(rng.randint(4, 30)))
+                if rng.random() < 0.1:
+                    sentence = "Dr. " + sentence
+                sentences.append(sentence + rng.choice([".", "!", "?", '."', ".)"]))
+            line = " ".join(sentences)
+        parts.append(line)
+        size += len(line.encode("utf-8")) + 1
+    return "\n".join(parts)
+
+def measure(split: Callable[[str], List[str]], text: str, repeat: int) -> float:
+    """가장 빠른 실행 시간 (초)"""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        split(text)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="청크 분할 처리량 측정")
+    parser.add_argument("--size-mb", type=float, default=10.0, help="합성 문서 크기 (MB)")
+    parser.add_argument("--repeat", type=int, default=3, help="반복 횟수 (가장 빠른 값 사용)")
+    parser.add_argument("--chunk-size", type=int, default=1500)
+    parser.add_argument("--chunk-overlap", type=int, default=200)
+    args = parser.parse_args()
+
+    text = make_text(int(args.size_mb * 1024 * 1024))
+    megabytes = len(text.encode("utf-8")) / (1024 * 1024)
+    current = DocumentLoader(args.chunk_size, args.chunk_overlap)
+    legacy = LegacyChunker(args.chunk_size, args.chunk_overlap)
+
+    identical = current._split_text(text) == legacy._split_text(text)
+    print(f"텍스트 {megabytes:.1f} MB, 청크 동일 여부: {identical}")
+    for name, split in [("legacy", legacy._split_text), ("current", current._split_text)]:
+        seconds = measure(split, text, args.repeat)
+        print(f"{name:>8}: {seconds:.2f}s, {megabytes / seconds:.1f} MB/s")
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,71 @@
+import hashlib
 import os
-from typing import List, Dict, Any
+from bisect import bisect_right
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+import multiprocessing as mp
+from typing import Iterable, Iterator, List, Dict, Any, Optional, Tuple
 from PyPDF2 import PdfReader
 from docx import Document
 import re
 
+# 일반적인 섹션 헤더 패턴
+SECTION_PATTERNS = [
+    r'^#{1,6}\s+(.+)$',  # Markdown 헤더
+    r'^([A-Z][^.!?]*):$',  # 콜론으로 끝나는 대문자 시작 텍스트
+    r'^\d+\.\s+([^.!?]+)$',  # 숫자로 시작하는 목록
+    r'^[A-Z][^.!?]*\n[-=]+$',  # 밑줄로 강조된 텍스트
+]
+# 줄마다 한 번만 검사하도록 하나의 정규식으로 결합
+SECTION_REGEX = re.compile('|'.join(f'(?:{pattern})' for pattern in SECTION_PATTERNS))
+
+# 문장 종료 패턴 (약어와 특수 케이스 제외)
+# 구분자 문자를 먼저 검사하고 약어 후방 탐색은 그 뒤에 두어, 구분자가 아닌 위치는 바로 건너뜀
+# ((?<!Mr)[.!?] 와 [.!?](?<!Mr[.!?]) 는 같은 위치에서 일치)
+SENTENCE_REGEX = re.compile(
+    r'[.!?](?<!Mr[.!?])(?<!Mrs[.!?])(?<!Dr[.!?])(?<!Prof[.!?])(?<!Sr[.!?])(?<!Jr[.!?])[\'")\]]* *'
+)
+
+# 청크가 걸쳐 있는 (첫 페이지, 마지막 페이지). 페이지 정보가 없는 문서는 None
+PageRange = Optional[Tuple[int, int]]
+
+def file_hash(file_path: str, block_size: int = 1024 * 1024) -> str:
+    """파일 내용의 SHA-256 해시 (같은 파일을 다시 처리하지 않기 위한 비교용)"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _extract_pdf_pages(file_path: str, start: int, end: int) -> List[str]:
+    """PDF의 [start, end) 페이지 텍스트 추출 (작업 프로세스에서 실행)"""
+    reader = PdfReader(file_path)
+    return [reader.pages[i].extract_text() for i in range(start, end)]
+
 class DocumentLoader:
-    def __init__(self, chunk_size: int = 1500, chunk_overlap: int = 200):
+    def __init__(
+        self,
+        chunk_size: int = 1500,
+        chunk_overlap: int = 200,
+        pdf_workers: Optional[int] = None,
+        parallel_min_pages: int = 64,
+        pages_per_task: int = 16
+    ):
         """
         문서 로더 초기화
         Args:
             chunk_size: 청크 크기 (문자 수, 기본값 1500자)
             chunk_overlap: 청크 간 중복 크기 (문자 수, 기본값 200자)
+            pdf_workers: PDF 텍스트 추출 프로세스 수 (None이면 CPU 수, 1이면 항상 순차 추출)
+            parallel_min_pages: 병렬 추출을 시작하는 PDF 페이지 수 (작은 파일은 프로세스 시작 비용이 더 큼)
+            pages_per_task: 작업 프로세스에 한 번에 맡길 페이지 수
         """
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
+        self.pdf_workers = pdf_workers
+        self.parallel_min_pages = parallel_min_pages
+        self.pages_per_task = pages_per_task
 
     def process_document(self, file_path: str, category: str = 'general') -> List[Dict[str, Any]]:
         """
@@ -24,17 +76,34 @@ class DocumentLoader:
         Returns:
             청크 리스트 (각 청크는 텍스트와 메타데이터를 포함)
         """
+        result = list(self.iter_chunks(file_path, category))
+        for chunk in result:
+            chunk['metadata']['total_chunks'] = len(result)
+        return result
+
+    def iter_chunks(self, file_path: str, category: str = 'general') -> Iterator[Dict[str, Any]]:
+        """
+        문서를 페이지(문단) 단위로 읽으면서 완성된 청크부터 차례로 반환
+        전체 텍스트나 전체 청크 리스트를 메모리에 만들지 않으므로 큰 문서도 메모리 사용량이 일정합니다.
+        청크 수는 끝까지 읽어야 알 수 있으므로 메타데이터에 total_chunks는 없습니다.
+        PDF 청크의 메타데이터에는 청크가 걸친 페이지 번호(page_start, page_end, 1부터)가 들어갑니다.
+        Args:
+            file_path: 문서 파일 경로
+            category: 문서 카테고리
+        Returns:
+            청크 제너레이터 (각 청크는 텍스트와 메타데이터를 포함)
+        """
         # 파일 확장자 확인
         _, ext = os.path.splitext(file_path)
         ext = ext.lower()
 
-        # 파일 타입에 따라 텍스트 추출
+        # 파일 타입에 따라 텍스트 추출기 선택
         if ext == '.pdf':
-            text = self._read_pdf(file_path)
+            pieces = self._iter_pdf(file_path)
         elif ext == '.docx':
-            text = self._read_docx(file_path)
+            pieces = self._iter_docx(file_path)
         elif ext == '.txt':
-            text = self._read_txt(file_path)
+            pieces = self._iter_txt(file_path)
         else:
             raise ValueError(f"지원하지 않는 파일 형식입니다: {ext}")
 
@@ -46,85 +115,99 @@ class DocumentLoader:
             'created_at': os.path.getctime(file_path),
             'modified_at': os.path.getmtime(file_path)
         }
+        return self._iter_document_chunks(pieces, base_metadata)
 
-        # 텍스트를 청크로 분할
-        chunks = self._split_text(text)
-        
-        # 청크에 메타데이터 추가
-        result = []
-        for i, chunk in enumerate(chunks):
+    def _iter_document_chunks(
+        self, pieces: Iterable[Tuple[str, Optional[int]]], base_metadata: Dict[str, Any]
+    ) -> Iterator[Dict[str, Any]]:
+        """텍스트 조각을 청크로 분할하고 메타데이터 추가"""
+        for i, (chunk, pages) in enumerate(self._iter_split_text(self._iter_lines(pieces))):
             metadata = base_metadata.copy()
-            metadata.update({
-                'chunk_index': i,
-                'total_chunks': len(chunks)
-            })
-            
-            result.append({
+            metadata['chunk_index'] = i
+            if pages is not None:
+                metadata['page_start'], metadata['page_end'] = pages
+            yield {
                 'content': chunk,
                 'metadata': metadata
-            })
+            }
 
-        return result
+    def _iter_pdf(self, file_path: str) -> Iterator[Tuple[str, Optional[int]]]:
+        """
+        PDF 파일에서 페이지별 텍스트 추출 (텍스트, 페이지 번호)
+        페이지가 많으면 페이지 구간을 여러 프로세스에 나눠 추출하고 페이지 순서대로 반환합니다.
+        """
+        reader = PdfReader(file_path)
+        num_pages = len(reader.pages)
+        workers = self.pdf_workers or os.cpu_count() or 1
+        if workers <= 1 or num_pages < self.parallel_min_pages:
+            for page_number, page in enumerate(reader.pages, start=1):
+                yield page.extract_text() + "\n", page_number
+            return
+
+        ranges = (
+            (start, min(start + self.pages_per_task, num_pages))
+            for start in range(0, num_pages, self.pages_per_task)
+        )
+        # 추출 결과가 메모리에 쌓이지 않도록 진행 중인 작업 수를 제한
+        with ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("spawn")) as executor:
+            in_flight = deque(
+                (start, executor.submit(_extract_pdf_pages, file_path, start, end))
+                for start, end in islice(ranges, workers * 2)
+            )
+            while in_flight:
+                start, future = in_flight.popleft()
+                texts = future.result()
+                for next_start, next_end in islice(ranges, 1):
+                    in_flight.append(
+                        (next_start, executor.submit(_extract_pdf_pages, file_path, next_start, next_end))
+                    )
+                for offset, text in enumerate(texts):
+                    yield text + "\n", start + offset + 1
+
+    def _iter_docx(self, file_path: str) -> Iterator[Tuple[str, Optional[int]]]:
+        """DOCX 파일에서 문단별 텍스트 추출 (페이지 정보 없음)"""
+        doc = Document(file_path)
+        for paragraph in doc.paragraphs:
+            yield paragraph.text + "\n", None
+
+    def _iter_txt(self, file_path: str) -> Iterator[Tuple[str, Optional[int]]]:
+        """TXT 파일에서 줄별 텍스트 추출 (페이지 정보 없음)"""
+        with open(file_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                yield line, None
 
     def _read_pdf(self, file_path: str) -> str:
         """PDF 파일에서 텍스트 추출"""
-        reader = PdfReader(file_path)
-        text = ""
-        for page in reader.pages:
-            text += page.extract_text() + "\n"
-        return text
+        return "".join(text for text, _ in self._iter_pdf(file_path))
 
     def _read_docx(self, file_path: str) -> str:
         """DOCX 파일에서 텍스트 추출"""
-        doc = Document(file_path)
-        text = ""
-        for paragraph in doc.paragraphs:
-            text += paragraph.text + "\n"
-        return text
+        return "".join(text for text, _ in self._iter_docx(file_path))
 
     def _read_txt(self, file_path: str) -> str:
         """TXT 파일에서 텍스트 추출"""
         with open(file_path, 'r', encoding='utf-8') as f:
             return f.read()
 
-    def _extract_sections(self, text: str) -> List[Dict[str, Any]]:
+    @staticmethod
+    def _iter_lines(pieces: Iterable[Tuple[str, Optional[int]]]) -> Iterator[Tuple[str, Optional[int]]]:
         """
-        텍스트에서 섹션을 추출
-        Args:
-            text: 원본 텍스트
-        Returns:
-            섹션 리스트 (각 섹션은 제목과 내용을 포함)
-        """
-        # 일반적인 섹션 헤더 패턴
-        section_patterns = [
-            r'^#{1,6}\s+(.+)$',  # Markdown 헤더
-            r'^([A-Z][^.!?]*):$',  # 콜론으로 끝나는 대문자 시작 텍스트
-            r'^\d+\.\s+([^.!?]+)$',  # 숫자로 시작하는 목록
-            r'^[A-Z][^.!?]*\n[-=]+$',  # 밑줄로 강조된 텍스트
-        ]
-        
-        lines = text.split('\n')
-        sections = []
-        current_section = {'title': '', 'content': []}
-        
-        for line in lines:
-            is_header = False
-            for pattern in section_patterns:
-                if re.match(pattern, line):
-                    if current_section['content']:
-                        sections.append(current_section)
-                        current_section = {'title': '', 'content': []}
-                    current_section['title'] = line
-                    is_header = True
-                    break
-            
-            if not is_header:
-                current_section['content'].append(line)
-        
-        if current_section['content']:
-            sections.append(current_section)
-        
-        return sections
+        (텍스트, 페이지) 조각을 (줄, 페이지) 단위로 반환
+        줄은 조각을 이어 붙인 텍스트의 split('\\n')과 같고, 페이지는 줄이 시작된 조각의 페이지입니다.
+        """
+        remainder = ""
+        remainder_page = None
+        for piece, page in pieces:
+            if not remainder:
+                remainder_page = page
+            remainder += piece
+            if "\n" in remainder:
+                lines = remainder.split("\n")
+                remainder = lines.pop()
+                for line in lines:
+                    yield line, remainder_page
+                    remainder_page = page
+        yield remainder, remainder_page
 
     def _split_into_sentences(self, text: str) -> List[str]:
         """
@@ -134,15 +217,8 @@ class DocumentLoader:
         Returns:
             문장 리스트
         """
-        # 문장 종료 패턴
-        sentence_endings = r'[.!?][\'")\]]* *'
-        
-        # 약어와 특수 케이스 처리
-        abbreviations = r'(?<!Mr)(?<!Mrs)(?<!Dr)(?<!Prof)(?<!Sr)(?<!Jr)'
-        
         # 문장 분할
-        pattern = f'{abbreviations}{sentence_endings}'
-        sentences = re.split(pattern, text)
+        sentences = SENTENCE_REGEX.split(text)
         
         # 빈 문장 제거 및 정리
         sentences = [s.strip() for s in sentences if s.strip()]
@@ -156,49 +232,159 @@ class DocumentLoader:
         Returns:
             청크 리스트
         """
-        # 1. 섹션 추출
-        sections = self._extract_sections(text)
-        
+        return [chunk for chunk, _ in self._iter_split_text((line, None) for line in text.split('\n'))]
+
+    def _iter_split_text(self, lines: Iterable[Tuple[str, Optional[int]]]) -> Iterator[Tuple[str, PageRange]]:
+        """
+        줄 단위로 읽으면서 의미 기반 청크를 완성되는 대로 반환
+        1. 섹션 제목 줄에서 섹션을 나누고, 내용이 있는 섹션의 제목은 새 청크의 첫 줄로 사용
+        2. 섹션 내용은 문장 단위로 분할 (다음 줄에 따라 달라질 수 있는 마지막 문장은 보류)
+        3. 문장을 청크 크기까지 모으고, 넘치면 마지막 일부 문장을 중복으로 남김
+        Args:
+            lines: (텍스트 줄, 페이지 번호)
+        Returns:
+            (청크, 페이지 범위) 제너레이터
+        """
+        builder = _ChunkBuilder(self.chunk_size, self.chunk_overlap)
+        title = ''
+        title_page = None
+        has_content = False
+        pending = ''  # 현재 섹션에서 아직 문장이 끝나지 않은 텍스트
+        line_starts: List[int] = []  # pending 안에서 각 줄이 시작하는 위치
+        line_pages: List[Optional[int]] = []  # 각 줄의 페이지
+        # 문장 구분자를 찾기 시작할 위치 (이미 검사한 텍스트는 다시 검사하지 않음)
+        scan_from = 0
+
+        def take_sentences(final: bool) -> List[Tuple[str, PageRange]]:
+            """
+            pending에서 끝이 확정된 문장을 꺼냄
+            final이 아니면 버퍼 끝에 닿은 구분자는 다음 텍스트에 따라 길어질 수 있으므로 보류합니다.
+            """
+            nonlocal pending, line_starts, line_pages, scan_from
+            # 구분자는 앞쪽 텍스트만 보므로(후방 탐색) 뒤에 텍스트가 붙어도 이전 검사 결과는 그대로임
+            bounds = [(match.start(), match.end()) for match in SENTENCE_REGEX.finditer(pending, scan_from)]
+            if final:
+                bounds.append((len(pending), len(pending)))
+
+            sentences = []
+            position = 0
+            scan_from = len(pending)
+            for start, end in bounds:
+                if not final and end == len(pending):
+                    scan_from = start
+                    break
+                raw = pending[position:start]
+                sentence = raw.strip()
+                if sentence:
+                    first = position + len(raw) - len(raw.lstrip())
+                    last = position + len(raw.rstrip()) - 1
+                    first_page = line_pages[bisect_right(line_starts, first) - 1]
+                    last_page = line_pages[bisect_right(line_starts, last) - 1]
+                    sentences.append((sentence, None if first_page is None else (first_page, last_page)))
+                position = end
+
+            # 처리한 부분을 버리고 줄 위치를 당김
+            if position:
+                pending = pending[position:]
+                scan_from -= position
+                keep = max(bisect_right(line_starts, position) - 1, 0)
+                line_starts = [0] + [line_start - position for line_start in line_starts[keep + 1:]]
+                line_pages = line_pages[keep:]
+            return sentences
+
+        for line, page in lines:
+            if SECTION_REGEX.match(line):
+                # 섹션 종료: 보류 중인 텍스트를 문장으로 분할
+                if has_content:
+                    for sentence, pages in take_sentences(final=True):
+                        yield from builder.add_sentence(sentence, pages)
+                    has_content = False
+                title = line
+                title_page = page
+                continue
+
+            # 내용이 있는 섹션만 제목을 청크에 포함
+            if not has_content:
+                has_content = True
+                if title:
+                    yield from builder.add_title(title, None if title_page is None else (title_page, title_page))
+                    title = ''
+                pending = line
+                line_starts = [0]
+                line_pages = [page]
+                scan_from = 0
+            else:
+                line_starts.append(len(pending) + 1)
+                line_pages.append(page)
+                pending += '\n' + line
+
+            for sentence, pages in take_sentences(final=False):
+                yield from builder.add_sentence(sentence, pages)
+
+        if has_content:
+            for sentence, pages in take_sentences(final=True):
+                yield from builder.add_sentence(sentence, pages)
+        yield from builder.finish()
+
+
+class _ChunkBuilder:
+    def __init__(self, chunk_size: int, chunk_overlap: int):
+        """
+        섹션 제목과 문장을 받아 청크 크기/중복 규칙에 맞춰 청크를 만듦
+        Args:
+            chunk_size: 청크 크기 (문자 수)
+            chunk_overlap: 청크 간 중복 크기 (문자 수)
+        """
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.current_chunk: List[str] = []
+        self.current_pages: List[PageRange] = []  # current_chunk 항목별 페이지 범위
+        self.current_length = 0
+
+    def _emit(self) -> Tuple[str, PageRange]:
+        """현재 청크와 청크가 걸친 페이지 범위"""
+        pages = [pages for pages in self.current_pages if pages is not None]
+        page_range = (min(p[0] for p in pages), max(p[1] for p in pages)) if pages else None
+        return '\n'.join(self.current_chunk), page_range
+
+    def add_title(self, title: str, pages: PageRange = None) -> List[Tuple[str, PageRange]]:
+        """섹션 제목 추가 (이전 청크를 닫고 제목으로 새 청크 시작)"""
         chunks = []
-        current_chunk = []
-        current_length = 0
-        
-        for section in sections:
-            # 섹션 제목 처리
-            if section['title']:
-                if current_chunk and current_length > 0:
-                    chunks.append('\n'.join(current_chunk))
-                    current_chunk = []
-                    current_length = 0
-                current_chunk.append(section['title'])
-                current_length += len(section['title'])
-            
-            # 섹션 내용을 문장 단위로 분할
-            content_text = '\n'.join(section['content'])
-            sentences = self._split_into_sentences(content_text)
-            
-            for sentence in sentences:
-                # 현재 청크가 너무 커지면 새 청크 시작
-                if current_length + len(sentence) > self.chunk_size:
-                    if current_chunk:
-                        chunks.append('\n'.join(current_chunk))
-                        # 중복을 위해 마지막 일부 문장 유지
-                        overlap_size = 0
-                        overlap_chunk = []
-                        for s in reversed(current_chunk):
-                            if overlap_size + len(s) <= self.chunk_overlap:
-                                overlap_chunk.insert(0, s)
-                                overlap_size += len(s)
-                            else:
-                                break
-                        current_chunk = overlap_chunk
-                        current_length = sum(len(s) for s in current_chunk)
-                
-                current_chunk.append(sentence)
-                current_length += len(sentence)
-        
-        # 마지막 청크 처리
-        if current_chunk:
-            chunks.append('\n'.join(current_chunk))
-        
-        return chunks
\ No newline at end of file
+        if self.current_chunk and self.current_length > 0:
+            chunks.append(self._emit())
+            self.current_chunk = []
+            self.current_pages = []
+            self.current_length = 0
+        self.current_chunk.append(title)
+        self.current_pages.append(pages)
+        self.current_length += len(title)
+        return chunks
+
+    def add_sentence(self, sentence: str, pages: PageRange = None) -> List[Tuple[str, PageRange]]:
+        """문장 추가 (현재 청크가 너무 커지면 닫고 새 청크 시작)"""
+        chunks = []
+        if self.current_length + len(sentence) > self.chunk_size:
+            if self.current_chunk:
+                chunks.append(self._emit())
+                # 중복을 위해 마지막 일부 문장 유지 (뒤에서부터 길이를 누적하며 남길 위치만 찾음)
+                overlap_size = 0
+                keep = len(self.current_chunk)
+                while keep > 0 and overlap_size + len(self.current_chunk[keep - 1]) <= self.chunk_overlap:
+                    keep -= 1
+                    overlap_size += len(self.current_chunk[keep])
+                self.current_chunk = self.current_chunk[keep:]
+                self.current_pages = self.current_pages[keep:]
+                self.current_length = overlap_size
+
+        self.current_chunk.append(sentence)
+        self.current_pages.append(pages)
+        self.current_length += len(sentence)
+        return chunks
+
+    def finish(self) -> List[Tuple[str, PageRange]]:
+        """마지막 청크 반환"""
+        chunks = [self._emit()] if self.current_chunk else []
+        self.current_chunk = []
+        self.current_pages = []
+        self.current_length = 0
+        return chunks
@@ -28,6 +28,13 @@ def main():
             key='current_category'
         )
         
+        # 로컬 인덱스를 쓰도록 설정했지만 준비하거나 검색하지 못한 경우 안내
+        if st.session_state.qa_system.local_index_error:
+            st.warning(
+                "로컬 검색 인덱스를 사용하지 못해 Supabase 검색을 사용합니다: "
+                f"{st.session_state.qa_system.local_index_error}"
+            )
+        
         # 카테고리 자동 감지 옵션
         auto_detect = st.checkbox("카테고리 자동 감지", value=True)
         
@@ -68,36 +75,40 @@ def main():
             st.write(question)
         
         with st.chat_message("assistant"):
-            with st.spinner("답변 생성 중..."):
-                try:
-                    # 카테고리 자동 감지 여부에 따라 카테고리 설정
-                    category = None if auto_detect else selected_category
-                    
-                    # 질문에 대한 답변 생성
-                    result = st.session_state.qa_system.ask(question, category=category)
-                    
-                    # 답변 표시
-                    st.write(result["answer"])
-                    
-                    # 참고 문서 정보 표시
-                    if result.get("documents"):
-                        st.markdown("### 참고 문서")
-                        for doc in result["documents"]:
-                            with st.expander(f"📄 {doc['title']} ({doc['similarity']})"):
-                                st.markdown(f"**섹션**: {doc['section']}")
-                                st.markdown(f"**카테고리**: {doc['category']}")
-                                st.markdown("**관련 내용 미리보기**:")
-                                st.markdown(f">{doc['preview']}")
-                    
-                    # 대화 내역에 추가
-                    st.session_state.chat_history.append({
-                        "question": question,
-                        "answer": result["answer"],
-                        "references": result.get("documents", [])
-                    })
-                    
-                except Exception as e:
-                    st.error(f"답변 생성 중 오류가 발생했습니다: {str(e)}")
+            try:
+                # 카테고리 자동 감지 여부에 따라 카테고리 설정
+                category = None if auto_detect else selected_category
+                
+                # 관련 문서 검색 (답변은 생성되는 대로 스트리밍)
+                with st.spinner("관련 문서 검색 중..."):
+                    result = st.session_state.qa_system.ask_stream(question, category=category)
+                
+                # 답변 자리를 먼저 잡아 두고, 검색된 참고 문서를 답변 생성 전에 바로 표시
+                answer_container = st.container()
+                
+                # 참고 문서 정보 표시
+                if result.get("documents"):
+                    st.markdown("### 참고 문서")
+                    for doc in result["documents"]:
+                        with st.expander(f"📄 {doc['title']} ({doc['similarity']})"):
+                            st.markdown(f"**섹션**: {doc['section']}")
+                            st.markdown(f"**카테고리**: {doc['category']}")
+                            st.markdown("**관련 내용 미리보기**:")
+                            st.markdown(f">{doc['preview']}")
+                
+                # 답변은 참고 문서 위의 자리에 생성되는 대로 표시
+                with answer_container:
+                    answer = st.write_stream(result["stream"])
+                
+                # 대화 내역에 추가
+                st.session_state.chat_history.append({
+                    "question": question,
+                    "answer": answer,
+                    "references": result.get("documents", [])
+                })
+                
+            except Exception as e:
+                st.error(f"답변 생성 중 오류가 발생했습니다: {str(e)}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,401 @@
+import json
+import math
+from collections import Counter
+from pathlib import Path
+from typing import Iterator, List, Dict, Optional, Tuple
+import numpy as np
+import pyarrow as pa
+from index_io import atomic_write, write_arrow
+
+class BM25Index:
+    def __init__(self, k1: float = 1.5, b: float = 0.75, merge_threshold: int = 1024):
+        """
+        증분 추가/삭제가 가능한 BM25 인덱스
+        포스팅은 단어 순 CSR 행렬(indptr/indices/tfs)로 저장되어, 질의 시 질의 단어의
+        포스팅만 읽습니다. 새 문서는 대기 포스팅에 쌓였다가 일정 개수마다 CSR에 병합되며,
+        문서 빈도(df)와 평균 문서 길이(avgdl)는 추가/삭제 시점에 갱신합니다.
+        Args:
+            k1: 단어 빈도 포화 파라미터
+            b: 문서 길이 정규화 파라미터
+            merge_threshold: 대기 포스팅을 CSR에 병합하는 문서 수
+        """
+        self.k1 = k1
+        self.b = b
+        self.merge_threshold = merge_threshold
+        self.vocabulary: Dict[str, int] = {}  # 단어 -> 단어 ID
+        self.df: List[int] = []  # 단어 ID -> 문서 빈도 (삭제된 문서 제외)
+        self.num_rows = 0  # 삭제된 행을 포함한 행 수
+        self.num_docs = 0
+        self.total_length = 0
+
+        # 단어 순 CSR 포스팅 (단어별 행 번호는 오름차순)
+        self._indptr = np.zeros(1, dtype=np.int64)
+        self._indices = np.empty(0, dtype=np.int64)
+        self._tfs = np.empty(0, dtype=np.float32)
+        # CSR에 아직 병합되지 않은 포스팅: 단어 ID -> (행 리스트, 빈도 리스트)
+        self._pending: Dict[int, Tuple[List[int], List[int]]] = {}
+        self._pending_docs = 0
+
+        self._doc_lengths = np.zeros(0, dtype=np.float64)
+        self._deleted = np.zeros(0, dtype=bool)
+        # 삭제 시 df 갱신을 위한 행별 단어 ID (행 순 CSR + 이후 추가된 행 리스트)
+        self._row_indptr = np.zeros(1, dtype=np.int64)
+        self._row_term_ids = np.empty(0, dtype=np.int64)
+        self._row_terms: List[np.ndarray] = []
+
+    @property
+    def avgdl(self) -> float:
+        """평균 문서 길이"""
+        return self.total_length / self.num_docs if self.num_docs else 0.0
+
+    @property
+    def doc_lengths(self) -> np.ndarray:
+        """행별 문서 길이"""
+        return self._doc_lengths[:self.num_rows]
+
+    def idf(self, df: int, num_docs: Optional[int] = None) -> float:
+        """
+        역문서 빈도 (항상 양수인 Lucene 방식)
+        Args:
+            df: 문서 빈도
+            num_docs: 전체 문서 수 (None이면 이 인덱스의 문서 수)
+        """
+        num_docs = self.num_docs if num_docs is None else num_docs
+        return math.log(1 + (num_docs - df + 0.5) / (df + 0.5))
+
+    def term_stats(self, terms: List[str]) -> Dict[str, int]:
+        """
+        단어별 문서 빈도 (이 인덱스에 있는 단어만)
+        여러 샤드의 값을 더해 전체 통계를 만들 때 사용합니다.
+        """
+        stats = {}
+        for term in set(terms):
+            term_id = self.vocabulary.get(term)
+            if term_id is not None and self.df[term_id]:
+                stats[term] = self.df[term_id]
+        return stats
+
+    def add(self, tokens: List[str]) -> int:
+        """
+        문서를 추가하고 행 번호 반환
+        """
+        row = self.num_rows
+        if row >= len(self._doc_lengths):
+            capacity = max(16, 2 * len(self._doc_lengths))
+            doc_lengths = np.zeros(capacity, dtype=np.float64)
+            doc_lengths[:row] = self._doc_lengths[:row]
+            deleted = np.zeros(capacity, dtype=bool)
+            deleted[:row] = self._deleted[:row]
+            self._doc_lengths = doc_lengths
+            self._deleted = deleted
+
+        term_ids = []
+        for term, tf in Counter(tokens).items():
+            term_id = self.vocabulary.get(term)
+            if term_id is None:
+                term_id = len(self.df)
+                self.vocabulary[term] = term_id
+                self.df.append(0)
+            self.df[term_id] += 1
+            rows, tfs = self._pending.setdefault(term_id, ([], []))
+            rows.append(row)
+            tfs.append(tf)
+            term_ids.append(term_id)
+
+        self._doc_lengths[row] = len(tokens)
+        self._row_terms.append(np.asarray(term_ids, dtype=np.int64))
+        self.num_rows += 1
+        self.num_docs += 1
+        self.total_length += len(tokens)
+
+        self._pending_docs += 1
+        if self._pending_docs >= self.merge_threshold:
+            self._merge_pending()
+        return row
+
+    def remove(self, row: int) -> None:
+        """
+        문서 삭제 (포스팅은 compact 전까지 남고 점수 계산에서 제외됨)
+        """
+        if self._deleted[row]:
+            return
+        for term_id in self._terms_of_row(row):
+            self.df[term_id] -= 1
+        self.num_docs -= 1
+        self.total_length -= int(self._doc_lengths[row])
+        self._deleted[row] = True
+
+    def _terms_of_row(self, row: int) -> np.ndarray:
+        """행에 포함된 단어 ID"""
+        base = len(self._row_indptr) - 1
+        if row < base:
+            return self._row_term_ids[self._row_indptr[row]:self._row_indptr[row + 1]]
+        return self._row_terms[row - base]
+
+    def _rebuild_row_terms(self) -> None:
+        """
+        단어 순 CSR을 전치하여 행 순 CSR 재구성 (대기 포스팅이 없을 때 호출)
+        """
+        posting_terms = np.repeat(np.arange(len(self._indptr) - 1), np.diff(self._indptr))
+        order = np.argsort(self._indices, kind="stable")
+        self._row_term_ids = posting_terms[order]
+        self._row_indptr = np.zeros(self.num_rows + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self._indices, minlength=self.num_rows), out=self._row_indptr[1:])
+        self._row_terms = []
+
+    def _merge_pending(self) -> None:
+        """
+        대기 포스팅을 CSR 행렬에 병합
+        대기 포스팅의 행 번호는 항상 CSR의 행 번호보다 크므로 단어별로 뒤에 붙이면 됩니다.
+        """
+        if not self._pending:
+            self._pending_docs = 0
+            return
+
+        num_terms = len(self.df)
+        frozen_counts = np.zeros(num_terms, dtype=np.int64)
+        frozen_counts[:len(self._indptr) - 1] = np.diff(self._indptr)
+
+        pending_terms = np.concatenate([
+            np.full(len(rows), term_id, dtype=np.int64) for term_id, (rows, _) in self._pending.items()
+        ])
+        pending_rows = np.concatenate([np.asarray(rows, dtype=np.int64) for rows, _ in self._pending.values()])
+        pending_tfs = np.concatenate([np.asarray(tfs, dtype=np.float32) for _, tfs in self._pending.values()])
+        order = np.lexsort((pending_rows, pending_terms))
+        pending_terms = pending_terms[order]
+        pending_rows = pending_rows[order]
+        pending_tfs = pending_tfs[order]
+        pending_counts = np.bincount(pending_terms, minlength=num_terms)
+
+        indptr = np.zeros(num_terms + 1, dtype=np.int64)
+        np.cumsum(frozen_counts + pending_counts, out=indptr[1:])
+        indices = np.empty(indptr[-1], dtype=np.int64)
+        tfs = np.empty(indptr[-1], dtype=np.float32)
+
+        # 기존 포스팅은 단어별 구간의 앞쪽에 배치
+        frozen_terms = np.repeat(np.arange(len(self._indptr) - 1), np.diff(self._indptr))
+        destination = indptr[frozen_terms] + np.arange(len(self._indices)) - self._indptr[frozen_terms]
+        indices[destination] = self._indices
+        tfs[destination] = self._tfs
+
+        # 대기 포스팅은 기존 포스팅 뒤에 배치
+        group_start = np.searchsorted(pending_terms, pending_terms, side="left")
+        destination = (
+            indptr[pending_terms] + frozen_counts[pending_terms]
+            + np.arange(len(pending_terms)) - group_start
+        )
+        indices[destination] = pending_rows
+        tfs[destination] = pending_tfs
+
+        self._indptr, self._indices, self._tfs = indptr, indices, tfs
+        self._pending = {}
+        self._pending_docs = 0
+
+    def compact(self, keep_rows: np.ndarray) -> None:
+        """
+        삭제된 행을 제거하고 남은 행을 0부터 다시 번호 매김
+        Args:
+            keep_rows: 남길 행 번호 (오름차순)
+        """
+        self._merge_pending()
+        keep_rows = np.asarray(keep_rows, dtype=np.int64)
+
+        keep_mask = np.zeros(self.num_rows, dtype=bool)
+        keep_mask[keep_rows] = True
+        remap = np.full(self.num_rows, -1, dtype=np.int64)
+        remap[keep_rows] = np.arange(len(keep_rows))
+
+        posting_terms = np.repeat(np.arange(len(self._indptr) - 1), np.diff(self._indptr))
+        mask = keep_mask[self._indices]
+        counts = np.bincount(posting_terms[mask], minlength=len(self._indptr) - 1)
+        self._indptr = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(counts, out=self._indptr[1:])
+        self._indices = remap[self._indices[mask]]
+        self._tfs = self._tfs[mask]
+
+        self._doc_lengths = self._doc_lengths[keep_rows].copy()
+        self._deleted = np.zeros(len(keep_rows), dtype=bool)
+        self.num_rows = len(keep_rows)
+        self._rebuild_row_terms()
+
+    _ARRAY_FILES = ("indptr", "indices", "tfs", "row_indptr", "row_term_ids")
+
+    def save(self, directory: str) -> None:
+        """
+        인덱스를 디렉토리에 저장
+        포스팅 배열은 .npy로 저장되어 load 시 메모리 맵으로 열 수 있습니다.
+        """
+        path = Path(directory)
+        path.mkdir(parents=True, exist_ok=True)
+        self._merge_pending()
+        if self._row_terms:
+            self._rebuild_row_terms()
+
+        arrays = {
+            "indptr": self._indptr,
+            "indices": self._indices,
+            "tfs": self._tfs,
+            "row_indptr": self._row_indptr,
+            "row_term_ids": self._row_term_ids,
+            "doc_lengths": self.doc_lengths,
+            "deleted": self._deleted[:self.num_rows],
+        }
+        for name, array in arrays.items():
+            atomic_write(path / f"bm25_{name}.npy", lambda f, a=array: np.save(f, a))
+
+        # 단어 ID 순서의 어휘와 문서 빈도
+        terms = sorted(self.vocabulary, key=self.vocabulary.get)
+        vocabulary = pa.table({"term": terms, "df": pa.array(self.df, type=pa.int64())})
+        atomic_write(path / "bm25_vocabulary.arrow", lambda f: write_arrow(f, vocabulary))
+
+        stats = {
+            "k1": self.k1,
+            "b": self.b,
+            "merge_threshold": self.merge_threshold,
+            "num_rows": self.num_rows,
+            "num_docs": self.num_docs,
+            "total_length": self.total_length,
+        }
+        atomic_write(path / "bm25.json", lambda f: f.write(json.dumps(stats).encode()))
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> "BM25Index":
+        """
+        저장된 인덱스 불러오기
+        Args:
+            directory: save로 저장한 디렉토리
+            mmap: 포스팅 배열을 메모리 맵으로 열지 여부 (여러 프로세스가 페이지 캐시를 공유)
+        """
+        path = Path(directory)
+        with open(path / "bm25.json") as f:
+            stats = json.load(f)
+
+        index = cls(k1=stats["k1"], b=stats["b"], merge_threshold=stats["merge_threshold"])
+        index.num_rows = stats["num_rows"]
+        index.num_docs = stats["num_docs"]
+        index.total_length = stats["total_length"]
+
+        mmap_mode = "r" if mmap else None
+        for name in cls._ARRAY_FILES:
+            setattr(index, f"_{name}", np.load(path / f"bm25_{name}.npy", mmap_mode=mmap_mode))
+        # 추가/삭제 시 바로 수정되는 배열은 메모리로 읽음
+        index._doc_lengths = np.load(path / "bm25_doc_lengths.npy")
+        index._deleted = np.load(path / "bm25_deleted.npy")
+
+        with pa.memory_map(str(path / "bm25_vocabulary.arrow")) as source:
+            vocabulary = pa.ipc.open_file(source).read_all()
+        terms = vocabulary.column("term").to_pylist()
+        index.vocabulary = dict(zip(terms, range(len(terms))))
+        index.df = vocabulary.column("df").to_pylist()
+        return index
+
+    def _term_postings(self, term_id: int) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """단어의 포스팅 (CSR 구간과 대기 포스팅)"""
+        if term_id < len(self._indptr) - 1:
+            start, end = self._indptr[term_id], self._indptr[term_id + 1]
+            if start < end:
+                yield self._indices[start:end], self._tfs[start:end]
+        if term_id in self._pending:
+            rows, tfs = self._pending[term_id]
+            yield np.asarray(rows, dtype=np.int64), np.asarray(tfs, dtype=np.float32)
+
+    @staticmethod
+    def _intersect(rows: np.ndarray, posting_rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        정렬된 두 행 배열의 교집합 위치 (rows 위치, posting_rows 위치)
+        더 짧은 쪽을 긴 쪽에서 이진 탐색하므로 필터가 좁을수록 빨라집니다.
+        """
+        if len(rows) <= len(posting_rows):
+            position = np.minimum(np.searchsorted(posting_rows, rows), len(posting_rows) - 1)
+            hit = posting_rows[position] == rows
+            return np.flatnonzero(hit), position[hit]
+        position = np.minimum(np.searchsorted(rows, posting_rows), len(rows) - 1)
+        hit = rows[position] == posting_rows
+        return position[hit], np.flatnonzero(hit)
+
+    def matching_rows(self, tokens: List[str]) -> np.ndarray:
+        """
+        질의 단어를 하나라도 포함한 행 번호 (오름차순, 삭제된 행 제외)
+        BM25 점수가 0보다 큰 행은 모두 여기에 포함됩니다.
+        """
+        parts = []
+        for term in set(tokens):
+            term_id = self.vocabulary.get(term)
+            if term_id is not None:
+                parts.extend(posting_rows for posting_rows, _ in self._term_postings(term_id))
+        if not parts:
+            return np.empty(0, dtype=np.int64)
+        rows = np.unique(np.concatenate(parts))
+        return rows[~self._deleted[rows]]
+
+    def get_scores(self, tokens: List[str], rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        BM25 점수 계산 (질의 단어의 포스팅만 사용)
+        Args:
+            tokens: 질의 토큰
+            rows: 점수를 계산할 행 번호 (오름차순). None이면 모든 행
+        Returns:
+            rows 순서의 점수 배열 (rows가 None이면 전체 행, 삭제된 행은 0)
+        """
+        return self.get_scores_batch([tokens], rows)[0]
+
+    def get_scores_batch(
+        self,
+        token_lists: List[List[str]],
+        rows: Optional[np.ndarray] = None,
+        collection_stats: Optional[Tuple[int, int, Dict[str, int]]] = None
+    ) -> np.ndarray:
+        """
+        여러 질의의 BM25 점수를 한 번에 계산
+        질의들에 나온 단어마다 포스팅을 한 번만 읽어 해당 단어를 포함한 질의에 더합니다.
+        Args:
+            token_lists: 질의별 토큰 리스트
+            rows: 점수를 계산할 행 번호 (오름차순). None이면 모든 행
+            collection_stats: (문서 수, 전체 문서 길이, 단어별 문서 빈도) 전체 통계.
+                              샤드로 나뉜 인덱스에서 모든 샤드의 점수를 같은 기준으로 맞출 때 사용
+        Returns:
+            (질의 수, 행 수) 점수 행렬 (삭제된 행은 0)
+        """
+        if rows is not None:
+            rows = np.asarray(rows, dtype=np.int64)
+        scores = np.zeros(
+            (len(token_lists), self.num_rows if rows is None else len(rows)), dtype=np.float64
+        )
+        if not self.num_docs or not scores.size:
+            return scores
+
+        # 단어 ID -> [(질의 번호, 질의 내 등장 횟수)]
+        term_queries: Dict[int, List[Tuple[int, int]]] = {}
+        term_names: Dict[int, str] = {}
+        for query_index, tokens in enumerate(token_lists):
+            for term, count in Counter(tokens).items():
+                term_id = self.vocabulary.get(term)
+                if term_id is not None and self.df[term_id]:
+                    term_queries.setdefault(term_id, []).append((query_index, count))
+                    term_names[term_id] = term
+
+        if collection_stats is None:
+            num_docs, avgdl, df = self.num_docs, self.avgdl, None
+        else:
+            num_docs, total_length, df = collection_stats
+            avgdl = total_length / num_docs
+        for term_id, queries in term_queries.items():
+            idf = self.idf(self.df[term_id] if df is None else df[term_names[term_id]], num_docs)
+            for posting_rows, posting_tfs in self._term_postings(term_id):
+                if rows is None:
+                    targets = posting_rows
+                    tfs = posting_tfs
+                    positions = posting_rows
+                else:
+                    positions, selected = self._intersect(rows, posting_rows)
+                    targets = posting_rows[selected]
+                    tfs = posting_tfs[selected]
+                length_norm = self.k1 * (1 - self.b + self.b * self._doc_lengths[targets] / avgdl)
+                weights = idf * tfs * (self.k1 + 1) / (tfs + length_norm)
+                for query_index, count in queries:
+                    scores[query_index, positions] += count * weights
+
+        deleted = self._deleted[:self.num_rows] if rows is None else self._deleted[rows]
+        scores[:, deleted] = 0.0
+        return scores
+
@@ -1,9 +1,22 @@
 import os
-from typing import List, Dict, Any, Optional
+import json
+from typing import Iterator, List, Dict, Any, Optional
 from supabase import create_client, Client
 import numpy as np
 from datetime import datetime
 
+# 목록 조회 시 기본으로 가져올 컬럼 (청크 임베딩은 제외)
+DOCUMENT_COLUMNS = "id, title, category, file_name, created_at, total_chunks"
+CHUNK_COLUMNS = "id, document_id, content, chunk_index, metadata, created_at"
+# 문서에만 저장하고 청크 메타데이터에는 복사하지 않는 문서 메타데이터 키
+# (파일 해시는 파일이 바뀔 때 문서 행에서만 갱신됨)
+DOCUMENT_ONLY_METADATA = ("file_hash",)
+# 로컬 검색 인덱스 구축용 컬럼 (문서 제목/카테고리 및 동기화용 변경 시각 포함)
+INDEX_CHUNK_COLUMNS = (
+    "id, document_id, content, chunk_index, embedding, updated_at, "
+    "documents(title, category, updated_at)"
+)
+
 class VectorStore:
     def __init__(self):
         url: str = os.environ.get("SUPABASE_URL")
@@ -13,6 +26,9 @@ class VectorStore:
             raise ValueError("SUPABASE_URL과 SUPABASE_KEY가 환경변수에 설정되어 있어야 합니다.")
         
         self.supabase: Client = create_client(url, key)
+        # 청크 일괄 삽입 요청당 최대 행 수 / 최대 페이로드 크기
+        self.chunk_batch_size = 100
+        self.chunk_batch_bytes = 4 * 1024 * 1024
         self._init_tables()
     
     def _init_tables(self):
@@ -32,33 +48,171 @@ class VectorStore:
             생성된 문서 ID
         """
         # 문서 메타데이터 저장
-        doc_data = {
+        doc_data = self._document_row(metadata, len(chunks))
+        rows = [
+            self._chunk_row(chunk, i, metadata, len(chunks))
+            for i, chunk in enumerate(chunks)
+        ]
+        batches = self._batch_rows(rows)
+
+        # 한 요청에 담을 수 있으면 문서와 청크를 하나의 트랜잭션으로 저장
+        if len(batches) <= 1:
+            response = self.supabase.rpc(
+                "insert_document_with_chunks",
+                {"doc": doc_data, "doc_chunks": rows}
+            ).execute()
+            return response.data
+
+        # 큰 문서는 문서 저장 후 청크를 배치로 저장하고, 실패하면 문서를 삭제
+        response = self.supabase.table("documents").insert(doc_data).execute()
+        doc_id = response.data[0]['id']
+        try:
+            for batch in batches:
+                self.supabase.table("chunks").insert(
+                    [{"document_id": doc_id, **row} for row in batch]
+                ).execute()
+        except Exception:
+            self.delete_document(doc_id)
+            raise
+
+        return doc_id
+
+    @staticmethod
+    def _document_row(metadata: Dict[str, Any], total_chunks: int) -> Dict[str, Any]:
+        """documents 테이블 행"""
+        return {
             "title": metadata.get("title", "제목 없음"),
             "category": metadata.get("category", "general"),
             "file_name": metadata.get("original_filename", ""),
+            "file_hash": metadata.get("file_hash"),
             "created_at": datetime.now().isoformat(),
-            "total_chunks": len(chunks)
+            "total_chunks": total_chunks
         }
-        
-        response = self.supabase.table("documents").insert(doc_data).execute()
-        doc_id = response.data[0]['id']
-        
-        # 청크 데이터 저장
-        for i, chunk in enumerate(chunks):
-            chunk_data = {
-                "document_id": doc_id,
-                "content": chunk["content"],
-                "embedding": chunk["embedding"],
-                "chunk_index": i,
-                "metadata": {
-                    **metadata,
-                    "chunk_index": i,
-                    "total_chunks": len(chunks)
-                }
+
+    @staticmethod
+    def _chunk_row(
+        chunk: Dict[str, Any], chunk_index: int, metadata: Dict[str, Any], total_chunks: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        chunks 테이블 행 (total_chunks를 모르면 메타데이터에서 제외)
+        청크 자체 메타데이터(페이지 범위, 파일 형식 등)에 문서 메타데이터를 덮어써서 저장합니다.
+        """
+        chunk_metadata = {
+            **chunk.get("metadata", {}),
+            **{key: value for key, value in metadata.items() if key not in DOCUMENT_ONLY_METADATA},
+            "chunk_index": chunk_index,
+        }
+        if total_chunks is not None:
+            chunk_metadata["total_chunks"] = total_chunks
+        return {
+            "content": chunk["content"],
+            "embedding": chunk["embedding"],
+            "chunk_index": chunk_index,
+            "metadata": chunk_metadata
+        }
+
+    def begin_document(self, metadata: Dict[str, Any]) -> int:
+        """
+        청크를 나중에 나눠 저장할 문서 생성 (스트리밍 저장용)
+        청크는 add_chunks로 저장하고, 끝나면 finalize_document로 청크 수를 확정합니다.
+        Returns:
+            생성된 문서 ID
+        """
+        response = self.supabase.table("documents").insert(self._document_row(metadata, 0)).execute()
+        return response.data[0]['id']
+
+    def add_chunks(
+        self,
+        doc_id: int,
+        chunks: List[Dict[str, Any]],
+        metadata: Dict[str, Any],
+        start_index: int = 0,
+        chunk_indexes: Optional[List[int]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        begin_document로 만든 문서에 청크 저장
+        Args:
+            doc_id: 문서 ID
+            chunks: 청크 리스트 ({'content', 'embedding', 'metadata'(선택)})
+            metadata: 문서 메타데이터
+            start_index: 첫 청크의 chunk_index
+            chunk_indexes: 청크별 chunk_index (연속되지 않을 때, 주어지면 start_index 무시)
+        Returns:
+            저장된 청크의 id, chunk_index 리스트
+            (여러 요청 중 하나가 실패하면 이번 호출에서 저장한 청크를 지우고 예외 발생)
+        """
+        if chunk_indexes is None:
+            chunk_indexes = range(start_index, start_index + len(chunks))
+        rows = [
+            {"document_id": doc_id, **self._chunk_row(chunk, chunk_index, metadata)}
+            for chunk, chunk_index in zip(chunks, chunk_indexes)
+        ]
+        saved = []
+        try:
+            for batch in self._batch_rows(rows):
+                response = self.supabase.table("chunks").insert(batch).execute()
+                saved.extend({"id": row["id"], "chunk_index": row["chunk_index"]} for row in response.data)
+        except Exception:
+            self.delete_chunks([row["id"] for row in saved])
+            raise
+        return saved
+
+    def finalize_document(self, doc_id: int, total_chunks: int) -> None:
+        """문서와 청크 메타데이터에 청크 수 기록"""
+        self.supabase.rpc(
+            "finalize_document",
+            {"doc_id": doc_id, "chunk_count": total_chunks}
+        ).execute()
+
+    def apply_chunk_diff(
+        self,
+        doc_id: int,
+        kept_chunks: List[Dict[str, Any]],
+        removed_ids: List[int],
+        total_chunks: int,
+        updates: Dict[str, Any]
+    ) -> None:
+        """
+        청크 변경분을 하나의 트랜잭션으로 적용 (새 청크는 add_chunks로 미리 저장)
+        Args:
+            doc_id: 문서 ID
+            kept_chunks: 순서나 청크 메타데이터(페이지 범위)가 바뀐 기존 청크
+                         ({'id', 'chunk_index', 'metadata': 덮어쓸 청크 메타데이터})
+            removed_ids: 삭제할 청크 ID
+            total_chunks: 갱신 후 청크 수
+            updates: 문서 정보 변경 (file_hash, file_name,
+                     chunk_metadata: 문서의 모든 청크 메타데이터에 덮어쓸 값)
+        """
+        self.supabase.rpc(
+            "apply_chunk_diff",
+            {
+                "doc_id": doc_id,
+                "kept_chunks": kept_chunks,
+                "removed_ids": removed_ids,
+                "chunk_count": total_chunks,
+                "doc": updates,
             }
-            self.supabase.table("chunks").insert(chunk_data).execute()
-        
-        return doc_id
+        ).execute()
+
+    def _batch_rows(self, rows: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """행 리스트를 요청당 행 수와 페이로드 크기 한도 안에서 배치로 분할"""
+        batches = []
+        batch: List[Dict[str, Any]] = []
+        batch_bytes = 0
+        for row in rows:
+            row_bytes = len(json.dumps(row))
+            if batch and (
+                len(batch) >= self.chunk_batch_size
+                or batch_bytes + row_bytes > self.chunk_batch_bytes
+            ):
+                batches.append(batch)
+                batch = []
+                batch_bytes = 0
+            batch.append(row)
+            batch_bytes += row_bytes
+        if batch:
+            batches.append(batch)
+        return batches
     
     def get_document(self, doc_id: int) -> Optional[Dict[str, Any]]:
         """문서 정보 조회"""
@@ -67,11 +221,39 @@ class VectorStore:
             return None
         return response.data[0]
     
-    def list_documents(self, category: Optional[str] = None) -> List[Dict[str, Any]]:
-        """문서 목록 조회"""
-        query = self.supabase.table("documents").select("*").order("created_at", desc=True)
+    def get_documents(self, doc_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """여러 문서 정보를 한 번에 조회 (문서 ID -> 문서)"""
+        if not doc_ids:
+            return {}
+        response = self.supabase.table("documents").select("*").in_("id", list(doc_ids)).execute()
+        return {doc["id"]: doc for doc in response.data}
+    
+    def list_documents(
+        self,
+        category: Optional[str] = None,
+        columns: str = DOCUMENT_COLUMNS,
+        limit: Optional[int] = None,
+        after_id: Optional[int] = None,
+        updated_after: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        문서 목록 조회 (최신순, 키셋 페이지네이션)
+        Args:
+            category: 카테고리 필터
+            columns: 조회할 컬럼
+            limit: 최대 문서 수
+            after_id: 이전 페이지의 마지막 문서 ID (이 ID보다 오래된 문서부터 조회)
+            updated_after: 이 시각(ISO 형식) 이후에 수정된 문서만 조회
+        """
+        query = self.supabase.table("documents").select(columns).order("id", desc=True)
         if category:
             query = query.eq("category", category)
+        if updated_after is not None:
+            query = query.gt("updated_at", updated_after)
+        if after_id is not None:
+            query = query.lt("id", after_id)
+        if limit is not None:
+            query = query.limit(limit)
         response = query.execute()
         return response.data
     
@@ -92,11 +274,77 @@ class VectorStore:
         except Exception:
             return False
     
-    def list_document_chunks(self, doc_id: int) -> List[Dict[str, Any]]:
-        """특정 문서의 청크 목록 조회"""
-        response = self.supabase.table("chunks").select("*").eq("document_id", doc_id).order("chunk_index").execute()
+    def list_document_chunks(
+        self,
+        doc_id: int,
+        columns: str = CHUNK_COLUMNS,
+        limit: Optional[int] = None,
+        after_index: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        특정 문서의 청크 목록 조회 (청크 순서, 키셋 페이지네이션)
+        Args:
+            doc_id: 문서 ID
+            columns: 조회할 컬럼 (임베딩이 필요하면 명시적으로 포함)
+            limit: 최대 청크 수
+            after_index: 이전 페이지의 마지막 chunk_index
+        """
+        query = self.supabase.table("chunks").select(columns).eq("document_id", doc_id).order("chunk_index")
+        if after_index is not None:
+            query = query.gt("chunk_index", after_index)
+        if limit is not None:
+            query = query.limit(limit)
+        response = query.execute()
         return response.data
     
+    def iter_chunks(
+        self,
+        columns: str = CHUNK_COLUMNS,
+        page_size: int = 500,
+        after_id: Optional[int] = None,
+        updated_after: Optional[str] = None
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """
+        전체 청크를 ID 순서로 페이지 단위 조회 (키셋 페이지네이션)
+        Args:
+            columns: 조회할 컬럼
+            page_size: 페이지당 청크 수
+            after_id: 이 ID 이후의 청크부터 조회
+            updated_after: 이 시각(ISO 형식) 이후에 추가/수정된 청크만 조회
+        """
+        while True:
+            query = self.supabase.table("chunks").select(columns).order("id").limit(page_size)
+            if after_id is not None:
+                query = query.gt("id", after_id)
+            if updated_after is not None:
+                query = query.gt("updated_at", updated_after)
+            rows = self._parse_embeddings(query.execute().data)
+            if not rows:
+                return
+            yield rows
+            if len(rows) < page_size:
+                return
+            after_id = rows[-1]["id"]
+
+    def get_chunks(self, chunk_ids: List[int], columns: str = CHUNK_COLUMNS) -> List[Dict[str, Any]]:
+        """여러 청크를 ID로 조회 (요청 URL이 너무 길어지지 않도록 나눠서 요청, ID 순서)"""
+        chunk_ids = list(chunk_ids)
+        rows = []
+        for start in range(0, len(chunk_ids), 200):
+            response = self.supabase.table("chunks").select(columns).in_(
+                "id", chunk_ids[start:start + 200]
+            ).order("id").execute()
+            rows.extend(self._parse_embeddings(response.data))
+        return rows
+
+    @staticmethod
+    def _parse_embeddings(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """pgvector 값은 '[0.1,0.2,...]' 문자열로 반환되므로 리스트로 변환"""
+        for row in rows:
+            if isinstance(row.get("embedding"), str):
+                row["embedding"] = json.loads(row["embedding"])
+        return rows
+    
     def update_chunk(self, chunk_id: int, content: str) -> bool:
         """청크 내용 업데이트"""
         try:
@@ -113,14 +361,44 @@ class VectorStore:
         except Exception:
             return False
     
-    def search_similar(self, query_embedding: List[float], limit: int = 5) -> List[Dict[str, Any]]:
-        """유사한 청크 검색"""
-        response = self.supabase.rpc(
-            'match_chunks',
-            {
-                'query_embedding': query_embedding,
-                'match_count': limit
-            }
-        ).execute()
+    def delete_chunks(self, chunk_ids: List[int]) -> None:
+        """여러 청크 삭제 (요청 URL이 너무 길어지지 않도록 나눠서 요청)"""
+        chunk_ids = list(chunk_ids)
+        for start in range(0, len(chunk_ids), 200):
+            self.supabase.table("chunks").delete().in_("id", chunk_ids[start:start + 200]).execute()
+    
+    def search_similar(
+        self,
+        query_embedding: List[float],
+        limit: int = 5,
+        ef_search: Optional[int] = None,
+        category: Optional[str] = None,
+        document_ids: Optional[List[int]] = None,
+        metadata_filter: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        유사한 청크 검색 (필터는 DB 안에서 적용)
+        Args:
+            query_embedding: 쿼리 임베딩
+            limit: 반환할 최대 청크 수
+            ef_search: HNSW 탐색 폭 (클수록 recall 증가, 지연 증가. None이면 DB 기본값)
+            category: 문서 카테고리 필터
+            document_ids: 문서 ID 필터
+            metadata_filter: 청크 메타데이터 포함 조건 (예: {'file_type': 'pdf'})
+        """
+        params = {
+            'query_embedding': query_embedding,
+            'match_count': limit
+        }
+        if ef_search is not None:
+            params['ef_search'] = ef_search
+        if category:
+            params['filter_category'] = category
+        if document_ids:
+            params['filter_document_ids'] = document_ids
+        if metadata_filter:
+            params['filter_metadata'] = metadata_filter
+
+        response = self.supabase.rpc('match_chunks', params).execute()
         
         return response.data
\ No newline at end of file
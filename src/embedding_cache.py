@@ -1,82 +1,351 @@
 import hashlib
-import json
-import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import Any, List, Dict, Optional, Tuple
+import numpy as np
 
 class EmbeddingCache:
-    def __init__(self, cache_dir: str = ".cache/embeddings"):
+    # SQLite 변수 개수 제한 안에서 한 번에 조회할 키 수
+    _QUERY_BATCH = 500
+
+    def __init__(
+        self,
+        cache_dir: str = ".cache/embeddings",
+        max_memory_entries: int = 10_000,
+        max_memory_bytes: int = 64 * 1024 * 1024,
+        max_disk_bytes: Optional[int] = None,
+        ttl_seconds: Optional[float] = None,
+    ):
         """
         임베딩 캐시 초기화
+        임베딩은 단일 SQLite 파일에 float32 바이너리로 저장되며,
+        자주 쓰는 항목은 메모리 LRU 계층에서 바로 반환됩니다.
         Args:
             cache_dir: 캐시 파일을 저장할 디렉토리
+            max_memory_entries: 메모리 계층 최대 항목 수
+            max_memory_bytes: 메모리 계층 최대 벡터 바이트 수
+            max_disk_bytes: 디스크 계층 최대 벡터 바이트 수 (None이면 제한 없음)
+            ttl_seconds: 항목 유효 시간 (None이면 만료 없음)
         """
         self.cache_dir = Path(cache_dir)
         self.cache_dir.mkdir(parents=True, exist_ok=True)
-        
-    def _get_cache_key(self, text: str, model_name: str) -> str:
+        self.db_path = self.cache_dir / "embeddings.sqlite3"
+        self.max_memory_entries = max_memory_entries
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.ttl_seconds = ttl_seconds
+
+        # 메모리 LRU 계층: 키 -> (float32 바이트, 생성 시각, 모델명)
+        self._memory: "OrderedDict[bytes, Tuple[bytes, float, str]]" = OrderedDict()
+        self._memory_bytes = 0
+        self._counters = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "memory_evictions": 0,
+            "disk_evictions": 0,
+        }
+
+        # 임베딩 배치 요청 스레드에서도 사용하므로 연결은 잠금으로 보호
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        # 읽기는 mmap을 통해 페이지 캐시에서 바로 처리
+        self._conn.execute("PRAGMA mmap_size=1073741824")
+        self._conn.execute(
+            """
+            create table if not exists embeddings (
+                key blob primary key,
+                model text not null,
+                vector blob not null,
+                created_at real not null
+            )
+            """
+        )
+        self._conn.execute(
+            "create index if not exists embeddings_created_at on embeddings (created_at)"
+        )
+        self._conn.execute(
+            "create index if not exists embeddings_model_created_at on embeddings (model, created_at)"
+        )
+        self._init_stats()
+        self._conn.commit()
+
+    def _init_stats(self) -> None:
+        """
+        모델별 항목 수/바이트 수 통계 테이블 초기화
+        트리거로 삽입/삭제 시 증분 갱신되므로 통계 조회에 전체 스캔이 필요 없습니다.
+        """
+        has_stats = self._conn.execute(
+            "select 1 from sqlite_master where type = 'table' and name = 'cache_stats'"
+        ).fetchone()
+        self._conn.execute(
+            """
+            create table if not exists cache_stats (
+                model text primary key,
+                entries integer not null,
+                bytes integer not null
+            )
+            """
+        )
+        self._conn.execute(
+            """
+            create trigger if not exists embeddings_stats_insert after insert on embeddings
+            begin
+                insert into cache_stats (model, entries, bytes)
+                values (new.model, 1, length(new.vector))
+                on conflict (model) do update set
+                    entries = entries + 1,
+                    bytes = bytes + length(new.vector);
+            end
+            """
+        )
+        self._conn.execute(
+            """
+            create trigger if not exists embeddings_stats_delete after delete on embeddings
+            begin
+                update cache_stats set
+                    entries = entries - 1,
+                    bytes = bytes - length(old.vector)
+                where model = old.model;
+            end
+            """
+        )
+        if not has_stats:
+            # 통계 테이블 도입 이전에 만들어진 캐시는 한 번만 집계
+            self._conn.execute(
+                """
+                insert into cache_stats (model, entries, bytes)
+                select model, count(*), sum(length(vector)) from embeddings group by model
+                """
+            )
+
+    def _get_cache_key(self, text: str, model_name: str) -> bytes:
         """
         텍스트와 모델명으로부터 캐시 키 생성
         """
         # 텍스트와 모델명을 합쳐서 해시 생성
         content = f"{text}:{model_name}"
-        return hashlib.sha256(content.encode()).hexdigest()
-    
-    def _get_cache_path(self, cache_key: str) -> Path:
-        """
-        캐시 키에 해당하는 파일 경로 반환
-        """
-        return self.cache_dir / f"{cache_key}.json"
-    
+        return hashlib.sha256(content.encode()).digest()
+
+    @staticmethod
+    def _pack(embedding: List[float]) -> bytes:
+        """임베딩을 float32 바이트로 변환"""
+        return np.asarray(embedding, dtype=np.float32).tobytes()
+
+    @staticmethod
+    def _unpack(blob: bytes) -> List[float]:
+        """float32 바이트를 임베딩으로 변환"""
+        return np.frombuffer(blob, dtype=np.float32).tolist()
+
     def get(self, text: str, model_name: str) -> Optional[List[float]]:
         """
         캐시된 임베딩 가져오기
         Returns:
             임베딩 벡터 또는 None (캐시 미스)
         """
-        cache_key = self._get_cache_key(text, model_name)
-        cache_path = self._get_cache_path(cache_key)
-        
-        if cache_path.exists():
+        return self.get_many([text], model_name)[0]
+
+    def get_many(self, texts: List[str], model_name: str) -> List[Optional[List[float]]]:
+        """
+        여러 텍스트의 캐시된 임베딩을 한 번에 가져오기
+        Returns:
+            입력 순서와 같은 임베딩 리스트 (캐시 미스는 None)
+        """
+        keys = [self._get_cache_key(text, model_name) for text in texts]
+        found: Dict[bytes, bytes] = {}
+        min_created_at = self._min_created_at()
+
+        with self._lock:
+            # 1. 메모리 계층 조회
+            disk_keys = []
+            for key in keys:
+                entry = self._memory.get(key)
+                if entry is not None and entry[1] >= min_created_at:
+                    self._memory.move_to_end(key)
+                    found[key] = entry[0]
+                    self._counters["memory_hits"] += 1
+                else:
+                    disk_keys.append(key)
+            disk_keys = list(dict.fromkeys(disk_keys))
+
+            # 2. 디스크 계층 조회 후 메모리 계층으로 승격
             try:
-                with open(cache_path, 'r') as f:
-                    cache_data = json.load(f)
-                return cache_data['embedding']
-            except (json.JSONDecodeError, KeyError, IOError):
-                # 캐시 파일이 손상된 경우 삭제
-                cache_path.unlink(missing_ok=True)
-                return None
-        return None
-    
+                for start in range(0, len(disk_keys), self._QUERY_BATCH):
+                    batch = disk_keys[start:start + self._QUERY_BATCH]
+                    placeholders = ",".join("?" * len(batch))
+                    rows = self._conn.execute(
+                        f"select key, vector, created_at from embeddings "
+                        f"where key in ({placeholders}) and created_at >= ?",
+                        [*batch, min_created_at],
+                    ).fetchall()
+                    for key, vector, created_at in rows:
+                        found[key] = vector
+                        self._remember(key, vector, created_at, model_name)
+                    self._counters["disk_hits"] += len(rows)
+            except sqlite3.DatabaseError:
+                # 캐시 조회 실패는 캐시 미스로 처리
+                pass
+
+            self._counters["misses"] += sum(1 for key in keys if key not in found)
+
+        return [self._unpack(found[key]) if key in found else None for key in keys]
+
     def set(self, text: str, model_name: str, embedding: List[float]) -> None:
         """
         임베딩을 캐시에 저장
         """
-        cache_key = self._get_cache_key(text, model_name)
-        cache_path = self._get_cache_path(cache_key)
-        
-        cache_data = {
-            'text': text,
-            'model': model_name,
-            'embedding': embedding
-        }
-        
-        try:
-            with open(cache_path, 'w') as f:
-                json.dump(cache_data, f)
-        except IOError:
-            # 캐시 저장 실패 시 무시하고 계속 진행
-            pass
-    
-    def clear(self) -> None:
-        """
-        모든 캐시 삭제
-        """
-        for cache_file in self.cache_dir.glob("*.json"):
-            cache_file.unlink(missing_ok=True)
-            
-    def get_size(self) -> int:
+        self.set_many([text], model_name, [embedding])
+
+    def set_many(self, texts: List[str], model_name: str, embeddings: List[List[float]]) -> None:
+        """
+        여러 임베딩을 한 번에 캐시에 저장
+        """
+        now = time.time()
+        rows = [
+            (self._get_cache_key(text, model_name), model_name, self._pack(embedding), now)
+            for text, embedding in zip(texts, embeddings)
+        ]
+
+        with self._lock:
+            try:
+                # 연결을 컨텍스트로 써서 중간에 실패하면 롤백 (트랜잭션이 열린 채 남지 않도록)
+                with self._conn:
+                    # 같은 키는 같은 텍스트/모델이므로 값은 그대로, 생성 시각만 갱신됨
+                    self._conn.executemany(
+                        "insert into embeddings (key, model, vector, created_at) values (?, ?, ?, ?) "
+                        "on conflict (key) do update set created_at = excluded.created_at",
+                        rows,
+                    )
+                for key, _, vector, created_at in rows:
+                    self._remember(key, vector, created_at, model_name)
+                with self._conn:
+                    self._evict_disk()
+            except sqlite3.DatabaseError:
+                # 캐시 저장 실패 시 무시하고 계속 진행
+                pass
+
+    def _min_created_at(self) -> float:
+        """TTL 기준으로 유효한 항목의 최소 생성 시각"""
+        if self.ttl_seconds is None:
+            return 0.0
+        return time.time() - self.ttl_seconds
+
+    def _remember(self, key: bytes, vector: bytes, created_at: float, model_name: str) -> None:
+        """메모리 계층에 항목을 넣고 한도를 넘으면 오래된 항목부터 제거 (잠금 안에서 호출)"""
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_bytes -= len(previous[0])
+        self._memory[key] = (vector, created_at, model_name)
+        self._memory_bytes += len(vector)
+
+        while self._memory and (
+            len(self._memory) > self.max_memory_entries
+            or self._memory_bytes > self.max_memory_bytes
+        ):
+            _, (evicted, _, _) = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+            self._counters["memory_evictions"] += 1
+
+    def _evict_disk(self) -> None:
+        """만료된 항목과 용량 한도를 넘는 오래된 항목을 디스크에서 삭제 (잠금 안에서 호출)"""
+        if self.ttl_seconds is not None:
+            cursor = self._conn.execute(
+                "delete from embeddings where created_at < ?", (self._min_created_at(),)
+            )
+            self._counters["disk_evictions"] += cursor.rowcount
+
+        if self.max_disk_bytes is not None:
+            total = self._conn.execute(
+                "select coalesce(sum(bytes), 0) from cache_stats"
+            ).fetchone()[0]
+            excess = total - self.max_disk_bytes
+            if excess > 0:
+                evict_keys = []
+                for key, size in self._conn.execute(
+                    "select key, length(vector) from embeddings order by created_at"
+                ):
+                    evict_keys.append(key)
+                    excess -= size
+                    if excess <= 0:
+                        break
+                for start in range(0, len(evict_keys), self._QUERY_BATCH):
+                    batch = evict_keys[start:start + self._QUERY_BATCH]
+                    placeholders = ",".join("?" * len(batch))
+                    self._conn.execute(f"delete from embeddings where key in ({placeholders})", batch)
+                self._counters["disk_evictions"] += len(evict_keys)
+
+        self._conn.commit()
+
+    def clear(self, model_name: Optional[str] = None, older_than_seconds: Optional[float] = None) -> None:
+        """
+        캐시 삭제 (인자가 없으면 모든 캐시 삭제)
+        Args:
+            model_name: 이 모델의 임베딩만 삭제
+            older_than_seconds: 지정한 시간(초)보다 오래된 임베딩만 삭제
+        """
+        conditions = []
+        params: List[Any] = []
+        if model_name is not None:
+            conditions.append("model = ?")
+            params.append(model_name)
+        if older_than_seconds is not None:
+            cutoff = time.time() - older_than_seconds
+            conditions.append("created_at < ?")
+            params.append(cutoff)
+        where = f" where {' and '.join(conditions)}" if conditions else ""
+
+        with self._lock:
+            self._conn.execute(f"delete from embeddings{where}", params)
+            self._conn.commit()
+            for key, (vector, created_at, model) in list(self._memory.items()):
+                if (model_name is None or model == model_name) and (
+                    older_than_seconds is None or created_at < cutoff
+                ):
+                    del self._memory[key]
+                    self._memory_bytes -= len(vector)
+
+    def get_size(self, model_name: Optional[str] = None) -> int:
         """
         현재 캐시된 임베딩 개수 반환
+        Args:
+            model_name: 지정하면 해당 모델의 임베딩 개수만 반환
+        """
+        with self._lock:
+            if model_name is None:
+                row = self._conn.execute("select coalesce(sum(entries), 0) from cache_stats").fetchone()
+            else:
+                row = self._conn.execute(
+                    "select coalesce(sum(entries), 0) from cache_stats where model = ?", (model_name,)
+                ).fetchone()
+        return row[0]
+
+    def get_disk_stats(self) -> Dict[str, Dict[str, int]]:
+        """
+        모델별 디스크 캐시 항목 수와 벡터 바이트 수 반환
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "select model, entries, bytes from cache_stats where entries > 0"
+            ).fetchall()
+        return {model: {"entries": entries, "bytes": size} for model, entries, size in rows}
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        캐시 적중/미스/제거 카운터와 메모리 계층 사용량 반환
         """
-        return len(list(self.cache_dir.glob("*.json")))
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._counters)
+            stats["memory_entries"] = len(self._memory)
+            stats["memory_bytes"] = self._memory_bytes
+        disk_stats = self.get_disk_stats()
+        stats["disk_entries"] = sum(model["entries"] for model in disk_stats.values())
+        stats["disk_bytes"] = sum(model["bytes"] for model in disk_stats.values())
+        stats["models"] = disk_stats
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
@@ -1,36 +1,375 @@
-from typing import List, Dict, Any
-from rank_bm25 import BM25Okapi
+import json
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+from bm25_index import BM25Index
+from ivf_index import IVFIndex
+from metadata_index import MetadataIndex
+from index_io import atomic_write, write_arrow
 import numpy as np
+import pyarrow as pa
 
 class HybridSearch:
-    def __init__(self, alpha: float = 0.3):
+    def __init__(
+        self,
+        alpha: float = 0.3,
+        compaction_ratio: float = 0.25,
+        ann_threshold: int = 20_000,
+        vector_candidates: int = 200,
+        bm25_candidates: int = 200,
+        nprobe: int = 32
+    ):
         """
         하이브리드 검색 초기화
+        검색 대상이 ann_threshold개를 넘으면 전체 문서를 점수화하지 않고, IVF 벡터 후보와
+        BM25 후보만 모아 정확한 하이브리드 점수로 다시 정렬합니다.
+        IVF 학습은 문서를 추가하거나 불러올 때 수행하고, 검색은 학습된 인덱스를 읽기만 합니다.
+        후보 검색은 재현율을 일부 포기하고 지연을 줄입니다. 3만 건 기준 정확 검색 대비 recall@10은
+        군집이 뚜렷한 임베딩에서 약 0.99, 군집이 없는 무작위 벡터에서 약 0.66이며 (기본값 기준),
+        모든 군집을 탐색해도 점수 정규화가 후보 안에서 이뤄져 약 0.89에 머뭅니다.
+        정확한 순위가 더 중요하면 nprobe를 늘리거나 ann_threshold를 높이세요.
         Args:
             alpha: BM25와 벡터 검색 결과를 결합할 때 BM25의 가중치 (0~1)
+            compaction_ratio: 삭제된 행 비율이 이 값을 넘으면 인덱스를 압축
+            ann_threshold: 후보 생성 단계를 사용하기 시작하는 검색 대상 문서 수
+            vector_candidates: 질의별 벡터 후보 수
+            bm25_candidates: 질의별 BM25 후보 수
+            nprobe: 벡터 후보를 찾을 때 탐색할 IVF 군집 수 (클수록 재현율↑, 지연↑)
         """
         self.documents: List[str] = []
-        self.embeddings: List[List[float]] = []
         self.metadata: List[Dict[str, Any]] = []
-        self.bm25: BM25Okapi = None
+        self.ids: List[Any] = []
+        self.bm25 = BM25Index()
+        self.metadata_index = MetadataIndex()
         self.alpha = alpha
+        self.compaction_ratio = compaction_ratio
+        self.ann_threshold = ann_threshold
+        self.vector_candidates = vector_candidates
+        self.bm25_candidates = bm25_candidates
+        self.nprobe = nprobe
+        self.ivf: Optional[IVFIndex] = None
+
+        # L2 정규화된 float32 임베딩 버퍼 (행 = 문서, 용량은 2배씩 증가)
+        self._embedding_buffer: np.ndarray = np.empty((0, 0), dtype=np.float32)
+        self._alive: np.ndarray = np.empty(0, dtype=bool)
+        self._id_to_row: Dict[Any, int] = {}
+        self._next_id = 0
+        self._num_deleted = 0
+
+    def __len__(self) -> int:
+        """삭제되지 않은 문서 수"""
+        return len(self.documents) - self._num_deleted
+
+    @property
+    def embeddings(self) -> np.ndarray:
+        """L2 정규화된 float32 임베딩 행렬 (삭제된 행 포함)"""
+        return self._embedding_buffer[:len(self.documents)]
 
     def add_documents(
         self,
         texts: List[str],
         embeddings: List[List[float]],
-        metadata: List[Dict[str, Any]] = None
-    ) -> None:
+        metadata: List[Dict[str, Any]] = None,
+        ids: Optional[List[Any]] = None
+    ) -> List[Any]:
+        """
+        문서 추가 (기존 인덱스에 이어 붙임)
+        Args:
+            texts: 문서 텍스트 리스트
+            embeddings: 문서 임베딩 리스트
+            metadata: 문서 메타데이터 리스트
+            ids: 문서 ID 리스트 (없으면 자동 생성, 이미 있는 ID는 교체)
+        Returns:
+            추가된 문서 ID 리스트
+        """
+        if not texts:
+            return []
+        if metadata is None:
+            metadata = [{} for _ in texts]
+        if ids is None:
+            ids = list(range(self._next_id, self._next_id + len(texts)))
+        self._next_id = max([self._next_id] + [i + 1 for i in ids if isinstance(i, int)])
+
+        # 같은 ID가 있으면 기존 문서를 삭제하고 새로 추가
+        self.remove_documents([doc_id for doc_id in ids if doc_id in self._id_to_row], compact=False)
+
+        vectors = self._normalize(np.asarray(embeddings, dtype=np.float32))
+        start = len(self.documents)
+        self._reserve(start + len(texts), vectors.shape[1])
+        self._embedding_buffer[start:start + len(texts)] = vectors
+        self._alive[start:start + len(texts)] = True
+
+        for text, meta, doc_id in zip(texts, metadata, ids):
+            self.bm25.add(text.split())
+            self.metadata_index.add(len(self.documents), meta)
+            self._id_to_row[doc_id] = len(self.documents)
+            self.documents.append(text)
+            self.metadata.append(meta)
+            self.ids.append(doc_id)
+
+        if self.ivf is not None:
+            self.ivf.add(self.embeddings, np.arange(start, start + len(texts)))
+        self._update_ann_index()
+        return list(ids)
+
+    def remove_documents(self, ids: List[Any], compact: bool = True) -> int:
+        """
+        문서 삭제 (행은 삭제 표시만 하고, 일정 비율이 넘으면 압축)
+        Returns:
+            삭제된 문서 수
+        """
+        removed = 0
+        for doc_id in ids:
+            row = self._id_to_row.pop(doc_id, None)
+            if row is None:
+                continue
+            self._alive[row] = False
+            self.bm25.remove(row)
+            self.metadata_index.remove(row, self.metadata[row])
+            removed += 1
+        self._num_deleted += removed
+
+        if compact and self._num_deleted > self.compaction_ratio * len(self.documents):
+            self.compact()
+        return removed
+
+    def compact(self) -> None:
+        """
+        삭제 표시된 행을 제거하고 저장소를 다시 채움
+        """
+        if not self._num_deleted:
+            return
+        keep = np.flatnonzero(self._alive[:len(self.documents)])
+        self._embedding_buffer = self.embeddings[keep].copy()
+        self._alive = np.ones(len(keep), dtype=bool)
+        self.documents = [self.documents[row] for row in keep]
+        self.metadata = [self.metadata[row] for row in keep]
+        self.ids = [self.ids[row] for row in keep]
+        self._id_to_row = {doc_id: row for row, doc_id in enumerate(self.ids)}
+        self.bm25.compact(keep)
+        if self.ivf is not None:
+            self.ivf.compact(keep)
+        self.metadata_index = MetadataIndex()
+        for row, meta in enumerate(self.metadata):
+            self.metadata_index.add(row, meta)
+        self._num_deleted = 0
+
+    def update_metadata(self, doc_id: Any, metadata: Dict[str, Any]) -> bool:
+        """
+        문서 메타데이터 교체 (메타데이터 색인도 함께 갱신)
+        Returns:
+            문서가 있어 갱신되었는지 여부
+        """
+        row = self._id_to_row.get(doc_id)
+        if row is None:
+            return False
+        self.metadata_index.remove(row, self.metadata[row])
+        self.metadata[row] = metadata
+        self.metadata_index.add(row, metadata)
+        return True
+
+    def get(self, doc_id: Any) -> Optional[Dict[str, Any]]:
+        """
+        문서 조회 (본문, 메타데이터, 정규화된 임베딩)
+        """
+        row = self._id_to_row.get(doc_id)
+        if row is None:
+            return None
+        return {
+            'id': doc_id,
+            'content': self.documents[row],
+            'metadata': self.metadata[row],
+            'embedding': self.embeddings[row]
+        }
+
+    def find_ids(self, filter: Dict[str, Any]) -> List[Any]:
+        """
+        메타데이터 필터에 맞는 문서 ID 조회 (빈 필터면 모든 문서)
+        """
+        rows = self._filter_rows(filter)
+        return [self.ids[row] for row in rows]
+
+    def save(self, directory: str) -> None:
+        """
+        인덱스를 디렉토리에 저장
+        - embeddings.npy: 정규화된 임베딩 행렬 (load 시 메모리 맵)
+        - bm25_*: BM25 포스팅/통계
+        - documents.arrow: ID, 본문, 메타데이터(JSON) 컬럼
+        - manifest.json: 검색 설정 (마지막에 기록)
+        """
+        path = Path(directory)
+        path.mkdir(parents=True, exist_ok=True)
+        self.compact()
+
+        atomic_write(path / "embeddings.npy", lambda f: np.save(f, self.embeddings))
+        self.bm25.save(directory)
+        if self.ivf is not None:
+            self.ivf.save(directory)
+
+        documents = pa.table({
+            "id": [json.dumps(doc_id) for doc_id in self.ids],
+            "content": pa.array(self.documents, type=pa.string()),
+            "metadata": [json.dumps(meta, ensure_ascii=False, default=str) for meta in self.metadata],
+        })
+        atomic_write(path / "documents.arrow", lambda f: write_arrow(f, documents))
+
+        manifest = {
+            "version": 1,
+            "alpha": self.alpha,
+            "compaction_ratio": self.compaction_ratio,
+            "ann_threshold": self.ann_threshold,
+            "vector_candidates": self.vector_candidates,
+            "bm25_candidates": self.bm25_candidates,
+            "nprobe": self.nprobe,
+            "ivf": self.ivf is not None,
+            "next_id": self._next_id,
+            "count": len(self.documents),
+        }
+        atomic_write(path / "manifest.json", lambda f: f.write(json.dumps(manifest).encode()))
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> "HybridSearch":
+        """
+        저장된 인덱스 불러오기
+        Args:
+            directory: save로 저장한 디렉토리
+            mmap: 임베딩/포스팅을 메모리 맵으로 열지 여부
+                  (여러 프로세스가 같은 페이지 캐시를 공유하며, 수정 시점에만 메모리로 복사)
+        """
+        path = Path(directory)
+        with open(path / "manifest.json") as f:
+            manifest = json.load(f)
+
+        search = cls(
+            alpha=manifest["alpha"],
+            compaction_ratio=manifest["compaction_ratio"],
+            ann_threshold=manifest.get("ann_threshold", 20_000),
+            vector_candidates=manifest.get("vector_candidates", 200),
+            bm25_candidates=manifest.get("bm25_candidates", 200),
+            nprobe=manifest.get("nprobe", 32),
+        )
+        search._embedding_buffer = np.load(path / "embeddings.npy", mmap_mode="r" if mmap else None)
+        search._alive = np.ones(len(search._embedding_buffer), dtype=bool)
+        search.bm25 = BM25Index.load(directory, mmap=mmap)
+        if manifest.get("ivf"):
+            search.ivf = IVFIndex.load(directory, mmap=mmap)
+
+        with pa.memory_map(str(path / "documents.arrow")) as source:
+            documents = pa.ipc.open_file(source).read_all()
+        search.documents = documents.column("content").to_pylist()
+        search.ids = [json.loads(doc_id) for doc_id in documents.column("id").to_pylist()]
+        search.metadata = [json.loads(meta) for meta in documents.column("metadata").to_pylist()]
+        search._id_to_row = {doc_id: row for row, doc_id in enumerate(search.ids)}
+        for row, meta in enumerate(search.metadata):
+            search.metadata_index.add(row, meta)
+        search._next_id = manifest["next_id"]
+        search._update_ann_index()
+        return search
+
+    def clear(self) -> None:
+        """
+        모든 문서 삭제
+        """
+        self.__init__(
+            alpha=self.alpha,
+            compaction_ratio=self.compaction_ratio,
+            ann_threshold=self.ann_threshold,
+            vector_candidates=self.vector_candidates,
+            bm25_candidates=self.bm25_candidates,
+            nprobe=self.nprobe
+        )
+
+    def build_ann_index(self, nlist: Optional[int] = None) -> IVFIndex:
+        """
+        벡터 후보 생성용 IVF 인덱스 구축 (이후 추가되는 문서는 자동으로 배정)
+        Args:
+            nlist: 군집 수 (None이면 문서 수의 제곱근)
+        """
+        rows = np.flatnonzero(self._alive[:len(self.documents)])
+        ivf = IVFIndex(nlist or max(1, int(np.sqrt(len(rows)))))
+        ivf.train(self.embeddings, rows)
+        ivf.add(self.embeddings, rows)
+        self.ivf = ivf
+        return ivf
+
+    def _update_ann_index(self) -> None:
+        """
+        문서 수가 ann_threshold를 넘으면 IVF 인덱스를 학습 (문서를 추가하거나 불러올 때 호출)
+        학습 이후 문서가 4배 넘게 늘면 군집이 치우치므로 다시 학습합니다.
+        """
+        if len(self) <= self.ann_threshold:
+            return
+        if self.ivf is None or len(self) > 4 * self.ivf.trained_rows:
+            self.build_ann_index()
+
+    def _reserve(self, rows: int, dim: int) -> None:
+        """
+        임베딩 버퍼가 rows개 행을 담을 수 있도록 확장
+        """
+        capacity, current_dim = self._embedding_buffer.shape
+        if self.documents and dim != current_dim:
+            raise ValueError(f"임베딩 차원이 일치하지 않습니다: {dim} != {current_dim}")
+        if rows <= capacity and dim == current_dim:
+            return
+
+        new_capacity = max(rows, capacity * 2)
+        buffer = np.empty((new_capacity, dim), dtype=np.float32)
+        alive = np.zeros(new_capacity, dtype=bool)
+        count = len(self.documents)
+        if count:
+            buffer[:count] = self._embedding_buffer[:count]
+            alive[:count] = self._alive[:count]
+        self._embedding_buffer = buffer
+        self._alive = alive
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
         """
-        문서 추가
+        벡터를 L2 정규화 (내적이 곧 코사인 유사도가 되도록)
         """
-        self.documents = texts
-        self.embeddings = embeddings
-        self.metadata = metadata if metadata else [{} for _ in texts]
-        
-        # BM25 초기화
-        tokenized_docs = [doc.split() for doc in texts]
-        self.bm25 = BM25Okapi(tokenized_docs)
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def _scan_filter(self, filter: Dict[str, Any]) -> List[int]:
+        """
+        메타데이터를 하나씩 비교하여 필터에 맞는 행 찾기
+        """
+        valid_indices = []
+        for i in np.flatnonzero(self._alive[:len(self.documents)]):
+            meta = self.metadata[i]
+            is_valid = True
+            for key, value in filter.items():
+                # metadata.category -> metadata['category']
+                key_parts = key.split('.')
+                current = meta
+                for part in key_parts[1:]:  # metadata. 제외
+                    if isinstance(current, dict) and part in current:
+                        current = current[part]
+                    else:
+                        is_valid = False
+                        break
+
+                if isinstance(value, dict):  # $in 같은 연산자 처리
+                    if '$in' in value and current not in value['$in']:
+                        is_valid = False
+                elif current != value:
+                    is_valid = False
+
+            if is_valid:
+                valid_indices.append(i)
+        return valid_indices
+
+    def _filter_rows(self, filter: Optional[Dict[str, Any]]) -> np.ndarray:
+        """
+        필터에 맞는 (삭제되지 않은) 행 번호 (메타데이터 색인 우선, 불가능하면 전체 스캔)
+        """
+        if filter:
+            rows = self.metadata_index.lookup(filter)
+            if rows is None:
+                rows = self._scan_filter(filter)
+        else:
+            rows = np.flatnonzero(self._alive[:len(self.documents)])
+        return np.asarray(rows, dtype=np.int64)
 
     def search(
         self,
@@ -47,79 +386,161 @@ class HybridSearch:
             filter: 메타데이터 필터 (예: {'metadata.category': 'dating'})
             top_k: 반환할 최대 문서 수
         """
-        if not self.documents:
+        return self.search_batch([query], [query_embedding], filter, top_k)[0]
+
+    def search_batch(
+        self,
+        queries: List[str],
+        query_embeddings: List[List[float]],
+        filter: Dict[str, Any] = None,
+        top_k: int = 5
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        여러 질의를 한 번에 하이브리드 검색
+        벡터 점수는 행렬-행렬 곱 한 번으로, BM25 점수는 단어별 포스팅을 한 번씩만 읽어 계산합니다.
+        Args:
+            queries: 검색 쿼리 리스트
+            query_embeddings: 쿼리 임베딩 리스트
+            filter: 모든 질의에 공통으로 적용할 메타데이터 필터
+            top_k: 질의별 반환할 최대 문서 수
+        Returns:
+            질의 순서대로의 검색 결과 리스트
+        """
+        if not queries:
             return []
+        if not len(self):
+            return [[] for _ in queries]
 
-        # 필터 적용을 위한 문서 인덱스 찾기
-        valid_indices = []
-        if filter:
-            for i, meta in enumerate(self.metadata):
-                is_valid = True
-                for key, value in filter.items():
-                    # metadata.category -> metadata['category']
-                    key_parts = key.split('.')
-                    current = meta
-                    for part in key_parts[1:]:  # metadata. 제외
-                        if isinstance(current, dict) and part in current:
-                            current = current[part]
-                        else:
-                            is_valid = False
-                            break
-                    
-                    if isinstance(value, dict):  # $in 같은 연산자 처리
-                        if '$in' in value and current not in value['$in']:
-                            is_valid = False
-                    elif current != value:
-                        is_valid = False
-                
-                if is_valid:
-                    valid_indices.append(i)
+        valid_indices = self._filter_rows(filter)
+        if not len(valid_indices):
+            return [[] for _ in queries]
+
+        token_lists = [query.split() for query in queries]
+        query_vectors = self._normalize(np.asarray(query_embeddings, dtype=np.float32))
+
+        # 검색 대상이 많으면 후보만 모아 다시 정렬
+        if len(valid_indices) > self.ann_threshold and self.ivf is not None:
+            return [
+                self._rerank(tokens, query_vector, candidates, top_k)
+                for tokens, query_vector, candidates in zip(
+                    token_lists, query_vectors, self._candidates(token_lists, query_vectors, valid_indices)
+                )
+            ]
+
+        # BM25 점수 계산 (질의 단어 포스팅 중 필터된 행만 계산)
+        bm25_scores = self.bm25.get_scores_batch(token_lists, valid_indices)
+
+        # 벡터 유사도 계산 (정규화된 행렬과의 행렬-행렬 곱 = 코사인 유사도)
+        if len(valid_indices) == len(self.documents):
+            vector_scores = query_vectors @ self.embeddings.T
         else:
-            valid_indices = list(range(len(self.documents)))
+            vector_scores = query_vectors @ self.embeddings[valid_indices].T
 
-        if not valid_indices:
+        final_scores = self._fuse(bm25_scores, vector_scores)
+        return [
+            self._results(scores, indices, valid_indices, query_vector_scores)
+            for scores, query_vector_scores, indices in zip(
+                final_scores, vector_scores, self._top_k(final_scores, top_k)
+            )
+        ]
+
+    def _candidates(
+        self,
+        token_lists: List[List[str]],
+        query_vectors: np.ndarray,
+        valid_indices: np.ndarray
+    ) -> List[np.ndarray]:
+        """
+        질의별 후보 행 생성
+        - 벡터 후보: 가까운 IVF 군집의 행 중 코사인 유사도 상위 vector_candidates개
+        - BM25 후보: 질의 단어를 포함한 행 중 BM25 점수 상위 bm25_candidates개
+        Returns:
+            질의별 두 후보의 합집합 (오름차순 행 번호)
+        """
+        mask = np.zeros(len(self.documents), dtype=bool)
+        mask[valid_indices] = True
+        probed = self.ivf.probe(query_vectors, self.nprobe, mask, self.vector_candidates)
+
+        candidates = []
+        for tokens, query_vector, rows in zip(token_lists, query_vectors, probed):
+            vector_scores = self.embeddings[rows] @ query_vector
+            vector_rows = rows[self._top_k(vector_scores[None], self.vector_candidates)[0]]
+
+            matched = self.bm25.matching_rows(tokens)
+            matched = matched[mask[matched]]
+            bm25_scores = self.bm25.get_scores(tokens, matched)
+            bm25_rows = matched[self._top_k(bm25_scores[None], self.bm25_candidates)[0]]
+
+            candidates.append(np.union1d(vector_rows, bm25_rows))
+        return candidates
+
+    def _rerank(
+        self,
+        tokens: List[str],
+        query_vector: np.ndarray,
+        candidates: np.ndarray,
+        top_k: int
+    ) -> List[Dict[str, Any]]:
+        """
+        후보 행만 정확한 하이브리드 점수로 다시 정렬 (점수 정규화도 후보 안에서 수행)
+        """
+        if not len(candidates):
             return []
+        bm25_scores = self.bm25.get_scores_batch([tokens], candidates)
+        vector_scores = (self.embeddings[candidates] @ query_vector)[None]
+        final_scores = self._fuse(bm25_scores, vector_scores)
+        return self._results(final_scores[0], self._top_k(final_scores, top_k)[0], candidates, vector_scores[0])
 
-        # 필터링된 문서들만 사용
-        filtered_docs = [self.documents[i] for i in valid_indices]
-        filtered_embeddings = [self.embeddings[i] for i in valid_indices]
-        
-        # BM25 점수 계산
-        tokenized_query = query.split()
-        bm25_scores = self.bm25.get_scores(tokenized_query)
-        bm25_scores = [bm25_scores[i] for i in valid_indices]
-        
-        # 벡터 유사도 계산 (코사인 유사도)
-        vector_scores = []
-        query_embedding = np.array(query_embedding)
-        for doc_embedding in filtered_embeddings:
-            similarity = np.dot(query_embedding, doc_embedding) / (
-                np.linalg.norm(query_embedding) * np.linalg.norm(doc_embedding)
-            )
-            vector_scores.append(similarity)
-        
-        # 점수 정규화
-        if bm25_scores:
-            bm25_scores = np.array(bm25_scores)
-            bm25_scores = (bm25_scores - bm25_scores.min()) / (bm25_scores.max() - bm25_scores.min() + 1e-6)
-        
-        if vector_scores:
-            vector_scores = np.array(vector_scores)
-            vector_scores = (vector_scores - vector_scores.min()) / (vector_scores.max() - vector_scores.min() + 1e-6)
-        
-        # 최종 점수 계산
-        final_scores = self.alpha * bm25_scores + (1 - self.alpha) * vector_scores
-        
-        # 상위 k개 결과 반환
-        top_indices = np.argsort(final_scores)[-top_k:][::-1]
-        
+    def _fuse(self, bm25_scores: np.ndarray, vector_scores: np.ndarray) -> np.ndarray:
+        """
+        BM25와 벡터 점수를 질의별 최소/최대로 정규화한 뒤 alpha로 가중합
+        """
+        return (
+            self.alpha * self._min_max(bm25_scores)
+            + (1 - self.alpha) * self._min_max(vector_scores)
+        )
+
+    def _results(
+        self, scores: np.ndarray, indices: np.ndarray, rows: np.ndarray, vector_scores: np.ndarray
+    ) -> List[Dict[str, Any]]:
+        """
+        점수 열 번호를 검색 결과로 변환 (rows: 열 번호 -> 행 번호)
+        similarity는 질의 안에서 정규화한 결합 점수(순위용), vector_similarity는 코사인 유사도
+        """
         results = []
-        for idx in top_indices:
-            original_idx = valid_indices[idx]
+        for idx in indices:
+            original_idx = rows[idx]
             results.append({
+                'id': self.ids[original_idx],
                 'content': self.documents[original_idx],
                 'metadata': self.metadata[original_idx],
-                'similarity': float(final_scores[idx])
+                'similarity': float(scores[idx]),
+                'vector_similarity': float(vector_scores[idx])
             })
-        
         return results
+
+    @staticmethod
+    def _min_max(scores: np.ndarray) -> np.ndarray:
+        """
+        행(질의)별 최소-최대 정규화
+        """
+        minimum = scores.min(axis=1, keepdims=True)
+        maximum = scores.max(axis=1, keepdims=True)
+        return (scores - minimum) / (maximum - minimum + 1e-6)
+
+    @staticmethod
+    def _top_k(scores: np.ndarray, top_k: int) -> np.ndarray:
+        """
+        행(질의)별 점수 상위 k개의 열 번호 (내림차순)
+        argpartition으로 k개만 고른 뒤 그 k개만 정렬합니다.
+        """
+        top_k = min(top_k, scores.shape[1])
+        if top_k <= 0:
+            return np.empty((scores.shape[0], 0), dtype=np.int64)
+        if top_k < scores.shape[1]:
+            candidates = np.argpartition(-scores, top_k - 1, axis=1)[:, :top_k]
+        else:
+            candidates = np.tile(np.arange(scores.shape[1]), (scores.shape[0], 1))
+        candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+        order = np.argsort(-candidate_scores, axis=1, kind='stable')
+        return np.take_along_axis(candidates, order, axis=1)
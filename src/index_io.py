@@ -0,0 +1,84 @@
+import os
+import shutil
+import time
+import uuid
+from pathlib import Path
+from typing import BinaryIO, Callable, Optional
+import pyarrow as pa
+
+# 스냅샷 루트 디렉토리에서 현재 스냅샷 디렉토리 이름을 담는 파일
+SNAPSHOT_POINTER = "CURRENT"
+SNAPSHOT_PREFIX = "snapshot-"
+
+def atomic_write(path: Path, write: Callable[[BinaryIO], None]) -> None:
+    """
+    임시 파일에 쓴 뒤 교체
+    이미 메모리 맵으로 파일을 연 프로세스는 교체 전 파일을 그대로 읽을 수 있습니다.
+    임시 파일 이름은 호출마다 달라서 여러 프로세스가 같은 파일을 써도 서로 덮어쓰지 않습니다.
+    """
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{uuid.uuid4().hex}.tmp")
+    try:
+        with open(tmp_path, "wb") as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+def current_snapshot(directory: str) -> Optional[Path]:
+    """
+    스냅샷 루트의 현재 스냅샷 디렉토리 (없으면 None)
+    """
+    root = Path(directory)
+    try:
+        name = (root / SNAPSHOT_POINTER).read_text().strip()
+    except FileNotFoundError:
+        return None
+    path = root / name
+    return path if name and path.is_dir() else None
+
+def publish_snapshot(
+    directory: str, write: Callable[[Path], None], keep: int = 2, min_age: float = 300.0
+) -> Path:
+    """
+    새 스냅샷 디렉토리에 모두 쓴 뒤 CURRENT 포인터를 교체
+    여러 프로세스가 동시에 저장해도 각자 다른 디렉토리에 쓰므로, 불러오는 쪽은 항상
+    한 프로세스가 끝까지 쓴 스냅샷만 봅니다.
+    Args:
+        directory: 스냅샷 루트 디렉토리
+        write: 새 스냅샷 디렉토리 경로를 받아 내용을 쓰는 함수
+        keep: 현재 스냅샷을 포함해 남길 스냅샷 수
+        min_age: 이 시간(초)이 지나지 않은 스냅샷은 지우지 않음
+                 (교체 직전에 포인터를 읽고 아직 불러오는 중인 프로세스용)
+    Returns:
+        새 스냅샷 디렉토리
+    """
+    root = Path(directory)
+    root.mkdir(parents=True, exist_ok=True)
+    # 이름이 생성 시각 순으로 정렬되도록 나노초 시각을 앞에 둠
+    path = root / f"{SNAPSHOT_PREFIX}{time.time_ns():020d}-{uuid.uuid4().hex[:8]}"
+    try:
+        path.mkdir()
+        write(path)
+        atomic_write(root / SNAPSHOT_POINTER, lambda f: f.write(path.name.encode()))
+    except BaseException:
+        shutil.rmtree(path, ignore_errors=True)
+        raise
+
+    # 현재 스냅샷보다 오래된 것만 정리 (다른 프로세스가 쓰는 중인 더 새 스냅샷은 건드리지 않음)
+    current = current_snapshot(directory)
+    if current is not None:
+        older = sorted(
+            entry for entry in root.iterdir()
+            if entry.is_dir() and entry.name.startswith(SNAPSHOT_PREFIX) and entry.name < current.name
+        )
+        cutoff = time.time() - min_age
+        for entry in older[:max(len(older) - (keep - 1), 0)]:
+            if entry.stat().st_mtime < cutoff:
+                shutil.rmtree(entry, ignore_errors=True)
+    return path
+
+def write_arrow(f: BinaryIO, table: pa.Table) -> None:
+    """Arrow IPC 파일 형식으로 테이블 저장"""
+    with pa.ipc.new_file(f, table.schema) as writer:
+        writer.write_table(table)
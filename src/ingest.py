@@ -0,0 +1,286 @@
+"""
+디렉토리/매니페스트의 문서를 한 번에 등록하는 명령행 도구
+
+    python src/ingest.py docs/ --category work
+    python src/ingest.py --manifest manifest.jsonl --workers 8
+
+- 문서 읽기/청크 분할은 프로세스 풀에서 병렬로 실행
+- 여러 파일의 청크를 모아 임베딩을 한 번에 요청하고, 문서별로 DB에 저장
+- 처리 결과를 체크포인트 파일(JSONL)에 기록하여 중단 후 다시 실행하면 완료된 파일은 건너뜀
+- 파일별 오류는 기록만 하고 나머지 파일은 계속 처리
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+from DocumentLoader import DocumentLoader, file_hash
+
+SUPPORTED_EXTENSIONS = (".pdf", ".docx", ".txt")
+
+def _load_file(path: str, category: str, chunk_size: int, chunk_overlap: int) -> List[Dict[str, Any]]:
+    """파일을 청크로 분할 (작업 프로세스에서 실행, 프로세스 안에서 다시 병렬화하지 않음)"""
+    loader = DocumentLoader(chunk_size=chunk_size, chunk_overlap=chunk_overlap, pdf_workers=1)
+    return loader.process_document(path, category)
+
+def iter_directory(directory: str, category: str) -> Iterator[Dict[str, Any]]:
+    """디렉토리 아래의 지원 파일 (경로 순서)"""
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith(SUPPORTED_EXTENSIONS):
+                yield {"path": os.path.join(root, name), "category": category}
+
+def iter_manifest(manifest_path: str, category: str) -> Iterator[Dict[str, Any]]:
+    """
+    매니페스트 파일의 항목
+    한 줄에 JSON 객체 하나 ({"path": ..., "category": ..., "title": ...}) 또는 파일 경로 하나
+    """
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    with open(manifest_path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            entry = json.loads(line) if line.startswith("{") else {"path": line}
+            entry["path"] = os.path.join(base_dir, entry["path"])
+            entry.setdefault("category", category)
+            yield entry
+
+class Checkpoint:
+    def __init__(self, path: str):
+        """
+        파일별 처리 결과 기록 (JSONL, 한 줄에 파일 하나)
+        Args:
+            path: 체크포인트 파일 경로 (없으면 새로 만듦)
+        """
+        self.path = path
+        self.done: Set[str] = set()
+        self.failed: Set[str] = set()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    record = json.loads(line)
+                    if record["status"] == "done":
+                        self.done.add(record["path"])
+                        self.failed.discard(record["path"])
+                    else:
+                        self.failed.add(record["path"])
+        self._file = open(path, "a", encoding="utf-8")
+
+    def record(self, path: str, status: str, **fields) -> None:
+        """처리 결과 한 줄 추가 (바로 디스크에 씀)"""
+        record = {"path": path, "status": status, "at": datetime.now().isoformat(), **fields}
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+        if status == "done":
+            self.done.add(path)
+            self.failed.discard(path)
+        else:
+            self.failed.add(path)
+
+    def close(self) -> None:
+        self._file.close()
+
+class Progress:
+    def __init__(self, total: int, report_interval: float):
+        """
+        처리량 집계 및 주기적 출력
+        Args:
+            total: 처리할 파일 수
+            report_interval: 진행 상황 출력 간격 (초)
+        """
+        self.total = total
+        self.report_interval = report_interval
+        self.files = 0
+        self.failed = 0
+        self.chunks = 0
+        self.started = time.monotonic()
+        self._last_report = self.started
+
+    def update(self, chunks: int = 0, failed: bool = False) -> None:
+        """파일 하나 처리 완료"""
+        self.files += 1
+        self.chunks += chunks
+        self.failed += failed
+        if time.monotonic() - self._last_report >= self.report_interval:
+            self.report()
+
+    def report(self, final: bool = False) -> None:
+        """처리량 출력 (파일/s, 청크/s)"""
+        self._last_report = time.monotonic()
+        elapsed = max(self._last_report - self.started, 1e-9)
+        label = "완료" if final else "진행"
+        print(
+            f"[{label}] {self.files}/{self.total} 파일 (실패 {self.failed}), {self.chunks} 청크, "
+            f"{elapsed:.1f}s | {self.files / elapsed:.2f} 파일/s, {self.chunks / elapsed:.1f} 청크/s",
+            flush=True,
+        )
+
+def ingest(
+    entries: List[Dict[str, Any]],
+    checkpoint: Checkpoint,
+    workers: int,
+    chunk_size: int = 1500,
+    chunk_overlap: int = 200,
+    report_interval: float = 10.0,
+    retry_failed: bool = True,
+) -> Progress:
+    """
+    문서 일괄 등록
+    Args:
+        entries: 등록할 파일 ({"path", "category", "title"(선택)})
+        checkpoint: 처리 결과 기록 (완료된 파일은 건너뜀)
+        workers: 청크 분할 프로세스 수
+        retry_failed: 이전에 실패한 파일도 다시 시도할지 여부
+    Returns:
+        처리량 집계
+    """
+    from qa import QASystem
+
+    pending = []
+    for entry in entries:
+        path = os.path.abspath(entry["path"])
+        if path in checkpoint.done or (not retry_failed and path in checkpoint.failed):
+            continue
+        pending.append({**entry, "path": path})
+
+    progress = Progress(len(pending), report_interval)
+    if not pending:
+        progress.report(final=True)
+        return progress
+
+    qa_system = QASystem()
+    # 작은 파일이 많아도 임베딩 요청이 꽉 차도록 여러 파일의 청크를 모아서 처리
+    group: List[Tuple[Dict[str, Any], List[Dict[str, Any]]]] = []
+    group_chunks = 0
+
+    def store_group() -> None:
+        nonlocal group, group_chunks
+        if not group:
+            return
+        # 묶음 전체의 임베딩을 한 번에 만들어 캐시에 저장 (실패하면 파일별 처리에서 재시도)
+        try:
+            qa_system.prefetch_embeddings(
+                [chunk["content"] for _, chunks in group for chunk in chunks]
+            )
+        except Exception as e:
+            print(
+                f"[경고] 묶음 임베딩 생성 실패, 파일별로 다시 시도합니다: {type(e).__name__}: {e}",
+                file=sys.stderr, flush=True,
+            )
+        for entry, chunks in group:
+            store_file(entry, chunks)
+        group = []
+        group_chunks = 0
+
+    def store_file(entry: Dict[str, Any], chunks: List[Dict[str, Any]]) -> None:
+        path = entry["path"]
+        file_name = os.path.basename(path)
+        metadata = {
+            "title": entry.get("title") or os.path.splitext(file_name)[0],
+            "category": entry["category"],
+            "created_at": datetime.now().isoformat(),
+            "original_filename": file_name,
+        }
+        try:
+            metadata["file_hash"] = file_hash(path)
+            doc_id = qa_system.add_documents(chunks, metadata=metadata)
+        except Exception as e:
+            fail(path, e)
+            return
+        checkpoint.record(path, "done", doc_id=doc_id, chunks=len(chunks))
+        progress.update(chunks=len(chunks))
+
+    def fail(path: str, error: Exception) -> None:
+        checkpoint.record(path, "failed", error=f"{type(error).__name__}: {error}")
+        progress.update(failed=True)
+        print(f"[실패] {path}: {error}", file=sys.stderr, flush=True)
+
+    # 분할 결과가 메모리에 쌓이지 않도록 진행 중인 파일 수를 제한 (결과는 입력 순서대로 처리)
+    context = mp.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        remaining = iter(pending)
+        in_flight = deque()
+
+        def submit_next() -> None:
+            entry = next(remaining, None)
+            if entry is not None:
+                in_flight.append((entry, executor.submit(
+                    _load_file, entry["path"], entry["category"], chunk_size, chunk_overlap
+                )))
+
+        for _ in range(workers * 2):
+            submit_next()
+
+        while in_flight:
+            entry, future = in_flight.popleft()
+            submit_next()
+            try:
+                chunks = future.result()
+            except Exception as e:
+                fail(entry["path"], e)
+                continue
+            if not chunks:
+                fail(entry["path"], ValueError("추출된 텍스트가 없습니다."))
+                continue
+
+            group.append((entry, chunks))
+            group_chunks += len(chunks)
+            if group_chunks >= qa_system.ingest_batch_size:
+                store_group()
+
+        store_group()
+
+    progress.report(final=True)
+    return progress
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="디렉토리/매니페스트의 문서를 일괄 등록합니다.")
+    parser.add_argument("paths", nargs="*", help="등록할 파일 또는 디렉토리")
+    parser.add_argument("--manifest", help="등록할 파일 목록 (JSONL 또는 한 줄에 경로 하나)")
+    parser.add_argument("--category", default="general", help="기본 카테고리 (기본값: general)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="청크 분할 프로세스 수")
+    parser.add_argument("--checkpoint", default="ingest_checkpoint.jsonl", help="체크포인트 파일 경로")
+    parser.add_argument("--skip-failed", action="store_true", help="이전에 실패한 파일은 다시 시도하지 않음")
+    parser.add_argument("--chunk-size", type=int, default=1500, help="청크 크기 (문자 수)")
+    parser.add_argument("--chunk-overlap", type=int, default=200, help="청크 간 중복 크기 (문자 수)")
+    parser.add_argument("--report-interval", type=float, default=10.0, help="진행 상황 출력 간격 (초)")
+    args = parser.parse_args(argv)
+
+    if not args.paths and not args.manifest:
+        parser.error("등록할 경로 또는 --manifest가 필요합니다.")
+
+    entries: List[Dict[str, Any]] = []
+    if args.manifest:
+        entries.extend(iter_manifest(args.manifest, args.category))
+    for path in args.paths:
+        if os.path.isdir(path):
+            entries.extend(iter_directory(path, args.category))
+        else:
+            entries.append({"path": path, "category": args.category})
+
+    checkpoint = Checkpoint(args.checkpoint)
+    try:
+        progress = ingest(
+            entries,
+            checkpoint,
+            workers=max(1, args.workers),
+            chunk_size=args.chunk_size,
+            chunk_overlap=args.chunk_overlap,
+            report_interval=args.report_interval,
+            retry_failed=not args.skip_failed,
+        )
+    finally:
+        checkpoint.close()
+    return 1 if progress.failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
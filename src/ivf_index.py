@@ -0,0 +1,224 @@
+import json
+from pathlib import Path
+from typing import Dict, List, Optional
+import numpy as np
+from index_io import atomic_write
+
+class IVFIndex:
+    def __init__(self, nlist: int, merge_threshold: int = 1024):
+        """
+        벡터 후보 생성을 위한 IVF(역파일) 인덱스
+        정규화된 임베딩을 코사인 k-means로 nlist개 군집으로 나누고, 질의와 가까운 군집의
+        행 번호만 후보로 돌려줍니다. 후보의 정확한 점수는 호출하는 쪽에서 계산합니다.
+        Args:
+            nlist: 군집 수
+            merge_threshold: 대기 행을 CSR에 병합하는 행 수
+        """
+        self.nlist = nlist
+        self.merge_threshold = merge_threshold
+        self.centroids = np.empty((0, 0), dtype=np.float32)
+        self.trained_rows = 0  # 학습 당시 행 수 (재학습 시점 판단용)
+        self.num_rows = 0  # 배정된 가장 큰 행 번호 + 1
+
+        # 군집 순 CSR (군집별 행 번호는 오름차순)
+        self._indptr = np.zeros(nlist + 1, dtype=np.int64)
+        self._rows = np.empty(0, dtype=np.int64)
+        # CSR에 아직 병합되지 않은 행: 군집 번호 -> 행 리스트
+        self._pending: Dict[int, List[int]] = {}
+        self._pending_count = 0
+
+    @staticmethod
+    def _nearest(embeddings: np.ndarray, rows: np.ndarray, centroids: np.ndarray,
+                 chunk_size: int = 65536) -> np.ndarray:
+        """행별로 가장 가까운(내적이 가장 큰) 군집 번호"""
+        labels = np.empty(len(rows), dtype=np.int64)
+        for start in range(0, len(rows), chunk_size):
+            chunk = np.asarray(embeddings[rows[start:start + chunk_size]], dtype=np.float32)
+            labels[start:start + chunk_size] = np.argmax(chunk @ centroids.T, axis=1)
+        return labels
+
+    def train(self, embeddings: np.ndarray, rows: np.ndarray, iterations: int = 10,
+              sample_size: Optional[int] = None, seed: int = 0) -> None:
+        """
+        군집 중심 학습 (구면 k-means)
+        Args:
+            embeddings: L2 정규화된 임베딩 행렬
+            rows: 학습에 사용할 행 번호
+            iterations: k-means 반복 횟수
+            sample_size: 학습 표본 크기 (None이면 군집당 256개)
+            seed: 표본/초기 중심 선택 시드
+        """
+        rng = np.random.default_rng(seed)
+        rows = np.asarray(rows, dtype=np.int64)
+        self.trained_rows = len(rows)
+        sample_size = sample_size or self.nlist * 256
+        if len(rows) > sample_size:
+            rows = np.sort(rng.choice(rows, sample_size, replace=False))
+        sample = np.asarray(embeddings[rows], dtype=np.float32)
+
+        nlist = min(self.nlist, len(sample))
+        centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+        sample_rows = np.arange(len(sample))
+        for _ in range(iterations):
+            labels = self._nearest(sample, sample_rows, centroids)
+            order = np.argsort(labels, kind="stable")
+            counts = np.bincount(labels, minlength=nlist)
+            nonempty = np.flatnonzero(counts)
+            starts = np.concatenate(([0], np.cumsum(counts[nonempty])[:-1]))
+            centroids[nonempty] = np.add.reduceat(sample[order], starts, axis=0)
+            # 빈 군집은 임의의 표본으로 다시 시작
+            empty = np.flatnonzero(counts == 0)
+            if len(empty):
+                centroids[empty] = sample[rng.choice(len(sample), len(empty), replace=False)]
+            norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            centroids /= norms
+
+        self.nlist = nlist
+        self.centroids = centroids
+        self._indptr = np.zeros(nlist + 1, dtype=np.int64)
+        self._rows = np.empty(0, dtype=np.int64)
+        self._pending = {}
+        self._pending_count = 0
+        self.num_rows = 0
+
+    def add(self, embeddings: np.ndarray, rows: np.ndarray) -> None:
+        """
+        행을 가장 가까운 군집에 배정
+        Args:
+            embeddings: L2 정규화된 임베딩 행렬 (행 번호로 접근)
+            rows: 배정할 행 번호 (기존 행보다 큰 오름차순)
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        if not len(rows):
+            return
+        labels = self._nearest(embeddings, rows, self.centroids)
+        for label, row in zip(labels.tolist(), rows.tolist()):
+            self._pending.setdefault(label, []).append(row)
+        self._pending_count += len(rows)
+        self.num_rows = max(self.num_rows, int(rows[-1]) + 1)
+
+        if self._pending_count >= max(self.merge_threshold, len(self._rows) // 8):
+            self._merge_pending()
+
+    def _merge_pending(self) -> None:
+        """
+        대기 행을 CSR에 병합
+        대기 행 번호는 항상 CSR의 행 번호보다 크므로 군집별로 뒤에 붙이면 됩니다.
+        """
+        if not self._pending:
+            return
+        frozen_counts = np.diff(self._indptr)
+        pending_counts = np.zeros(self.nlist, dtype=np.int64)
+        for label, rows in self._pending.items():
+            pending_counts[label] = len(rows)
+
+        indptr = np.zeros(self.nlist + 1, dtype=np.int64)
+        np.cumsum(frozen_counts + pending_counts, out=indptr[1:])
+        merged = np.empty(indptr[-1], dtype=np.int64)
+        for label in range(self.nlist):
+            start = indptr[label]
+            merged[start:start + frozen_counts[label]] = self._rows[self._indptr[label]:self._indptr[label + 1]]
+            if pending_counts[label]:
+                merged[start + frozen_counts[label]:indptr[label + 1]] = self._pending[label]
+
+        self._indptr, self._rows = indptr, merged
+        self._pending = {}
+        self._pending_count = 0
+
+    def compact(self, keep_rows: np.ndarray) -> None:
+        """
+        남길 행만 두고 0부터 다시 번호 매김
+        Args:
+            keep_rows: 남길 행 번호 (오름차순)
+        """
+        self._merge_pending()
+        keep_rows = np.asarray(keep_rows, dtype=np.int64)
+        size = max(self.num_rows, int(keep_rows[-1]) + 1 if len(keep_rows) else 0)
+        remap = np.full(size, -1, dtype=np.int64)
+        remap[keep_rows] = np.arange(len(keep_rows))
+
+        labels = np.repeat(np.arange(self.nlist), np.diff(self._indptr))
+        rows = remap[self._rows]
+        kept = rows >= 0
+        counts = np.bincount(labels[kept], minlength=self.nlist)
+        self._indptr = np.zeros(self.nlist + 1, dtype=np.int64)
+        np.cumsum(counts, out=self._indptr[1:])
+        self._rows = rows[kept]
+        self.num_rows = len(keep_rows)
+
+    def _list_rows(self, label: int) -> np.ndarray:
+        """군집의 행 번호 (CSR 구간과 대기 행)"""
+        rows = self._rows[self._indptr[label]:self._indptr[label + 1]]
+        if label in self._pending:
+            rows = np.concatenate((rows, np.asarray(self._pending[label], dtype=np.int64)))
+        return rows
+
+    def probe(self, query_vectors: np.ndarray, nprobe: int, mask: np.ndarray,
+              min_count: int = 0) -> List[np.ndarray]:
+        """
+        질의별 후보 행 조회
+        가까운 군집부터 최소 nprobe개를 탐색하고, mask를 통과한 행이 min_count개가
+        안 되면 더 탐색합니다 (좁은 필터에서도 후보가 부족하지 않도록).
+        Args:
+            query_vectors: L2 정규화된 질의 벡터 (질의 수, 차원)
+            nprobe: 탐색할 최소 군집 수
+            mask: 후보가 될 수 있는 행 표시 (필터 통과 + 삭제되지 않은 행)
+            min_count: 질의별 최소 후보 수
+        Returns:
+            질의별 후보 행 번호 배열 (오름차순)
+        """
+        order = np.argsort(-(query_vectors @ self.centroids.T), axis=1)
+        candidates = []
+        for labels in order:
+            collected = []
+            count = 0
+            for probed, label in enumerate(labels):
+                rows = self._list_rows(label)
+                rows = rows[mask[rows]]
+                collected.append(rows)
+                count += len(rows)
+                if probed + 1 >= nprobe and count >= min_count:
+                    break
+            candidates.append(np.sort(np.concatenate(collected)))
+        return candidates
+
+    def save(self, directory: str) -> None:
+        """
+        인덱스를 디렉토리에 저장 (군집 중심과 CSR은 .npy)
+        """
+        path = Path(directory)
+        path.mkdir(parents=True, exist_ok=True)
+        self._merge_pending()
+        arrays = {"centroids": self.centroids, "indptr": self._indptr, "rows": self._rows}
+        for name, array in arrays.items():
+            atomic_write(path / f"ivf_{name}.npy", lambda f, a=array: np.save(f, a))
+
+        stats = {
+            "nlist": self.nlist,
+            "merge_threshold": self.merge_threshold,
+            "trained_rows": self.trained_rows,
+            "num_rows": self.num_rows,
+        }
+        atomic_write(path / "ivf.json", lambda f: f.write(json.dumps(stats).encode()))
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> "IVFIndex":
+        """
+        저장된 인덱스 불러오기
+        Args:
+            directory: save로 저장한 디렉토리
+            mmap: CSR 배열을 메모리 맵으로 열지 여부
+        """
+        path = Path(directory)
+        with open(path / "ivf.json") as f:
+            stats = json.load(f)
+
+        index = cls(nlist=stats["nlist"], merge_threshold=stats["merge_threshold"])
+        index.trained_rows = stats["trained_rows"]
+        index.num_rows = stats["num_rows"]
+        index.centroids = np.load(path / "ivf_centroids.npy")
+        mmap_mode = "r" if mmap else None
+        index._indptr = np.load(path / "ivf_indptr.npy", mmap_mode=mmap_mode)
+        index._rows = np.load(path / "ivf_rows.npy", mmap_mode=mmap_mode)
+        return index
@@ -0,0 +1,93 @@
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+import numpy as np
+
+class MetadataIndex:
+    def __init__(self):
+        """
+        메타데이터 역색인 (필드 경로 -> 값 -> 행 번호 집합)
+        중첩 딕셔너리는 'a.b' 형태의 경로로 펼쳐서 색인합니다.
+        """
+        self._values: Dict[str, Dict[Any, Set[int]]] = {}  # 경로 -> 해시 가능한 값 -> 행
+        self._present: Dict[str, Set[int]] = {}  # 경로 -> 해당 경로가 있는 행
+
+    @staticmethod
+    def _flatten(metadata: Dict[str, Any], prefix: str = "") -> Iterator[Tuple[str, Any]]:
+        """메타데이터를 (경로, 값) 쌍으로 펼침"""
+        for key, value in metadata.items():
+            # 점이 들어간 키는 필터 경로로 접근할 수 없으므로 색인하지 않음
+            if not isinstance(key, str) or "." in key:
+                continue
+            path = prefix + key
+            yield path, value
+            if isinstance(value, dict):
+                yield from MetadataIndex._flatten(value, path + ".")
+
+    @staticmethod
+    def _hashable(value: Any) -> bool:
+        try:
+            hash(value)
+        except TypeError:
+            return False
+        return True
+
+    def add(self, row: int, metadata: Dict[str, Any]) -> None:
+        """행의 메타데이터 색인"""
+        for path, value in self._flatten(metadata):
+            self._present.setdefault(path, set()).add(row)
+            if self._hashable(value):
+                self._values.setdefault(path, {}).setdefault(value, set()).add(row)
+
+    def remove(self, row: int, metadata: Dict[str, Any]) -> None:
+        """행의 메타데이터 색인 제거"""
+        for path, value in self._flatten(metadata):
+            self._present[path].discard(row)
+            if self._hashable(value):
+                rows = self._values[path][value]
+                rows.discard(row)
+                if not rows:
+                    del self._values[path][value]
+
+    def lookup(self, filter: Dict[str, Any]) -> Optional[np.ndarray]:
+        """
+        필터에 맞는 행 번호 조회
+        Args:
+            filter: 메타데이터 필터 (예: {'metadata.category': 'dating'},
+                    {'metadata.category': {'$in': ['dating', 'work']}})
+        Returns:
+            오름차순 행 번호 배열, 색인으로 처리할 수 없는 필터면 None
+            (빈 필터는 조건이 없으므로 None, 호출하는 쪽에서 전체 행으로 처리)
+        """
+        if not filter:
+            return None
+
+        conditions: List[Set[int]] = []
+        for key, value in filter.items():
+            # metadata.category -> category
+            path = ".".join(key.split(".")[1:])
+            if not path:
+                return None
+
+            if isinstance(value, dict):  # $in 같은 연산자 처리
+                if "$in" in value:
+                    if not all(self._hashable(item) for item in value["$in"]):
+                        return None
+                    values = self._values.get(path, {})
+                    rows: Set[int] = set()
+                    for item in value["$in"]:
+                        rows |= values.get(item, set())
+                else:
+                    rows = self._present.get(path, set())
+            elif self._hashable(value):
+                rows = self._values.get(path, {}).get(value, set())
+            else:
+                return None
+            conditions.append(rows)
+
+        # 가장 작은 집합부터 교집합 계산
+        conditions.sort(key=len)
+        result = set(conditions[0])
+        for rows in conditions[1:]:
+            result &= rows
+            if not result:
+                break
+        return np.sort(np.fromiter(result, dtype=np.int64, count=len(result)))
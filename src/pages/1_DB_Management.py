@@ -4,15 +4,40 @@ from typing import List, Dict, Any
 import pandas as pd
 from datetime import datetime
 import tempfile
-from DocumentLoader import DocumentLoader
+import shutil
+from DocumentLoader import DocumentLoader, file_hash
 import os
 
+# 한 페이지에 표시할 문서/청크 수
+DOCUMENT_PAGE_SIZE = 20
+CHUNK_PAGE_SIZE = 20
+
 def initialize_session_state():
     """세션 상태 초기화"""
     if 'qa_system' not in st.session_state:
         st.session_state.qa_system = QASystem()
     if 'selected_document' not in st.session_state:
         st.session_state.selected_document = None
+    # 키셋 페이지네이션 커서 스택 (첫 페이지는 None)
+    if 'document_cursors' not in st.session_state:
+        st.session_state.document_cursors = [None]
+    if 'chunk_cursors' not in st.session_state:
+        st.session_state.chunk_cursors = [None]
+
+def render_pagination(state_key: str, has_next: bool, next_cursor: Any):
+    """이전/다음 페이지 버튼 렌더링"""
+    cursors = st.session_state[state_key]
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col1:
+        if len(cursors) > 1 and st.button("← 이전", key=f"{state_key}_prev"):
+            cursors.pop()
+            st.rerun()
+    with col2:
+        st.caption(f"{len(cursors)} 페이지")
+    with col3:
+        if has_next and st.button("다음 →", key=f"{state_key}_next"):
+            cursors.append(next_cursor)
+            st.rerun()
 
 def format_date(date_str: str) -> str:
     """날짜 포맷팅"""
@@ -50,6 +75,7 @@ def render_document_list(docs: List[Dict[str, Any]], categories: Dict[str, str])
                 st.markdown(f"**{doc['title']}**")
                 if st.button("상세보기", key=f"view_{doc['id']}"):
                     st.session_state.selected_document = doc['id']
+                    st.session_state.chunk_cursors = [None]
                     st.rerun()
             
             # 카테고리와 등록일
@@ -89,6 +115,7 @@ def render_document_detail(doc_id: str, categories: Dict[str, str]):
     # 뒤로가기 버튼
     if st.button("← 목록으로"):
         st.session_state.selected_document = None
+        st.session_state.chunk_cursors = [None]
         st.rerun()
     
     # 문서 기본 정보
@@ -101,9 +128,17 @@ def render_document_detail(doc_id: str, categories: Dict[str, str]):
         st.markdown(f"**등록일**: {format_date(doc['created_at'])}")
         st.markdown(f"**총 청크 수**: {doc['total_chunks']}")
     
+    render_update_form(doc_id)
+    
     # 청크 목록
     st.subheader("청크 목록")
-    chunks = st.session_state.qa_system.list_document_chunks(doc_id)
+    chunks = st.session_state.qa_system.list_document_chunks(
+        doc_id,
+        limit=CHUNK_PAGE_SIZE + 1,
+        after_index=st.session_state.chunk_cursors[-1]
+    )
+    has_next = len(chunks) > CHUNK_PAGE_SIZE
+    chunks = chunks[:CHUNK_PAGE_SIZE]
     
     for chunk in chunks:
         with st.expander(f"청크 {chunk['chunk_index'] + 1}/{doc['total_chunks']}"):
@@ -132,6 +167,49 @@ def render_document_detail(doc_id: str, categories: Dict[str, str]):
                         st.success("청크가 삭제되었습니다.")
                         st.rerun()
 
+    if chunks:
+        render_pagination("chunk_cursors", has_next, chunks[-1]['chunk_index'])
+
+def render_update_form(doc_id: str):
+    """수정된 파일로 문서 갱신 폼 렌더링 (바뀐 청크만 다시 임베딩)"""
+    with st.expander("수정된 파일로 업데이트"):
+        with st.form(f"update_form_{doc_id}"):
+            uploaded_file = st.file_uploader(
+                "파일 선택",
+                type=["pdf", "txt", "docx"],
+                help="내용이 같은 청크는 그대로 두고, 바뀐 청크만 다시 임베딩합니다."
+            )
+            submitted = st.form_submit_button("업데이트")
+        
+        if submitted and uploaded_file:
+            with st.spinner("문서 갱신 중..."):
+                with tempfile.NamedTemporaryFile(
+                    delete=False,
+                    suffix=f'.{uploaded_file.name.split(".")[-1]}'
+                ) as tmp_file:
+                    uploaded_file.seek(0)
+                    shutil.copyfileobj(uploaded_file, tmp_file)
+                    file_path = tmp_file.name
+                
+                try:
+                    result = st.session_state.qa_system.update_document_from_file(
+                        doc_id, file_path, file_name=uploaded_file.name
+                    )
+                except Exception as e:
+                    st.error(f"문서 갱신 중 오류가 발생했습니다: {str(e)}")
+                    return
+                finally:
+                    os.remove(file_path)
+            
+            if result["unchanged"]:
+                st.info("기존 파일과 같아 변경 사항이 없습니다.")
+            else:
+                st.success(
+                    f"문서가 갱신되었습니다. (유지 {result['kept']}, 추가 {result['added']}, "
+                    f"삭제 {result['removed']} 청크)"
+                )
+                st.session_state.chunk_cursors = [None]
+
 def render_upload_form(categories: Dict[str, str]):
     """문서 업로드 폼 렌더링"""
     with st.form("upload_form"):
@@ -162,29 +240,35 @@ def render_upload_form(categories: Dict[str, str]):
         
         if submitted and uploaded_file:
             with st.spinner("문서 처리 중..."):
+                # 업로드 파일을 통째로 복사하지 않고 임시 파일로 흘려 씀
                 with tempfile.NamedTemporaryFile(
                     delete=False, 
                     suffix=f'.{uploaded_file.name.split(".")[-1]}'
                 ) as tmp_file:
-                    tmp_file.write(uploaded_file.getvalue())
+                    uploaded_file.seek(0)
+                    shutil.copyfileobj(uploaded_file, tmp_file)
                     file_path = tmp_file.name
 
                 try:
                     loader = DocumentLoader()
-                    chunks = loader.process_document(file_path)
+                    # 페이지를 읽는 대로 청크를 만들어 배치 단위로 임베딩/저장
+                    chunks = loader.iter_chunks(file_path, category)
                     
                     metadata = {
                         "title": title or default_title,
                         "category": category,
                         "created_at": datetime.now().isoformat(),
-                        "original_filename": uploaded_file.name
+                        "original_filename": uploaded_file.name,
+                        "file_hash": file_hash(file_path)
                     }
                     
-                    st.session_state.qa_system.add_documents(chunks, metadata=metadata)
+                    st.session_state.qa_system.add_document_stream(chunks, metadata=metadata)
                     st.success("문서가 등록되었습니다.")
                     st.rerun()
                 except Exception as e:
                     st.error(f"문서 처리 중 오류가 발생했습니다: {str(e)}")
+                finally:
+                    os.remove(file_path)
 
 def main():
     st.title("문서 관리")
@@ -208,13 +292,24 @@ def main():
             format_func=lambda x: '전체' if x == '전체' else categories[x]
         )
         
-        # 문서 목록 가져오기
+        # 카테고리가 바뀌면 첫 페이지부터 표시
+        if st.session_state.get('document_list_category') != selected_category:
+            st.session_state.document_list_category = selected_category
+            st.session_state.document_cursors = [None]
+        
+        # 문서 목록 가져오기 (다음 페이지 여부 확인을 위해 1개 더 조회)
         docs = st.session_state.qa_system.list_documents(
-            None if selected_category == '전체' else selected_category
+            None if selected_category == '전체' else selected_category,
+            limit=DOCUMENT_PAGE_SIZE + 1,
+            after_id=st.session_state.document_cursors[-1]
         )
+        has_next = len(docs) > DOCUMENT_PAGE_SIZE
+        docs = docs[:DOCUMENT_PAGE_SIZE]
         
         # 문서 목록 렌더링
         render_document_list(docs, categories)
+        if docs:
+            render_pagination("document_cursors", has_next, docs[-1]['id'])
     
     with tab2:
         render_upload_form(categories)
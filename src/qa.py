@@ -1,23 +1,80 @@
+import hashlib
+import json
+import logging
 import os
-from typing import List, Dict, Any, Optional
-from db import VectorStore
-from openai import OpenAI
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Iterable, Iterator, List, Dict, Any, Optional, Tuple
+from db import VectorStore, INDEX_CHUNK_COLUMNS
+from openai import OpenAI, RateLimitError, APIStatusError, APIConnectionError
 from embedding_cache import EmbeddingCache
+from rate_limiter import get_rate_limiter
+from hybrid_search import HybridSearch
+from index_io import atomic_write, current_snapshot, publish_snapshot
 import google.generativeai as genai
 from dotenv import load_dotenv
 from category_config import CategoryConfig
+from DocumentLoader import DocumentLoader, file_hash
 import re
 
 # .env 파일 로드
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+NO_ANSWER_MESSAGE = "죄송합니다. 관련된 정보를 찾을 수 없습니다."
+ANSWER_SYSTEM_PROMPT = "주어진 컨텍스트를 기반으로 질문에 답변해주세요. 컨텍스트에 없는 내용은 답변하지 마세요."
+
+# 로컬 인덱스 스냅샷의 동기화 기록 파일 (마지막으로 반영한 변경 시각)
+LOCAL_INDEX_SYNC_FILE = "sync.json"
+# 동기화 시 이만큼 겹쳐서 다시 조회 (늦게 커밋되어 더 이른 updated_at을 가진 변경을 놓치지 않도록)
+LOCAL_INDEX_SYNC_MARGIN = timedelta(minutes=10)
+# 청크마다 다른 위치 메타데이터 (문서를 갱신할 때 유지되는 청크에서 새 값으로 교체)
+PAGE_METADATA_KEYS = ("page_start", "page_end")
+
 class QASystem:
-    def __init__(self):
+    # 같은 프로세스의 세션들이 공유하는 로컬 하이브리드 검색 인덱스
+    _local_index: Optional[HybridSearch] = None
+    _local_index_lock = threading.RLock()
+
+    def __init__(
+        self,
+        embedding_workers: int = 4,
+        requests_per_minute: int = 3000,
+        tokens_per_minute: int = 1_000_000,
+        use_local_index: Optional[bool] = None,
+        local_index_dir: Optional[str] = None,
+    ):
+        """
+        질의응답 시스템 초기화
+        Args:
+            embedding_workers: 동시에 처리할 임베딩 배치 요청 수
+            requests_per_minute: 임베딩 API 분당 요청 한도
+            tokens_per_minute: 임베딩 API 분당 토큰 한도
+            use_local_index: 로컬 하이브리드 인덱스로 검색할지 여부 (None이면 LOCAL_INDEX 환경변수)
+            local_index_dir: 로컬 인덱스 스냅샷 디렉토리 (None이면 LOCAL_INDEX_DIR 환경변수)
+        """
         self.vector_store = VectorStore()
         self.category_config = CategoryConfig()
         self.embedding_cache = EmbeddingCache()
         self.model_name = "text-embedding-ada-002"  # OpenAI 임베딩 모델
         self.client = OpenAI()  # OpenAI 클라이언트 초기화
+        # 배치 임베딩 요청 한도 (요청당 입력 개수 / 추정 토큰 수)
+        self.embedding_batch_size = 100
+        self.embedding_batch_tokens = 100_000
+        # 동시 요청 수, 재시도 횟수 및 프로세스 공유 요청 제한기
+        self.embedding_workers = embedding_workers
+        self.embedding_max_retries = 6
+        self.embedding_limiter = get_rate_limiter(
+            self.model_name, requests_per_minute, tokens_per_minute
+        )
+        # 스트리밍 저장 시 한 번에 임베딩/저장할 청크 수 (동시 요청이 모두 찰 만큼)
+        self.ingest_batch_size = self.embedding_batch_size * embedding_workers
 
         # OpenAI API 키 확인
         if not os.environ.get("OPENAI_API_KEY"):
@@ -41,13 +98,295 @@ class QASystem:
         )
         self.chat_session = None
 
+        # 로컬 하이브리드 인덱스 (불러오지 못하면 Supabase 검색 사용)
+        if use_local_index is None:
+            use_local_index = os.environ.get("LOCAL_INDEX", "").lower() in ("1", "true", "yes")
+        self.use_local_index = use_local_index
+        self.local_index_dir = local_index_dir or os.environ.get("LOCAL_INDEX_DIR")
+        # 로컬 인덱스를 준비하거나 검색하지 못한 이유 (화면에 안내하기 위함, 문제가 없으면 None)
+        self.local_index_error: Optional[str] = None
+        if self.use_local_index:
+            try:
+                self.load_local_index()
+            except Exception as e:
+                logger.exception("로컬 인덱스를 불러오지 못해 Supabase 검색을 사용합니다.")
+                self.local_index_error = f"{type(e).__name__}: {e}"
+
+    def load_local_index(self, rebuild: bool = False) -> HybridSearch:
+        """
+        로컬 하이브리드 인덱스 준비 (프로세스당 한 번)
+        스냅샷이 있으면 불러온 뒤 Supabase와 맞추고(_sync_local_index), 스냅샷이 없거나
+        최신 여부를 확인할 수 없으면(동기화 기록이 없거나 읽을 수 없음) 전체 청크로 새로 구축합니다.
+        반영한 변경이 있으면 새 스냅샷을 저장합니다.
+        Args:
+            rebuild: 스냅샷과 기존 인덱스를 무시하고 Supabase에서 다시 구축
+        """
+        with QASystem._local_index_lock:
+            if QASystem._local_index is not None and not rebuild:
+                return QASystem._local_index
+
+            index, watermark = None, None
+            if not rebuild and self.local_index_dir:
+                index, watermark = self._load_local_snapshot()
+            if index is None:
+                index, watermark = HybridSearch(), None
+
+            changes, synced = self._sync_local_index(index, watermark)
+            if self.local_index_dir and synced is not None and (changes or synced != watermark):
+                self._save_local_snapshot(index, synced)
+            QASystem._local_index = index
+            return index
+
+    def _load_local_snapshot(self) -> Tuple[Optional[HybridSearch], Optional[datetime]]:
+        """
+        저장된 스냅샷과 동기화 시각
+        Returns:
+            (인덱스, 동기화 시각), 스냅샷이 없거나 읽을 수 없거나 동기화 기록이 없으면 (None, None)
+        """
+        snapshot = current_snapshot(self.local_index_dir)
+        if snapshot is None:
+            return None, None
+        try:
+            with open(snapshot / LOCAL_INDEX_SYNC_FILE) as f:
+                watermark = json.load(f).get("watermark")
+            if watermark is None:
+                return None, None
+            return HybridSearch.load(str(snapshot)), self._parse_timestamp(watermark)
+        except Exception:
+            logger.exception("로컬 인덱스 스냅샷을 읽지 못해 다시 구축합니다: %s", snapshot)
+            return None, None
+
+    def _save_local_snapshot(self, index: HybridSearch, watermark: datetime) -> None:
+        """
+        새 스냅샷 디렉토리에 인덱스와 동기화 시각을 저장한 뒤 교체
+        (여러 프로세스가 동시에 저장해도 섞이지 않음, 실패해도 메모리의 인덱스로 검색은 계속)
+        """
+        sync_state = json.dumps({"watermark": watermark.isoformat()}).encode()
+
+        def write(path: Path) -> None:
+            index.save(str(path))
+            atomic_write(path / LOCAL_INDEX_SYNC_FILE, lambda f: f.write(sync_state))
+
+        try:
+            publish_snapshot(self.local_index_dir, write)
+        except Exception:
+            logger.exception("로컬 인덱스 스냅샷을 저장하지 못했습니다: %s", self.local_index_dir)
+
+    def _sync_local_index(
+        self, index: HybridSearch, watermark: Optional[datetime]
+    ) -> Tuple[int, Optional[datetime]]:
+        """
+        인덱스를 Supabase 청크와 맞춤
+        watermark가 없으면 전체 청크를 추가하고, 있으면
+        - ID를 비교하여 Supabase에서 삭제된 청크는 제거하고 인덱스에 없는 청크는 추가
+          (삭제는 updated_at으로 알 수 없으므로)
+        - watermark 이후 수정된 청크는 교체하고, 수정된 문서는 제목/카테고리를 반영
+        Args:
+            index: 맞출 인덱스
+            watermark: 인덱스에 반영된 마지막 변경 시각
+        Returns:
+            (반영한 변경 수, 새 동기화 시각: 반영한 행의 가장 늦은 updated_at)
+        """
+        latest = watermark
+
+        def track(value: Optional[str]) -> Optional[datetime]:
+            nonlocal latest
+            if not value:
+                return None
+            timestamp = self._parse_timestamp(value)
+            if latest is None or timestamp > latest:
+                latest = timestamp
+            return timestamp
+
+        def add_rows(rows: List[Dict[str, Any]]) -> int:
+            rows = [row for row in rows if row.get("embedding") is not None]
+            changed = 0
+            for row in rows:
+                updated_at = track(row.get("updated_at"))
+                track((row.get("documents") or {}).get("updated_at"))
+                # 겹쳐서 다시 조회한 행은 이미 반영된 것이므로 변경으로 세지 않음
+                if index.get(row["id"]) is None or watermark is None or (
+                    updated_at is not None and updated_at > watermark
+                ):
+                    changed += 1
+            if rows:
+                index.add_documents(
+                    [row["content"] for row in rows],
+                    [row["embedding"] for row in rows],
+                    [
+                        self._index_metadata(row["document_id"], row["chunk_index"], row.get("documents") or {})
+                        for row in rows
+                    ],
+                    ids=[row["id"] for row in rows],
+                )
+            return changed
+
+        if watermark is None:
+            changes = 0
+            for rows in self.vector_store.iter_chunks(INDEX_CHUNK_COLUMNS):
+                changes += add_rows(rows)
+            return changes, latest
+
+        db_ids = set()
+        for rows in self.vector_store.iter_chunks("id", page_size=1000):
+            db_ids.update(row["id"] for row in rows)
+        index_ids = set(index.find_ids({}))
+        changes = index.remove_documents(list(index_ids - db_ids))
+        changes += add_rows(self.vector_store.get_chunks(sorted(db_ids - index_ids), INDEX_CHUNK_COLUMNS))
+
+        since = self._format_timestamp(watermark - LOCAL_INDEX_SYNC_MARGIN)
+        for rows in self.vector_store.iter_chunks(INDEX_CHUNK_COLUMNS, updated_after=since):
+            changes += add_rows(rows)
+
+        # 제목/카테고리가 바뀐 문서 (청크 행은 그대로이므로 메타데이터만 갱신)
+        after_id = None
+        while True:
+            documents = self.vector_store.list_documents(
+                columns="id, title, category, updated_at", limit=1000, after_id=after_id, updated_after=since
+            )
+            for document in documents:
+                track(document["updated_at"])
+                for chunk_id in index.find_ids({"metadata.document_id": document["id"]}):
+                    metadata = index.get(chunk_id)["metadata"]
+                    if (metadata["title"], metadata["category"]) != (document["title"], document["category"]):
+                        index.update_metadata(
+                            chunk_id, {**metadata, "title": document["title"], "category": document["category"]}
+                        )
+                        changes += 1
+            if len(documents) < 1000:
+                break
+            after_id = documents[-1]["id"]
+
+        return changes, latest
+
+    @staticmethod
+    def _parse_timestamp(value: str) -> datetime:
+        """Supabase 시각 문자열 파싱 (소수점 이하 자릿수가 달라도 처리)"""
+        value = value.replace("Z", "+00:00")
+        value = re.sub(r"\.(\d+)", lambda match: "." + match.group(1)[:6].ljust(6, "0"), value)
+        timestamp = datetime.fromisoformat(value)
+        if timestamp.tzinfo is None:
+            timestamp = timestamp.replace(tzinfo=timezone.utc)
+        return timestamp
+
+    @staticmethod
+    def _format_timestamp(timestamp: datetime) -> str:
+        """Supabase 필터용 UTC 시각 문자열"""
+        return timestamp.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+    @staticmethod
+    def _index_metadata(doc_id: Any, chunk_index: int, document: Dict[str, Any]) -> Dict[str, Any]:
+        """로컬 인덱스에 저장할 청크 메타데이터"""
+        return {
+            "document_id": doc_id,
+            "chunk_index": chunk_index,
+            "title": document.get("title", "제목 없음"),
+            "category": document.get("category", "general"),
+        }
+
+    def _get_local_index(self) -> Optional[HybridSearch]:
+        """사용 중인 로컬 인덱스 (사용하지 않거나 준비되지 않았으면 None)"""
+        return QASystem._local_index if self.use_local_index else None
+
+    def _index_new_document(
+        self, doc_id: Any, contents: List[str], embeddings: List[List[float]], metadata: Dict[str, Any]
+    ) -> None:
+        """새로 저장된 문서의 청크를 로컬 인덱스에 추가"""
+        index = self._get_local_index()
+        if index is None:
+            return
+
+        # 저장된 청크 ID 조회 (chunk_index로 본문/임베딩과 연결)
+        chunk_rows = self._list_all_document_chunks(doc_id, "id, chunk_index")
+        self._index_chunks(doc_id, chunk_rows, contents, embeddings, metadata)
+
+    def _list_all_document_chunks(self, doc_id: Any, columns: str, page_size: int = 1000) -> List[Dict[str, Any]]:
+        """문서의 청크 전체 조회 (청크 순서, 페이지 단위로 나눠 요청)"""
+        chunk_rows = []
+        after_index = None
+        while True:
+            page = self.vector_store.list_document_chunks(
+                doc_id, columns=columns, limit=page_size, after_index=after_index
+            )
+            chunk_rows.extend(page)
+            if len(page) < page_size:
+                return chunk_rows
+            after_index = page[-1]["chunk_index"]
+
+    def _index_chunks(
+        self,
+        doc_id: Any,
+        chunk_rows: List[Dict[str, Any]],
+        contents: List[str],
+        embeddings: List[List[float]],
+        metadata: Dict[str, Any],
+        start_index: int = 0,
+    ) -> None:
+        """
+        저장된 청크를 로컬 인덱스에 추가
+        Args:
+            chunk_rows: 저장된 청크의 id, chunk_index
+            contents/embeddings: chunk_index - start_index 위치의 본문/임베딩
+        """
+        index = self._get_local_index()
+        if index is None:
+            return
+
+        with QASystem._local_index_lock:
+            index.add_documents(
+                [contents[row["chunk_index"] - start_index] for row in chunk_rows],
+                [embeddings[row["chunk_index"] - start_index] for row in chunk_rows],
+                [self._index_metadata(doc_id, row["chunk_index"], metadata) for row in chunk_rows],
+                ids=[row["id"] for row in chunk_rows],
+            )
+
+    def _search_local_index(
+        self, question: str, query_embedding: List[float], category: Optional[str], limit: int = 5
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        로컬 하이브리드 인덱스로 검색 (BM25 + 벡터)
+        Returns:
+            match_chunks와 같은 형식의 청크 리스트, 로컬 인덱스를 쓸 수 없으면 None
+            (similarity는 코사인 유사도, 순위에 쓴 결합 점수는 hybrid_score)
+        """
+        index = self._get_local_index()
+        if index is None or not len(index):
+            return None
+
+        try:
+            with QASystem._local_index_lock:
+                results = index.search(
+                    question,
+                    query_embedding,
+                    filter={"metadata.category": category} if category else None,
+                    top_k=limit,
+                )
+        except Exception as e:
+            logger.exception("로컬 인덱스 검색에 실패해 Supabase 검색을 사용합니다.")
+            self.local_index_error = f"{type(e).__name__}: {e}"
+            return None
+
+        return [
+            {
+                "id": result["id"],
+                "content": result["content"],
+                "document_id": result["metadata"]["document_id"],
+                "chunk_index": result["metadata"]["chunk_index"],
+                "similarity": result["vector_similarity"],
+                "hybrid_score": result["similarity"],
+                "document_title": result["metadata"]["title"],
+                "document_category": result["metadata"]["category"],
+            }
+            for result in results
+        ]
+
     def add_documents(
         self, chunks: List[Dict[str, Any]], metadata: Dict[str, Any] = None
     ) -> str:
         """
         문서 추가
         Args:
-            chunks: 문서 청크 리스트 ({'content': str})
+            chunks: 문서 청크 리스트 ({'content': str, 'metadata': 청크 메타데이터(선택)})
             metadata: 문서 메타데이터
         Returns:
             생성된 문서 ID
@@ -55,50 +394,267 @@ class QASystem:
         if metadata is None:
             metadata = {}
 
-        # 각 청크에 대한 임베딩 생성
-        processed_chunks = []
-        for chunk in chunks:
-            content = chunk["content"]
-
-            # 캐시된 임베딩이 있는지 확인
-            embedding = self.embedding_cache.get(content, self.model_name)
-            if embedding is None:
-                # 임베딩 생성 및 캐시
-                embedding = self._create_embedding(content)
-                self.embedding_cache.set(content, self.model_name, embedding)
+        # 청크 임베딩을 배치로 생성 (캐시 미스만 API 호출)
+        contents = [chunk["content"] for chunk in chunks]
+        embeddings = self._create_embeddings(contents)
 
-            processed_chunks.append({"content": content, "embedding": embedding})
+        processed_chunks = [
+            {"content": chunk["content"], "embedding": embedding, "metadata": chunk.get("metadata", {})}
+            for chunk, embedding in zip(chunks, embeddings)
+        ]
 
         # 문서와 청크 저장
-        return self.vector_store.add_document(processed_chunks, metadata)
+        doc_id = self.vector_store.add_document(processed_chunks, metadata)
+        self._index_new_document(doc_id, contents, embeddings, metadata)
+        return doc_id
+
+    def add_document_stream(
+        self, chunks: Iterable[Dict[str, Any]], metadata: Dict[str, Any] = None
+    ) -> int:
+        """
+        청크 제너레이터를 받아 배치 단위로 임베딩/저장하며 문서 추가
+        청크를 ingest_batch_size개씩만 메모리에 두므로 큰 문서도 메모리 사용량이 일정하고,
+        앞쪽 청크는 문서를 끝까지 읽기 전에 저장됩니다. 중간에 실패하면 문서를 삭제합니다.
+        Args:
+            chunks: 청크 이터러블 ({'content': str, 'metadata': 청크 메타데이터(선택)}, 예: DocumentLoader.iter_chunks)
+            metadata: 문서 메타데이터
+        Returns:
+            생성된 문서 ID
+        """
+        if metadata is None:
+            metadata = {}
+
+        doc_id = self.vector_store.begin_document(metadata)
+        total_chunks = 0
+        try:
+            batch: List[Dict[str, Any]] = []
+            for chunk in chunks:
+                batch.append(chunk)
+                if len(batch) >= self.ingest_batch_size:
+                    self._store_chunk_batch(doc_id, batch, metadata, total_chunks)
+                    total_chunks += len(batch)
+                    batch = []
+            if batch:
+                self._store_chunk_batch(doc_id, batch, metadata, total_chunks)
+                total_chunks += len(batch)
+
+            self.vector_store.finalize_document(doc_id, total_chunks)
+        except Exception:
+            self.vector_store.delete_document(doc_id)
+            index = self._get_local_index()
+            if index is not None:
+                with QASystem._local_index_lock:
+                    index.remove_documents(index.find_ids({"metadata.document_id": doc_id}))
+            raise
+
+        return doc_id
+
+    def _store_chunk_batch(
+        self, doc_id: int, chunks: List[Dict[str, Any]], metadata: Dict[str, Any], start_index: int
+    ) -> None:
+        """청크 배치 하나를 임베딩하여 저장하고 로컬 인덱스에 추가"""
+        contents = [chunk["content"] for chunk in chunks]
+        embeddings = self._create_embeddings(contents)
+        chunk_rows = self.vector_store.add_chunks(
+            doc_id,
+            [
+                {"content": chunk["content"], "embedding": embedding, "metadata": chunk.get("metadata", {})}
+                for chunk, embedding in zip(chunks, embeddings)
+            ],
+            metadata,
+            start_index,
+        )
+        self._index_chunks(doc_id, chunk_rows, contents, embeddings, metadata, start_index)
+
+    def update_document_from_file(
+        self,
+        doc_id: int,
+        file_path: str,
+        file_name: Optional[str] = None,
+        loader: Optional[DocumentLoader] = None,
+    ) -> Dict[str, Any]:
+        """
+        수정된 파일로 기존 문서 갱신 (바뀐 청크만 다시 임베딩)
+        파일 해시가 저장된 값과 같으면 청크는 그대로 두고 바뀐 파일명만 반영합니다.
+        새 청크 목록을 기존 청크와 내용 해시로 비교하여, 내용이 같은 청크는 행과 임베딩을
+        그대로 두고 순서만 갱신하고 새로 생기거나 바뀐 청크만 임베딩/저장하며 사라진 청크는 삭제합니다.
+        Args:
+            doc_id: 문서 ID
+            file_path: 수정된 파일 경로
+            file_name: 원본 파일명 (None이면 기존 파일명 유지)
+            loader: 청크 분할에 사용할 DocumentLoader (None이면 기본 설정)
+        Returns:
+            처리 결과 ({'unchanged': 파일이 같아 건너뛰었는지 여부, 'kept', 'added', 'removed': 청크 수})
+        """
+        document = self.vector_store.get_document(doc_id)
+        if document is None:
+            raise ValueError("문서를 찾을 수 없습니다.")
+
+        new_hash = file_hash(file_path)
+        # 파일명이 바뀌면 모든 청크의 메타데이터에도 반영
+        updates = {"file_hash": new_hash, "file_name": file_name, "chunk_metadata": {}}
+        if file_name:
+            updates["chunk_metadata"]["original_filename"] = file_name
+        if document.get("file_hash") == new_hash:
+            if file_name and file_name != document["file_name"]:
+                self.vector_store.apply_chunk_diff(doc_id, [], [], document["total_chunks"], updates)
+            return {"unchanged": True, "kept": document["total_chunks"], "added": 0, "removed": 0}
+
+        loader = loader or DocumentLoader()
+        chunks = list(loader.iter_chunks(file_path, document["category"]))
+        contents = [chunk["content"] for chunk in chunks]
+        if not contents:
+            raise ValueError("추출된 텍스트가 없습니다.")
+
+        # 기존 청크를 내용 해시로 묶음 (같은 내용이 여러 번 나오면 앞에서부터 짝지음)
+        old_rows = self._list_all_document_chunks(doc_id, "id, chunk_index, content, metadata")
+        unmatched: Dict[str, deque] = {}
+        for row in old_rows:
+            unmatched.setdefault(self._content_hash(row["content"]), deque()).append(row)
+
+        kept = 0
+        # 순서나 페이지 범위가 바뀐 기존 청크 (임베딩은 그대로 두고 chunk_index/메타데이터만 갱신)
+        moved: List[Dict[str, Any]] = []
+        added_indexes: List[int] = []
+        for chunk_index, content in enumerate(contents):
+            matches = unmatched.get(self._content_hash(content))
+            if not matches:
+                added_indexes.append(chunk_index)
+                continue
+            row = matches.popleft()
+            kept += 1
+            # 새 청크에 페이지 범위가 없으면 (예: PDF -> TXT) 기존 페이지 범위도 지워야 하므로 키 단위로 비교
+            new_metadata = chunks[chunk_index]["metadata"]
+            old_metadata = row.get("metadata") or {}
+            pages = {key: new_metadata[key] for key in PAGE_METADATA_KEYS if key in new_metadata}
+            old_pages = {key: old_metadata[key] for key in PAGE_METADATA_KEYS if key in old_metadata}
+            if row["chunk_index"] != chunk_index or pages != old_pages:
+                moved.append({"id": row["id"], "chunk_index": chunk_index, "metadata": pages})
+        removed_ids = [row["id"] for rows in unmatched.values() for row in rows]
+
+        metadata = {
+            "title": document["title"],
+            "category": document["category"],
+            "created_at": document["created_at"],
+            "original_filename": file_name or document["file_name"],
+        }
+        inserted: List[Dict[str, Any]] = []
+        added_embeddings: Dict[int, List[float]] = {}
+        try:
+            for start in range(0, len(added_indexes), self.ingest_batch_size):
+                batch_indexes = added_indexes[start:start + self.ingest_batch_size]
+                embeddings = self._create_embeddings([contents[i] for i in batch_indexes])
+                inserted.extend(self.vector_store.add_chunks(
+                    doc_id,
+                    [
+                        {"content": contents[i], "embedding": embedding, "metadata": chunks[i]["metadata"]}
+                        for i, embedding in zip(batch_indexes, embeddings)
+                    ],
+                    metadata,
+                    chunk_indexes=batch_indexes,
+                ))
+                added_embeddings.update(zip(batch_indexes, embeddings))
+
+            self.vector_store.apply_chunk_diff(doc_id, moved, removed_ids, len(contents), updates)
+        except Exception:
+            # 기존 청크는 아직 그대로이므로 새로 저장한 청크만 지우면 갱신 전 상태로 돌아감
+            # (새 청크는 기존 청크와 chunk_index가 겹치므로 다시 조회하지 않고 저장 시 받은 ID로 삭제)
+            self.vector_store.delete_chunks([row["id"] for row in inserted])
+            raise
+
+        index = self._get_local_index()
+        if index is not None:
+            with QASystem._local_index_lock:
+                index.remove_documents(removed_ids)
+                for chunk in moved:
+                    entry = index.get(chunk["id"])
+                    if entry is not None:
+                        index.update_metadata(chunk["id"], {**entry["metadata"], "chunk_index": chunk["chunk_index"]})
+                if inserted:
+                    index.add_documents(
+                        [contents[row["chunk_index"]] for row in inserted],
+                        [added_embeddings[row["chunk_index"]] for row in inserted],
+                        [self._index_metadata(doc_id, row["chunk_index"], metadata) for row in inserted],
+                        ids=[row["id"] for row in inserted],
+                    )
+
+        return {"unchanged": False, "kept": kept, "added": len(inserted), "removed": len(removed_ids)}
+
+    @staticmethod
+    def _content_hash(content: str) -> str:
+        """청크 내용의 SHA-256 해시"""
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
 
     def get_document(self, doc_id: str) -> Optional[Dict[str, Any]]:
         """문서 정보 조회"""
         return self.vector_store.get_document(doc_id)
 
-    def list_documents(self, category: Optional[str] = None) -> List[Dict[str, Any]]:
+    def list_documents(
+        self,
+        category: Optional[str] = None,
+        limit: Optional[int] = None,
+        after_id: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
         """문서 목록 조회"""
-        return self.vector_store.list_documents(category)
+        return self.vector_store.list_documents(category, limit=limit, after_id=after_id)
 
     def update_document(self, doc_id: str, updates: Dict[str, Any]) -> bool:
         """문서 정보 업데이트"""
-        return self.vector_store.update_document(doc_id, updates)
+        if not self.vector_store.update_document(doc_id, updates):
+            return False
+
+        index = self._get_local_index()
+        if index is not None and ("title" in updates or "category" in updates):
+            with QASystem._local_index_lock:
+                for chunk_id in index.find_ids({"metadata.document_id": doc_id}):
+                    metadata = dict(index.get(chunk_id)["metadata"])
+                    metadata.update({k: v for k, v in updates.items() if k in ("title", "category")})
+                    index.update_metadata(chunk_id, metadata)
+        return True
 
     def delete_document(self, doc_id: str) -> bool:
         """문서와 관련 청크 모두 삭제"""
-        return self.vector_store.delete_document(doc_id)
+        if not self.vector_store.delete_document(doc_id):
+            return False
 
-    def list_document_chunks(self, doc_id: str) -> List[Dict[str, Any]]:
+        index = self._get_local_index()
+        if index is not None:
+            with QASystem._local_index_lock:
+                index.remove_documents(index.find_ids({"metadata.document_id": doc_id}))
+        return True
+
+    def list_document_chunks(
+        self,
+        doc_id: str,
+        limit: Optional[int] = None,
+        after_index: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
         """특정 문서의 청크 목록 조회"""
-        return self.vector_store.list_document_chunks(doc_id)
+        return self.vector_store.list_document_chunks(doc_id, limit=limit, after_index=after_index)
 
     def update_chunk(self, chunk_id: str, content: str) -> bool:
         """청크 내용 업데이트"""
-        return self.vector_store.update_chunk(chunk_id, content)
+        if not self.vector_store.update_chunk(chunk_id, content):
+            return False
+
+        index = self._get_local_index()
+        if index is not None:
+            with QASystem._local_index_lock:
+                chunk = index.get(chunk_id)
+                if chunk is not None:
+                    index.add_documents([content], [chunk["embedding"]], [chunk["metadata"]], ids=[chunk_id])
+        return True
 
     def delete_chunk(self, chunk_id: str) -> bool:
         """청크 삭제"""
-        return self.vector_store.delete_chunk(chunk_id)
+        if not self.vector_store.delete_chunk(chunk_id):
+            return False
+
+        index = self._get_local_index()
+        if index is not None:
+            with QASystem._local_index_lock:
+                index.remove_documents([chunk_id])
+        return True
 
     def ask(self, question: str, category: Optional[str] = None) -> Dict[str, Any]:
         """
@@ -109,33 +665,89 @@ class QASystem:
         Returns:
             답변과 참조 문서 정보를 포함한 딕셔너리
         """
-        # 질문 임베딩 생성
-        query_embedding = self._create_embedding(question)
+        similar_chunks = self._retrieve(question, category)
+        if not similar_chunks:
+            return {
+                "answer": NO_ANSWER_MESSAGE,
+                "documents": [],
+            }
+
+        # Gemini를 사용하여 답변 생성
+        answer = self._create_chat_completion(ANSWER_SYSTEM_PROMPT, self._answer_prompt(question, similar_chunks))
 
-        # 유사한 청크 검색
-        similar_chunks = self.vector_store.search_similar(query_embedding)
+        return {
+            "answer": answer,
+            "documents": self._build_references(similar_chunks),
+        }
 
+    def ask_stream(self, question: str, category: Optional[str] = None) -> Dict[str, Any]:
+        """
+        질문에 대한 답변을 스트리밍으로 생성
+        검색과 참조 문서 구성은 바로 끝내고, 답변은 Gemini가 생성하는 대로 조각씩 돌려줍니다.
+        Args:
+            question: 질문 내용
+            category: 검색할 카테고리 (선택사항)
+        Returns:
+            참조 문서 정보("documents")와 답변 조각 제너레이터("stream")를 포함한 딕셔너리
+            (st.write_stream에 "stream"을 그대로 넘길 수 있음)
+        """
+        similar_chunks = self._retrieve(question, category)
         if not similar_chunks:
             return {
-                "answer": "죄송합니다. 관련된 정보를 찾을 수 없습니다.",
                 "documents": [],
+                "stream": iter([NO_ANSWER_MESSAGE]),
             }
 
-        # 컨텍스트 구성
+        return {
+            "documents": self._build_references(similar_chunks),
+            "stream": self._create_chat_completion_stream(
+                ANSWER_SYSTEM_PROMPT, self._answer_prompt(question, similar_chunks)
+            ),
+        }
+
+    def _retrieve(self, question: str, category: Optional[str]) -> List[Dict[str, Any]]:
+        """
+        질문과 유사한 청크 검색
+        """
+        # 질문 임베딩 생성
+        query_embedding = self._create_embedding(question)
+
+        # 유사한 청크 검색 (로컬 인덱스 우선, 사용할 수 없으면 Supabase에서 카테고리 필터 적용)
+        similar_chunks = self._search_local_index(question, query_embedding, category)
+        if similar_chunks is None:
+            similar_chunks = self.vector_store.search_similar(query_embedding, category=category)
+        return similar_chunks
+
+    @staticmethod
+    def _answer_prompt(question: str, similar_chunks: List[Dict[str, Any]]) -> str:
+        """
+        검색된 청크로 컨텍스트를 구성한 질문 프롬프트
+        """
         context = "\n\n".join([chunk["content"] for chunk in similar_chunks])
+        return f"컨텍스트:\n{context}\n\n질문: {question}"
 
-        # Gemini를 사용하여 답변 생성
-        answer = self._create_chat_completion(
-            "주어진 컨텍스트를 기반으로 질문에 답변해주세요. 컨텍스트에 없는 내용은 답변하지 마세요.",
-            f"컨텍스트:\n{context}\n\n질문: {question}",
-        )
+    def _build_references(self, similar_chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        참조 문서 정보 구성 (유사도 순 상위 3개 문서)
+        """
+        # 문서 제목/카테고리는 검색 결과에 포함되며, 없으면 한 번에 일괄 조회
+        missing_doc_ids = {
+            chunk["document_id"] for chunk in similar_chunks if "document_title" not in chunk
+        }
+        documents = self.vector_store.get_documents(list(missing_doc_ids))
 
-        # 참조 문서 정보 구성
         references = []
         seen_docs = set()  # 중복 문서 제거를 위한 세트
         
         for chunk in similar_chunks:
-            doc = self.get_document(chunk["document_id"])
+            if "document_title" in chunk:
+                doc = {
+                    "id": chunk["document_id"],
+                    "title": chunk["document_title"],
+                    "category": chunk["document_category"],
+                }
+            else:
+                doc = documents.get(chunk["document_id"])
             if doc and doc["id"] not in seen_docs:
                 seen_docs.add(doc["id"])
                 # 섹션 제목 추출 (있는 경우)
@@ -165,23 +777,129 @@ class QASystem:
         # 유사도 순으로 정렬
         references.sort(key=lambda x: float(x["similarity"].rstrip("%")), reverse=True)
 
-        return {
-            "answer": answer,
-            "documents": references[:3]  # 상위 3개 문서만 표시
-        }
+        return references[:3]  # 상위 3개 문서만 표시
 
     def _create_embedding(self, text: str) -> List[float]:
         """
-        텍스트의 임베딩 벡터 생성
+        텍스트의 임베딩 벡터 생성 (요청 제한기와 재시도를 거침)
         """
-        response = self.client.embeddings.create(model=self.model_name, input=text)
-        return response.data[0].embedding
+        return self._request_embeddings([text])[0]
 
-    def _create_chat_completion(self, system_prompt: str, user_prompt: str) -> str:
+    def prefetch_embeddings(self, texts: List[str]) -> None:
         """
-        Gemini를 사용하여 답변 생성
+        여러 텍스트의 임베딩을 미리 만들어 캐시에 저장
+        여러 문서를 등록할 때 청크를 모아 한 번에 요청하면, 이후 문서별 add_documents는 캐시만 읽습니다.
+        """
+        self._create_embeddings(texts)
+
+    def _create_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """
+        여러 텍스트의 임베딩 벡터를 배치로 생성
+        캐시에 없는 텍스트만 개수/토큰 한도로 묶어 요청하고,
+        결과는 입력 순서대로 반환하며 새 임베딩은 한 번에 캐시에 저장합니다.
+        """
+        embeddings = self.embedding_cache.get_many(texts, self.model_name)
+
+        # 캐시 미스 텍스트 수집 (동일 텍스트는 한 번만 요청)
+        missing: Dict[str, List[int]] = {}
+        for i, (text, embedding) in enumerate(zip(texts, embeddings)):
+            if embedding is None:
+                missing.setdefault(text, []).append(i)
+
+        if not missing:
+            return embeddings
+
+        new_texts = list(missing.keys())
+        batches = self._batch_texts(new_texts)
+
+        # 여러 배치를 동시에 요청 (map은 배치 순서를 유지)
+        new_embeddings: List[List[float]] = []
+        if len(batches) == 1 or self.embedding_workers <= 1:
+            for batch in batches:
+                new_embeddings.extend(self._request_embeddings(batch))
+        else:
+            workers = min(self.embedding_workers, len(batches))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                for batch_embeddings in executor.map(self._request_embeddings, batches):
+                    new_embeddings.extend(batch_embeddings)
+
+        for text, embedding in zip(new_texts, new_embeddings):
+            for i in missing[text]:
+                embeddings[i] = embedding
+
+        self.embedding_cache.set_many(new_texts, self.model_name, new_embeddings)
+        return embeddings
+
+    def _request_embeddings(self, batch: List[str]) -> List[List[float]]:
+        """
+        임베딩 배치 1건 요청
+        요청 제한기를 통과한 뒤 호출하며, 429/5xx/연결 오류는 지수 백오프로 재시도합니다.
+        """
+        tokens = sum(self._estimate_tokens(text) for text in batch)
+        # 재시도는 여기서 직접 관리하므로 클라이언트 자체 재시도는 끔
+        client = self.client.with_options(max_retries=0)
+
+        for attempt in range(self.embedding_max_retries + 1):
+            self.embedding_limiter.acquire(tokens)
+            try:
+                response = client.embeddings.create(model=self.model_name, input=batch)
+                # 응답 순서는 index 필드로 보장
+                return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+            except (RateLimitError, APIStatusError, APIConnectionError) as e:
+                retryable = not isinstance(e, APIStatusError) or (
+                    e.status_code == 429 or e.status_code >= 500
+                )
+                if not retryable or attempt == self.embedding_max_retries:
+                    raise
+                time.sleep(self._retry_delay(e, attempt))
+
+    @staticmethod
+    def _retry_delay(error: Exception, attempt: int) -> float:
+        """
+        재시도 대기 시간 계산 (Retry-After 헤더 우선, 없으면 지터를 더한 지수 백오프)
+        """
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        return min(60.0, 2 ** attempt) + random.uniform(0, 1)
+
+    def _batch_texts(self, texts: List[str]) -> List[List[str]]:
+        """
+        텍스트를 요청당 입력 개수와 추정 토큰 한도 안에서 배치로 분할
+        """
+        batches = []
+        batch: List[str] = []
+        batch_tokens = 0
+        for text in texts:
+            tokens = self._estimate_tokens(text)
+            if batch and (
+                len(batch) >= self.embedding_batch_size
+                or batch_tokens + tokens > self.embedding_batch_tokens
+            ):
+                batches.append(batch)
+                batch = []
+                batch_tokens = 0
+            batch.append(text)
+            batch_tokens += tokens
+        if batch:
+            batches.append(batch)
+        return batches
+
+    @staticmethod
+    def _estimate_tokens(text: str) -> int:
+        """
+        토크나이저 없이 토큰 수를 보수적으로 추정 (UTF-8 2바이트당 1토큰)
+        """
+        return len(text.encode("utf-8")) // 2 + 1
+
+    def _start_chat_session(self, system_prompt: str):
+        """
+        새로운 Gemini 채팅 세션 시작
         """
-        # 새로운 채팅 세션 시작
         self.chat_session = self.gemini_model.start_chat(
             history=[
                 {
@@ -194,7 +912,26 @@ class QASystem:
                 },
             ]
         )
-        
+        return self.chat_session
+
+    def _create_chat_completion(self, system_prompt: str, user_prompt: str) -> str:
+        """
+        Gemini를 사용하여 답변 생성
+        """
         # 질문 전송 및 답변 받기
-        response = self.chat_session.send_message(user_prompt)
+        response = self._start_chat_session(system_prompt).send_message(user_prompt)
         return response.text
+
+    def _create_chat_completion_stream(self, system_prompt: str, user_prompt: str) -> Iterator[str]:
+        """
+        Gemini를 사용하여 답변을 스트리밍으로 생성 (받은 조각을 바로 반환)
+        """
+        response = self._start_chat_session(system_prompt).send_message(user_prompt, stream=True)
+        for chunk in response:
+            # 텍스트가 없는 조각(안전 필터 등)은 건너뜀
+            try:
+                text = chunk.text
+            except ValueError:
+                continue
+            if text:
+                yield text
@@ -0,0 +1,67 @@
+import threading
+import time
+from typing import Dict, Tuple
+
+class RateLimiter:
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        """
+        분당 요청 수/토큰 수 제한기 (토큰 버킷, 스레드 안전)
+        Args:
+            requests_per_minute: 분당 최대 요청 수
+            tokens_per_minute: 분당 최대 토큰 수
+        """
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._request_allowance = float(requests_per_minute)
+        self._token_allowance = float(tokens_per_minute)
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        """경과 시간만큼 버킷 충전"""
+        now = time.monotonic()
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        self._request_allowance = min(
+            self.requests_per_minute,
+            self._request_allowance + elapsed * self.requests_per_minute / 60,
+        )
+        self._token_allowance = min(
+            self.tokens_per_minute,
+            self._token_allowance + elapsed * self.tokens_per_minute / 60,
+        )
+
+    def acquire(self, tokens: int = 0) -> None:
+        """
+        요청 1건과 토큰을 사용할 수 있을 때까지 대기
+        Args:
+            tokens: 이번 요청의 (추정) 토큰 수
+        """
+        # 분당 한도보다 큰 요청은 버킷이 가득 찼을 때 통과시킴
+        tokens = min(tokens, self.tokens_per_minute)
+        while True:
+            with self._lock:
+                self._refill()
+                if self._request_allowance >= 1 and self._token_allowance >= tokens:
+                    self._request_allowance -= 1
+                    self._token_allowance -= tokens
+                    return
+                wait = max(
+                    (1 - self._request_allowance) * 60 / self.requests_per_minute,
+                    (tokens - self._token_allowance) * 60 / self.tokens_per_minute,
+                )
+            time.sleep(max(wait, 0.01))
+
+_limiters: Dict[Tuple[str, int, int], RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+def get_rate_limiter(name: str, requests_per_minute: int, tokens_per_minute: int) -> RateLimiter:
+    """
+    프로세스 내에서 공유되는 제한기 반환
+    여러 세션이 동시에 업로드해도 같은 API 한도를 함께 사용합니다.
+    """
+    key = (name, requests_per_minute, tokens_per_minute)
+    with _limiters_lock:
+        if key not in _limiters:
+            _limiters[key] = RateLimiter(requests_per_minute, tokens_per_minute)
+        return _limiters[key]
@@ -0,0 +1,394 @@
+import json
+import multiprocessing as mp
+import os
+import sys
+import threading
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple
+from hybrid_search import HybridSearch
+from index_io import atomic_write
+import numpy as np
+
+def _shard_worker(conn, alpha: float, directory: Optional[str]) -> None:
+    """
+    샤드 프로세스 본체
+    HybridSearch 샤드 하나를 들고 (명령, 인자) 메시지를 처리하여 (성공 여부, 결과)를 돌려줍니다.
+    샤드 안에서는 후보 생성 단계를 쓰지 않고 필터된 행 전체를 점수화합니다
+    (점수 정규화를 모든 샤드에서 같은 행 집합 기준으로 맞추기 위해).
+    """
+    if directory is not None:
+        shard = HybridSearch.load(directory)
+        shard.ann_threshold = sys.maxsize
+    else:
+        shard = HybridSearch(alpha=alpha, ann_threshold=sys.maxsize)
+    # score 단계에서 계산한 점수를 select 단계까지 보관
+    last_scores: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None
+
+    while True:
+        command, args = conn.recv()
+        if command == "close":
+            conn.send((True, None))
+            break
+        try:
+            if command == "add":
+                result = shard.add_documents(*args)
+            elif command == "remove":
+                result = shard.remove_documents(*args)
+            elif command == "update_metadata":
+                result = shard.update_metadata(*args)
+            elif command == "ids":
+                result = list(shard._id_to_row)
+            elif command == "term_stats":
+                token_lists, = args
+                result = (
+                    shard.bm25.num_docs,
+                    shard.bm25.total_length,
+                    shard.bm25.term_stats([token for tokens in token_lists for token in tokens]),
+                )
+            elif command == "score":
+                result, last_scores = _score_shard(shard, *args)
+            elif command == "select":
+                result = _select_shard(shard, last_scores, *args)
+                last_scores = None
+            elif command == "save":
+                result = shard.save(*args)
+            else:
+                raise ValueError(f"알 수 없는 명령입니다: {command}")
+            conn.send((True, result))
+        except Exception as e:
+            conn.send((False, e))
+
+def _score_shard(
+    shard: HybridSearch,
+    token_lists: List[List[str]],
+    query_vectors: np.ndarray,
+    filter: Optional[Dict[str, Any]],
+    collection_stats: Tuple[int, int, Dict[str, int]]
+) -> Tuple[Optional[np.ndarray], Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]]:
+    """
+    샤드의 BM25/벡터 점수 계산 (전체 BM25 통계 사용)
+    Returns:
+        (질의별 [BM25 최소, BM25 최대, 벡터 최소, 벡터 최대], 보관할 점수)
+        필터에 맞는 행이 없으면 (None, None)
+    """
+    rows = shard._filter_rows(filter) if len(shard) else np.empty(0, dtype=np.int64)
+    if not len(rows):
+        return None, None
+    bm25_scores = shard.bm25.get_scores_batch(token_lists, rows, collection_stats)
+    vector_scores = query_vectors @ shard.embeddings[rows].T
+    bounds = np.stack([
+        bm25_scores.min(axis=1), bm25_scores.max(axis=1),
+        vector_scores.min(axis=1), vector_scores.max(axis=1),
+    ], axis=1)
+    return bounds, (rows, bm25_scores, vector_scores)
+
+def _select_shard(
+    shard: HybridSearch,
+    scores: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]],
+    bounds: np.ndarray,
+    top_k: int
+) -> List[List[Dict[str, Any]]]:
+    """
+    전체 최소/최대로 정규화한 결합 점수로 샤드의 질의별 상위 k개 선택
+    """
+    if scores is None:
+        return [[] for _ in bounds]
+    rows, bm25_scores, vector_scores = scores
+    bm25_min, bm25_max, vector_min, vector_max = (bounds[:, [i]] for i in range(4))
+    final_scores = (
+        shard.alpha * (bm25_scores - bm25_min) / (bm25_max - bm25_min + 1e-6)
+        + (1 - shard.alpha) * (vector_scores - vector_min) / (vector_max - vector_min + 1e-6)
+    )
+    return [
+        shard._results(query_scores, indices, rows, query_vector_scores)
+        for query_scores, query_vector_scores, indices in zip(
+            final_scores, vector_scores, shard._top_k(final_scores, top_k)
+        )
+    ]
+
+class ShardedHybridSearch:
+    def __init__(self, num_shards: Optional[int] = None, alpha: float = 0.3, _directory: Optional[str] = None):
+        """
+        여러 프로세스에 문서를 나눠 담는 하이브리드 검색
+        질의는 모든 샤드에 동시에 보내고 샤드별 상위 k개를 합칩니다. 점수는 단일
+        HybridSearch와 같도록 세 단계로 맞춥니다.
+        1. 샤드별 문서 수/길이/단어 문서 빈도를 모아 전체 BM25 통계 계산
+        2. 전체 통계로 점수를 계산하고 샤드별 최소/최대를 모아 전체 최소/최대 계산
+        3. 전체 최소/최대로 정규화한 결합 점수로 샤드별 상위 k개 선택 후 병합
+        Args:
+            num_shards: 샤드(프로세스) 수 (None이면 CPU 수)
+            alpha: BM25와 벡터 검색 결과를 결합할 때 BM25의 가중치 (0~1)
+        """
+        self.num_shards = num_shards or os.cpu_count() or 1
+        self.alpha = alpha
+        self._shard_of: Dict[Any, int] = {}  # 문서 ID -> 샤드 번호
+        self._next_id = 0
+        self._next_shard = 0
+        # 샤드는 score -> select 사이에 점수를 보관하고 파이프도 공유하므로,
+        # 명령 한 번(_call)과 검색 세 단계 전체를 한 스레드씩 실행
+        self._lock = threading.RLock()
+
+        # fork는 부모의 스레드/잠금 상태를 복사하므로 spawn으로 샤드 프로세스 시작
+        context = mp.get_context("spawn")
+        self._connections = []
+        self._processes = []
+        for shard in range(self.num_shards):
+            parent_conn, child_conn = context.Pipe()
+            shard_dir = str(Path(_directory) / f"shard_{shard}") if _directory else None
+            process = context.Process(
+                target=_shard_worker, args=(child_conn, alpha, shard_dir), daemon=True
+            )
+            process.start()
+            child_conn.close()
+            self._connections.append(parent_conn)
+            self._processes.append(process)
+
+    def __len__(self) -> int:
+        """문서 수"""
+        return len(self._shard_of)
+
+    def __enter__(self) -> "ShardedHybridSearch":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _call(self, requests: Dict[int, Tuple[str, tuple]]) -> Dict[int, Any]:
+        """
+        샤드들에 명령을 동시에 보내고 응답을 모음
+        Args:
+            requests: 샤드 번호 -> (명령, 인자)
+        """
+        results = {}
+        error = None
+        with self._lock:
+            for shard, request in requests.items():
+                self._connections[shard].send(request)
+            for shard in requests:
+                ok, result = self._connections[shard].recv()
+                if ok:
+                    results[shard] = result
+                elif error is None:
+                    error = result
+        if error is not None:
+            raise error
+        return results
+
+    def _broadcast(self, command: str, *args) -> List[Any]:
+        """모든 샤드에 같은 명령을 보내고 샤드 순서대로 응답 반환"""
+        results = self._call({shard: (command, args) for shard in range(self.num_shards)})
+        return [results[shard] for shard in range(self.num_shards)]
+
+    def add_documents(
+        self,
+        texts: List[str],
+        embeddings: List[List[float]],
+        metadata: List[Dict[str, Any]] = None,
+        ids: Optional[List[Any]] = None
+    ) -> List[Any]:
+        """
+        문서 추가 (새 문서는 샤드에 돌아가며 배정, 이미 있는 ID는 해당 샤드에서 교체)
+        Args:
+            texts: 문서 텍스트 리스트
+            embeddings: 문서 임베딩 리스트
+            metadata: 문서 메타데이터 리스트
+            ids: 문서 ID 리스트 (없으면 자동 생성)
+        Returns:
+            추가된 문서 ID 리스트
+        """
+        if not texts:
+            return []
+        if metadata is None:
+            metadata = [{} for _ in texts]
+        with self._lock:
+            return self._add_documents(texts, embeddings, metadata, ids)
+
+    def _add_documents(
+        self,
+        texts: List[str],
+        embeddings: List[List[float]],
+        metadata: List[Dict[str, Any]],
+        ids: Optional[List[Any]]
+    ) -> List[Any]:
+        """문서 추가 본체 (self._lock을 잡은 상태에서 호출)"""
+        if ids is None:
+            ids = list(range(self._next_id, self._next_id + len(texts)))
+        self._next_id = max([self._next_id] + [i + 1 for i in ids if isinstance(i, int)])
+
+        batches: Dict[int, Tuple[list, list, list, list]] = {}
+        for text, embedding, meta, doc_id in zip(texts, embeddings, metadata, ids):
+            shard = self._shard_of.get(doc_id)
+            if shard is None:
+                shard = self._next_shard
+                self._next_shard = (self._next_shard + 1) % self.num_shards
+            batch = batches.setdefault(shard, ([], [], [], []))
+            batch[0].append(text)
+            batch[1].append(embedding)
+            batch[2].append(meta)
+            batch[3].append(doc_id)
+
+        self._call({shard: ("add", batch) for shard, batch in batches.items()})
+        for shard, batch in batches.items():
+            for doc_id in batch[3]:
+                self._shard_of[doc_id] = shard
+        return list(ids)
+
+    def remove_documents(self, ids: List[Any]) -> int:
+        """
+        문서 삭제
+        Returns:
+            삭제된 문서 수
+        """
+        with self._lock:
+            batches: Dict[int, List[Any]] = {}
+            for doc_id in ids:
+                shard = self._shard_of.pop(doc_id, None)
+                if shard is not None:
+                    batches.setdefault(shard, []).append(doc_id)
+            return sum(self._call({shard: ("remove", (batch,)) for shard, batch in batches.items()}).values())
+
+    def update_metadata(self, doc_id: Any, metadata: Dict[str, Any]) -> bool:
+        """
+        문서 메타데이터 교체
+        Returns:
+            문서가 있어 갱신되었는지 여부
+        """
+        shard = self._shard_of.get(doc_id)
+        if shard is None:
+            return False
+        return self._call({shard: ("update_metadata", (doc_id, metadata))})[shard]
+
+    def search(
+        self,
+        query: str,
+        query_embedding: List[float],
+        filter: Dict[str, Any] = None,
+        top_k: int = 5
+    ) -> List[Dict[str, Any]]:
+        """
+        하이브리드 검색 수행
+        Args:
+            query: 검색 쿼리
+            query_embedding: 쿼리 임베딩
+            filter: 메타데이터 필터 (예: {'metadata.category': 'dating'})
+            top_k: 반환할 최대 문서 수
+        """
+        return self.search_batch([query], [query_embedding], filter, top_k)[0]
+
+    def search_batch(
+        self,
+        queries: List[str],
+        query_embeddings: List[List[float]],
+        filter: Dict[str, Any] = None,
+        top_k: int = 5
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        여러 질의를 모든 샤드에서 하이브리드 검색
+        Args:
+            queries: 검색 쿼리 리스트
+            query_embeddings: 쿼리 임베딩 리스트
+            filter: 모든 질의에 공통으로 적용할 메타데이터 필터
+            top_k: 질의별 반환할 최대 문서 수
+        Returns:
+            질의 순서대로의 검색 결과 리스트
+        """
+        if not queries:
+            return []
+        if not len(self):
+            return [[] for _ in queries]
+
+        token_lists = [query.split() for query in queries]
+        query_vectors = HybridSearch._normalize(np.asarray(query_embeddings, dtype=np.float32))
+        with self._lock:
+            return self._search_batch(token_lists, query_vectors, filter, top_k)
+
+    def _search_batch(
+        self,
+        token_lists: List[List[str]],
+        query_vectors: np.ndarray,
+        filter: Optional[Dict[str, Any]],
+        top_k: int
+    ) -> List[List[Dict[str, Any]]]:
+        """검색 세 단계 본체 (self._lock을 잡은 상태에서 호출)"""
+        # 1. 전체 BM25 통계 (문서 수, 전체 길이, 단어별 문서 빈도)
+        num_docs, total_length, df = 0, 0, {}
+        for shard_docs, shard_length, shard_df in self._broadcast("term_stats", token_lists):
+            num_docs += shard_docs
+            total_length += shard_length
+            for term, count in shard_df.items():
+                df[term] = df.get(term, 0) + count
+        if not num_docs:
+            return [[] for _ in token_lists]
+
+        # 2. 샤드별 점수 최소/최대 -> 전체 최소/최대
+        shard_bounds = [
+            bounds for bounds in
+            self._broadcast("score", token_lists, query_vectors, filter, (num_docs, total_length, df))
+            if bounds is not None
+        ]
+        if not shard_bounds:
+            return [[] for _ in token_lists]
+        stacked = np.stack(shard_bounds)
+        bounds = np.stack([
+            stacked[:, :, 0].min(axis=0), stacked[:, :, 1].max(axis=0),
+            stacked[:, :, 2].min(axis=0), stacked[:, :, 3].max(axis=0),
+        ], axis=1)
+
+        # 3. 샤드별 상위 k개를 모아 전체 상위 k개
+        results = [[] for _ in token_lists]
+        for shard_results in self._broadcast("select", bounds, top_k):
+            for query_results, shard_query_results in zip(results, shard_results):
+                query_results.extend(shard_query_results)
+        return [
+            sorted(query_results, key=lambda result: result['similarity'], reverse=True)[:top_k]
+            for query_results in results
+        ]
+
+    def save(self, directory: str) -> None:
+        """
+        샤드별로 shard_{번호} 디렉토리에 저장 (manifest.json은 마지막에 기록)
+        """
+        path = Path(directory)
+        path.mkdir(parents=True, exist_ok=True)
+        self._call({
+            shard: ("save", (str(path / f"shard_{shard}"),)) for shard in range(self.num_shards)
+        })
+        manifest = {
+            "version": 1,
+            "num_shards": self.num_shards,
+            "alpha": self.alpha,
+            "next_id": self._next_id,
+        }
+        atomic_write(path / "manifest.json", lambda f: f.write(json.dumps(manifest).encode()))
+
+    @classmethod
+    def load(cls, directory: str) -> "ShardedHybridSearch":
+        """
+        저장된 샤드 인덱스 불러오기 (각 샤드 프로세스가 자기 디렉토리를 메모리 맵으로 엶)
+        """
+        with open(Path(directory) / "manifest.json") as f:
+            manifest = json.load(f)
+
+        search = cls(num_shards=manifest["num_shards"], alpha=manifest["alpha"], _directory=directory)
+        search._next_id = manifest["next_id"]
+        shard_ids = search._broadcast("ids")
+        for shard, ids in enumerate(shard_ids):
+            for doc_id in ids:
+                search._shard_of[doc_id] = shard
+        search._next_shard = int(np.argmin([len(ids) for ids in shard_ids]))
+        return search
+
+    def close(self) -> None:
+        """샤드 프로세스 종료"""
+        with self._lock:
+            for conn, process in zip(self._connections, self._processes):
+                if process.is_alive():
+                    try:
+                        conn.send(("close", ()))
+                        conn.recv()
+                    except (EOFError, OSError):
+                        pass
+                process.join(timeout=5)
+                conn.close()
+            self._connections = []
+            self._processes = []
@@ -0,0 +1,33 @@
+-- 문서와 청크를 하나의 트랜잭션으로 저장하는 함수
+create or replace function insert_document_with_chunks(
+    doc jsonb,
+    doc_chunks jsonb
+)
+returns bigint
+language plpgsql
+as $$
+declare
+    new_document_id bigint;
+begin
+    insert into documents (title, category, file_name, created_at, total_chunks)
+    values (
+        doc->>'title',
+        coalesce(doc->>'category', 'general'),
+        doc->>'file_name',
+        coalesce((doc->>'created_at')::timestamp with time zone, now()),
+        (doc->>'total_chunks')::integer
+    )
+    returning id into new_document_id;
+
+    insert into chunks (document_id, content, embedding, chunk_index, metadata)
+    select
+        new_document_id,
+        chunk->>'content',
+        (chunk->'embedding')::text::vector,
+        (chunk->>'chunk_index')::integer,
+        chunk->'metadata'
+    from jsonb_array_elements(doc_chunks) as chunk;
+
+    return new_document_id;
+end;
+$$;
@@ -0,0 +1,40 @@
+-- 코사인 거리 기반 HNSW 인덱스 (match_chunks의 순차 스캔 제거)
+create index if not exists chunks_embedding_hnsw_idx
+    on chunks using hnsw (embedding vector_cosine_ops)
+    with (m = 16, ef_construction = 64);
+
+-- ef_search 파라미터를 받도록 함수 재생성
+drop function if exists match_chunks(vector, int);
+
+create or replace function match_chunks(
+    query_embedding vector(1536),
+    match_count int default 5,
+    ef_search int default 40
+)
+returns table (
+    id bigint,
+    content text,
+    document_id bigint,
+    chunk_index integer,
+    similarity float
+)
+language plpgsql
+as $$
+begin
+    -- 현재 트랜잭션에서만 HNSW 탐색 폭 변경 (클수록 recall과 지연 시간 증가)
+    -- 탐색 폭이 match_count보다 작으면 결과가 모자랄 수 있으므로 최소값 보장
+    perform set_config('hnsw.ef_search', greatest(ef_search, match_count)::text, true);
+
+    return query
+    select
+        chunks.id,
+        chunks.content,
+        chunks.document_id,
+        chunks.chunk_index,
+        1 - (chunks.embedding <=> query_embedding) as similarity
+    from chunks
+    where chunks.embedding is not null
+    order by chunks.embedding <=> query_embedding
+    limit match_count;
+end;
+$$;
@@ -0,0 +1,72 @@
+-- 필터 검색용 인덱스
+create index if not exists documents_category_idx on documents (category);
+create index if not exists chunks_document_id_idx on chunks (document_id);
+create index if not exists chunks_metadata_idx on chunks using gin (metadata jsonb_path_ops);
+
+-- 카테고리/문서/메타데이터 필터를 받도록 함수 재생성
+drop function if exists match_chunks(vector, int, int);
+
+create or replace function match_chunks(
+    query_embedding vector(1536),
+    match_count int default 5,
+    ef_search int default 40,
+    filter_category text default null,
+    filter_document_ids bigint[] default null,
+    filter_metadata jsonb default null
+)
+returns table (
+    id bigint,
+    content text,
+    document_id bigint,
+    chunk_index integer,
+    similarity float
+)
+language plpgsql
+as $$
+begin
+    -- 현재 트랜잭션에서만 HNSW 탐색 폭 변경 (클수록 recall과 지연 시간 증가)
+    -- 탐색 폭이 match_count보다 작으면 결과가 모자랄 수 있으므로 최소값 보장
+    perform set_config('hnsw.ef_search', greatest(ef_search, match_count)::text, true);
+
+    if filter_category is null and filter_document_ids is null and filter_metadata is null then
+        return query
+        select
+            chunks.id,
+            chunks.content,
+            chunks.document_id,
+            chunks.chunk_index,
+            1 - (chunks.embedding <=> query_embedding) as similarity
+        from chunks
+        where chunks.embedding is not null
+        order by chunks.embedding <=> query_embedding
+        limit match_count;
+    else
+        -- 필터에 해당하는 청크만 먼저 추려서 정확히 계산
+        -- (HNSW 결과를 나중에 거르면 필터가 좁을 때 결과가 모자람)
+        return query
+        with candidates as materialized (
+            select
+                chunks.id,
+                chunks.content,
+                chunks.document_id,
+                chunks.chunk_index,
+                chunks.embedding
+            from chunks
+            join documents on documents.id = chunks.document_id
+            where chunks.embedding is not null
+                and (filter_category is null or documents.category = filter_category)
+                and (filter_document_ids is null or chunks.document_id = any(filter_document_ids))
+                and (filter_metadata is null or chunks.metadata @> filter_metadata)
+        )
+        select
+            candidates.id,
+            candidates.content,
+            candidates.document_id,
+            candidates.chunk_index,
+            1 - (candidates.embedding <=> query_embedding) as similarity
+        from candidates
+        order by candidates.embedding <=> query_embedding
+        limit match_count;
+    end if;
+end;
+$$;
@@ -0,0 +1,86 @@
+-- 참조 문서 정보를 함께 반환하도록 함수 재생성 (반환 형식 변경으로 삭제 후 생성)
+drop function if exists match_chunks(vector, int, int, text, bigint[], jsonb);
+
+create or replace function match_chunks(
+    query_embedding vector(1536),
+    match_count int default 5,
+    ef_search int default 40,
+    filter_category text default null,
+    filter_document_ids bigint[] default null,
+    filter_metadata jsonb default null
+)
+returns table (
+    id bigint,
+    content text,
+    document_id bigint,
+    chunk_index integer,
+    similarity float,
+    document_title text,
+    document_category text
+)
+language plpgsql
+as $$
+begin
+    -- 현재 트랜잭션에서만 HNSW 탐색 폭 변경 (클수록 recall과 지연 시간 증가)
+    -- 탐색 폭이 match_count보다 작으면 결과가 모자랄 수 있으므로 최소값 보장
+    perform set_config('hnsw.ef_search', greatest(ef_search, match_count)::text, true);
+
+    if filter_category is null and filter_document_ids is null and filter_metadata is null then
+        return query
+        with nearest as (
+            select
+                chunks.id,
+                chunks.content,
+                chunks.document_id,
+                chunks.chunk_index,
+                1 - (chunks.embedding <=> query_embedding) as similarity
+            from chunks
+            where chunks.embedding is not null
+            order by chunks.embedding <=> query_embedding
+            limit match_count
+        )
+        select
+            nearest.id,
+            nearest.content,
+            nearest.document_id,
+            nearest.chunk_index,
+            nearest.similarity,
+            documents.title,
+            documents.category
+        from nearest
+        join documents on documents.id = nearest.document_id
+        order by nearest.similarity desc;
+    else
+        -- 필터에 해당하는 청크만 먼저 추려서 정확히 계산
+        -- (HNSW 결과를 나중에 거르면 필터가 좁을 때 결과가 모자람)
+        return query
+        with candidates as materialized (
+            select
+                chunks.id,
+                chunks.content,
+                chunks.document_id,
+                chunks.chunk_index,
+                chunks.embedding,
+                documents.title,
+                documents.category
+            from chunks
+            join documents on documents.id = chunks.document_id
+            where chunks.embedding is not null
+                and (filter_category is null or documents.category = filter_category)
+                and (filter_document_ids is null or chunks.document_id = any(filter_document_ids))
+                and (filter_metadata is null or chunks.metadata @> filter_metadata)
+        )
+        select
+            candidates.id,
+            candidates.content,
+            candidates.document_id,
+            candidates.chunk_index,
+            1 - (candidates.embedding <=> query_embedding) as similarity,
+            candidates.title,
+            candidates.category
+        from candidates
+        order by candidates.embedding <=> query_embedding
+        limit match_count;
+    end if;
+end;
+$$;
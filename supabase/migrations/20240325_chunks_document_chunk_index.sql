@@ -0,0 +1,3 @@
+-- 문서별 청크 목록의 키셋 페이지네이션용 인덱스 (document_id 단독 인덱스를 대체)
+create index if not exists chunks_document_id_chunk_index_idx on chunks (document_id, chunk_index);
+drop index if exists chunks_document_id_idx;
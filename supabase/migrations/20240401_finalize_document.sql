@@ -0,0 +1,19 @@
+-- 스트리밍으로 저장한 문서의 청크 수를 한 번에 확정하는 함수
+-- (청크는 total_chunks 없이 배치로 저장되고, 마지막에 문서와 청크 메타데이터에 기록)
+create or replace function finalize_document(
+    doc_id bigint,
+    chunk_count integer
+)
+returns void
+language plpgsql
+as $$
+begin
+    update chunks
+    set metadata = coalesce(metadata, '{}'::jsonb) || jsonb_build_object('total_chunks', chunk_count)
+    where document_id = doc_id;
+
+    update documents
+    set total_chunks = chunk_count
+    where id = doc_id;
+end;
+$$;
@@ -0,0 +1,72 @@
+-- 원본 파일 해시 (같은 파일을 다시 올리면 처리를 건너뛰기 위함)
+alter table documents add column if not exists file_hash text;
+
+-- 문서와 청크를 하나의 트랜잭션으로 저장하는 함수 (file_hash 포함)
+create or replace function insert_document_with_chunks(
+    doc jsonb,
+    doc_chunks jsonb
+)
+returns bigint
+language plpgsql
+as $$
+declare
+    new_document_id bigint;
+begin
+    insert into documents (title, category, file_name, file_hash, created_at, total_chunks)
+    values (
+        doc->>'title',
+        coalesce(doc->>'category', 'general'),
+        doc->>'file_name',
+        doc->>'file_hash',
+        coalesce((doc->>'created_at')::timestamp with time zone, now()),
+        (doc->>'total_chunks')::integer
+    )
+    returning id into new_document_id;
+
+    insert into chunks (document_id, content, embedding, chunk_index, metadata)
+    select
+        new_document_id,
+        chunk->>'content',
+        (chunk->'embedding')::text::vector,
+        (chunk->>'chunk_index')::integer,
+        chunk->'metadata'
+    from jsonb_array_elements(doc_chunks) as chunk;
+
+    return new_document_id;
+end;
+$$;
+
+-- 수정된 파일로 문서를 갱신하는 함수
+-- (바뀐 청크는 미리 새 chunk_index로 저장되어 있고, 여기서 사라진 청크 삭제,
+--  유지되는 청크의 순서 변경, 청크 수/파일 정보 갱신을 한 번에 적용)
+create or replace function apply_chunk_diff(
+    doc_id bigint,
+    kept_chunks jsonb,
+    removed_ids bigint[],
+    chunk_count integer,
+    doc jsonb
+)
+returns void
+language plpgsql
+as $$
+begin
+    delete from chunks
+    where document_id = doc_id and id = any(removed_ids);
+
+    update chunks
+    set chunk_index = (kept->>'chunk_index')::integer
+    from jsonb_array_elements(kept_chunks) as kept
+    where chunks.document_id = doc_id and chunks.id = (kept->>'id')::bigint;
+
+    update chunks
+    set metadata = coalesce(metadata, '{}'::jsonb)
+        || jsonb_build_object('chunk_index', chunk_index, 'total_chunks', chunk_count)
+    where document_id = doc_id;
+
+    update documents
+    set total_chunks = chunk_count,
+        file_name = coalesce(doc->>'file_name', file_name),
+        file_hash = doc->>'file_hash'
+    where id = doc_id;
+end;
+$$;
@@ -0,0 +1,27 @@
+-- 문서/청크 변경 시각 (로컬 검색 인덱스 스냅샷을 Supabase와 맞출 때 변경분만 조회하기 위함)
+alter table documents add column if not exists updated_at timestamp with time zone not null default now();
+alter table chunks add column if not exists updated_at timestamp with time zone not null default now();
+
+create index if not exists documents_updated_at_idx on documents (updated_at);
+create index if not exists chunks_updated_at_idx on chunks (updated_at);
+
+-- 행이 수정될 때마다 updated_at 갱신
+create or replace function set_updated_at()
+returns trigger
+language plpgsql
+as $$
+begin
+    new.updated_at = now();
+    return new;
+end;
+$$;
+
+drop trigger if exists documents_set_updated_at on documents;
+create trigger documents_set_updated_at
+    before update on documents
+    for each row execute function set_updated_at();
+
+drop trigger if exists chunks_set_updated_at on chunks;
+create trigger chunks_set_updated_at
+    before update on chunks
+    for each row execute function set_updated_at();
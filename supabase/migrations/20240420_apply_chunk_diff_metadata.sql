@@ -0,0 +1,43 @@
+-- 파일 해시는 문서 행에만 저장 (이전에 청크 메타데이터로 복사된 값 제거)
+update chunks
+set metadata = metadata - 'file_hash'
+where metadata ? 'file_hash';
+
+-- 수정된 파일로 문서를 갱신하는 함수
+-- (바뀐 청크는 미리 새 chunk_index로 저장되어 있고, 여기서 사라진 청크 삭제,
+--  유지되는 청크의 순서/페이지 범위 변경, 문서 단위 청크 메타데이터와 청크 수/파일 정보 갱신을 한 번에 적용)
+create or replace function apply_chunk_diff(
+    doc_id bigint,
+    kept_chunks jsonb,
+    removed_ids bigint[],
+    chunk_count integer,
+    doc jsonb
+)
+returns void
+language plpgsql
+as $$
+begin
+    delete from chunks
+    where document_id = doc_id and id = any(removed_ids);
+
+    -- 유지되는 청크의 페이지 범위는 병합하지 않고 교체 (새 파일에 페이지가 없으면 제거)
+    update chunks
+    set chunk_index = (kept->>'chunk_index')::integer,
+        metadata = (coalesce(chunks.metadata, '{}'::jsonb) - 'page_start' - 'page_end')
+            || coalesce(kept->'metadata', '{}'::jsonb)
+    from jsonb_array_elements(kept_chunks) as kept
+    where chunks.document_id = doc_id and chunks.id = (kept->>'id')::bigint;
+
+    update chunks
+    set metadata = coalesce(metadata, '{}'::jsonb)
+        || coalesce(doc->'chunk_metadata', '{}'::jsonb)
+        || jsonb_build_object('chunk_index', chunk_index, 'total_chunks', chunk_count)
+    where document_id = doc_id;
+
+    update documents
+    set total_chunks = chunk_count,
+        file_name = coalesce(doc->>'file_name', file_name),
+        file_hash = doc->>'file_hash'
+    where id = doc_id;
+end;
+$$;
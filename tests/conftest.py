@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 소스 모듈은 src 디렉토리에서 바로 import (streamlit 실행과 같은 방식)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
@@ -0,0 +1,91 @@
+from types import SimpleNamespace
+from typing import Any, Dict, List
+from db import VectorStore
+from DocumentLoader import DocumentLoader
+from qa import QASystem
+
+class FakeQuery:
+    def __init__(self, client: "FakeSupabase", table: str):
+        self.client = client
+        self.table = table
+        self.rows: List[Dict[str, Any]] = []
+
+    def insert(self, rows):
+        self.rows = rows if isinstance(rows, list) else [rows]
+        return self
+
+    def execute(self):
+        data = []
+        for row in self.rows:
+            self.client.next_id += 1
+            stored = {"id": self.client.next_id, **row}
+            self.client.tables.setdefault(self.table, []).append(stored)
+            data.append(stored)
+        return SimpleNamespace(data=data)
+
+class FakeSupabase:
+    """insert와 rpc 호출만 기록하는 Supabase 클라이언트"""
+    def __init__(self):
+        self.tables: Dict[str, List[Dict[str, Any]]] = {}
+        self.rpcs: List[tuple] = []
+        self.next_id = 0
+
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery(self, name)
+
+    def rpc(self, name: str, params: Dict[str, Any]):
+        self.rpcs.append((name, params))
+        return SimpleNamespace(execute=lambda: SimpleNamespace(data=1))
+
+def make_qa_system() -> QASystem:
+    vector_store = VectorStore.__new__(VectorStore)
+    vector_store.supabase = FakeSupabase()
+    vector_store.chunk_batch_size = 100
+    vector_store.chunk_batch_bytes = 4 * 1024 * 1024
+
+    qa_system = QASystem.__new__(QASystem)
+    qa_system.vector_store = vector_store
+    qa_system.ingest_batch_size = 2
+    qa_system.use_local_index = False
+    qa_system._create_embeddings = lambda texts: [[float(len(text)), 1.0] for text in texts]
+    return qa_system
+
+def pdf_chunks() -> List[Dict[str, Any]]:
+    """페이지 번호가 있는 문서의 청크 (PDF 추출 결과와 같은 형식)"""
+    loader = DocumentLoader(chunk_size=60, chunk_overlap=0)
+    pages = [(f"Page {page} sentence one. Page {page} sentence two.", page) for page in range(1, 6)]
+    chunks = list(loader._iter_document_chunks(pages, {"category": "general", "file_type": "pdf"}))
+    assert all("page_start" in chunk["metadata"] for chunk in chunks)
+    return chunks
+
+DOCUMENT_METADATA = {"title": "문서", "category": "work", "original_filename": "doc.pdf", "file_hash": "abc"}
+
+def test_add_document_stream_stores_page_ranges():
+    qa_system = make_qa_system()
+    chunks = pdf_chunks()
+    qa_system.add_document_stream(iter(chunks), metadata=DOCUMENT_METADATA)
+
+    stored = qa_system.vector_store.supabase.tables["chunks"]
+    assert len(stored) == len(chunks)
+    for row, chunk in zip(stored, chunks):
+        assert row["metadata"]["page_start"] == chunk["metadata"]["page_start"]
+        assert row["metadata"]["page_end"] == chunk["metadata"]["page_end"]
+        assert row["metadata"]["file_type"] == "pdf"
+        # 문서 메타데이터가 청크 메타데이터보다 우선
+        assert row["metadata"]["category"] == "work"
+        assert row["metadata"]["chunk_index"] == row["chunk_index"]
+        # 파일 해시는 문서 행에만 저장
+        assert "file_hash" not in row["metadata"]
+
+def test_add_documents_stores_page_ranges():
+    qa_system = make_qa_system()
+    chunks = pdf_chunks()
+    qa_system.add_documents(chunks, metadata=DOCUMENT_METADATA)
+
+    name, params = qa_system.vector_store.supabase.rpcs[0]
+    assert name == "insert_document_with_chunks"
+    for row, chunk in zip(params["doc_chunks"], chunks):
+        assert (row["metadata"]["page_start"], row["metadata"]["page_end"]) == (
+            chunk["metadata"]["page_start"], chunk["metadata"]["page_end"]
+        )
+        assert row["metadata"]["total_chunks"] == len(chunks)
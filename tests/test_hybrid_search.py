@@ -0,0 +1,37 @@
+import numpy as np
+from hybrid_search import HybridSearch
+
+def test_results_include_cosine_similarity():
+    rng = np.random.default_rng(0)
+    embeddings = rng.normal(size=(50, 8))
+    search = HybridSearch(ann_threshold=10, vector_candidates=20, bm25_candidates=20, nprobe=2)
+    search.add_documents([f"doc {i} word{i % 5}" for i in range(50)], embeddings.tolist())
+    query = rng.normal(size=8)
+    normalized = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    cosine = normalized @ (query / np.linalg.norm(query))
+
+    # 전체 계산과 IVF 후보 재정렬 모두 코사인 유사도를 함께 반환
+    for threshold in (1_000, 10):
+        search.ann_threshold = threshold
+        results = search.search("word3", query.tolist(), top_k=5)
+        assert results
+        for result in results:
+            assert np.isclose(result["vector_similarity"], cosine[result["id"]], atol=1e-5)
+        assert results[0]["similarity"] >= results[-1]["similarity"]
+
+def test_ann_index_is_trained_on_add_not_on_search():
+    rng = np.random.default_rng(1)
+    search = HybridSearch(ann_threshold=10, nprobe=2)
+    search.add_documents([f"doc {i}" for i in range(8)], rng.normal(size=(8, 4)).tolist())
+    assert search.ivf is None
+
+    # 임계값을 넘기는 추가 시점에 학습하고, 검색은 학습된 인덱스를 그대로 사용
+    search.add_documents([f"doc {i}" for i in range(8, 20)], rng.normal(size=(12, 4)).tolist())
+    ivf = search.ivf
+    assert ivf is not None and ivf.trained_rows == 20
+    search.search("doc", rng.normal(size=4).tolist(), top_k=3)
+    assert search.ivf is ivf
+
+    # 학습 이후 4배 넘게 늘면 다시 학습
+    search.add_documents([f"doc {i}" for i in range(20, 90)], rng.normal(size=(70, 4)).tolist())
+    assert search.ivf is not ivf and search.ivf.trained_rows == 90
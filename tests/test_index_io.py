@@ -0,0 +1,35 @@
+import pytest
+from hybrid_search import HybridSearch
+from index_io import current_snapshot, publish_snapshot
+
+def make_search(count: int) -> HybridSearch:
+    search = HybridSearch()
+    search.add_documents([f"doc {i}" for i in range(count)], [[float(i), 1.0] for i in range(count)])
+    return search
+
+def test_publish_snapshot_swaps_current(tmp_path):
+    assert current_snapshot(str(tmp_path)) is None
+    first = publish_snapshot(str(tmp_path), lambda path: make_search(3).save(str(path)))
+    second = publish_snapshot(str(tmp_path), lambda path: make_search(5).save(str(path)))
+    assert first != second
+    assert current_snapshot(str(tmp_path)) == second
+    assert len(HybridSearch.load(str(second)).documents) == 5
+
+def test_failed_publish_keeps_previous_snapshot(tmp_path):
+    published = publish_snapshot(str(tmp_path), lambda path: make_search(3).save(str(path)))
+
+    def broken(path):
+        make_search(5).save(str(path))
+        raise RuntimeError("disk full")
+
+    with pytest.raises(RuntimeError):
+        publish_snapshot(str(tmp_path), broken)
+    assert current_snapshot(str(tmp_path)) == published
+    assert [entry.name for entry in tmp_path.iterdir() if entry.is_dir()] == [published.name]
+
+def test_old_snapshots_are_pruned(tmp_path):
+    for count in range(4):
+        publish_snapshot(str(tmp_path), lambda path, count=count: make_search(count + 1).save(str(path)), min_age=0)
+    snapshots = sorted(entry.name for entry in tmp_path.iterdir() if entry.is_dir())
+    assert len(snapshots) == 2
+    assert snapshots[-1] == current_snapshot(str(tmp_path)).name
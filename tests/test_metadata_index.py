@@ -0,0 +1,37 @@
+import numpy as np
+from hybrid_search import HybridSearch
+from metadata_index import MetadataIndex
+
+def make_search() -> HybridSearch:
+    search = HybridSearch()
+    search.add_documents(
+        ["apple banana", "banana cherry", "cherry apple"],
+        [[1.0, 0.0], [0.0, 1.0], [1.0, 1.0]],
+        [{"category": "a"}, {"category": "b"}, {"category": "a"}],
+        ids=[10, 11, 12],
+    )
+    return search
+
+def test_lookup_empty_filter_is_no_filter():
+    index = MetadataIndex()
+    index.add(0, {"category": "a"})
+    assert index.lookup({}) is None
+
+def test_lookup_filter():
+    index = MetadataIndex()
+    index.add(0, {"category": "a"})
+    index.add(1, {"category": "b"})
+    index.add(2, {"category": "a"})
+    assert np.array_equal(index.lookup({"metadata.category": "a"}), [0, 2])
+    assert np.array_equal(index.lookup({"metadata.category": {"$in": ["a", "b"]}}), [0, 1, 2])
+
+def test_find_ids_empty_filter_returns_all_alive():
+    search = make_search()
+    search.remove_documents([11], compact=False)
+    assert search.find_ids({}) == [10, 12]
+    assert search.find_ids({"metadata.category": "a"}) == [10, 12]
+
+def test_search_empty_filter_searches_all():
+    search = make_search()
+    results = search.search("banana", [0.0, 1.0], filter={}, top_k=3)
+    assert sorted(result["id"] for result in results) == [10, 11, 12]
@@ -0,0 +1,21 @@
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from hybrid_search import HybridSearch
+from sharded_search import ShardedHybridSearch
+
+def test_concurrent_searches_match_single_index():
+    rng = np.random.default_rng(0)
+    texts = [f"doc{i} word{i % 7} term{i % 3}" for i in range(200)]
+    embeddings = rng.normal(size=(200, 8)).tolist()
+    queries = [(f"word{i % 7} term{i % 3}", rng.normal(size=8).tolist()) for i in range(40)]
+
+    single = HybridSearch()
+    single.add_documents(texts, embeddings)
+    expected = [[r["id"] for r in single.search(q, e, top_k=5)] for q, e in queries]
+
+    # 여러 스레드가 동시에 검색해도 score -> select 단계가 섞이지 않아야 함
+    with ShardedHybridSearch(num_shards=3) as sharded:
+        sharded.add_documents(texts, embeddings)
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(lambda query: sharded.search(*query, top_k=5), queries))
+    assert [[r["id"] for r in result] for result in results] == expected
@@ -0,0 +1,170 @@
+from typing import Any, Dict, List, Optional
+import pytest
+from DocumentLoader import DocumentLoader
+from qa import QASystem
+
+class FakeVectorStore:
+    """update_document_from_file이 쓰는 VectorStore 메서드만 메모리에서 흉내"""
+    def __init__(self):
+        self.documents: Dict[int, Dict[str, Any]] = {}
+        self.chunks: Dict[int, Dict[str, Any]] = {}
+        self.next_id = 0
+        self.fail_apply = False
+
+    def get_document(self, doc_id: int) -> Optional[Dict[str, Any]]:
+        return dict(self.documents[doc_id]) if doc_id in self.documents else None
+
+    def list_document_chunks(self, doc_id, columns="", limit=None, after_index=None) -> List[Dict[str, Any]]:
+        rows = sorted(
+            (chunk for chunk in self.chunks.values()
+             if chunk["document_id"] == doc_id and (after_index is None or chunk["chunk_index"] > after_index)),
+            key=lambda chunk: chunk["chunk_index"],
+        )
+        return [dict(row) for row in rows[:limit]]
+
+    def add_chunks(self, doc_id, chunks, metadata, start_index=0, chunk_indexes=None) -> List[Dict[str, Any]]:
+        saved = []
+        for chunk, chunk_index in zip(chunks, chunk_indexes):
+            self.next_id += 1
+            self.chunks[self.next_id] = {
+                "id": self.next_id, "document_id": doc_id, "content": chunk["content"],
+                "embedding": chunk["embedding"], "chunk_index": chunk_index,
+                "metadata": {**chunk.get("metadata", {}), **metadata, "chunk_index": chunk_index},
+            }
+            saved.append({"id": self.next_id, "chunk_index": chunk_index})
+        return saved
+
+    def apply_chunk_diff(self, doc_id, kept_chunks, removed_ids, total_chunks, updates) -> None:
+        if self.fail_apply:
+            raise RuntimeError("rpc failed")
+        for chunk_id in removed_ids:
+            del self.chunks[chunk_id]
+        for kept in kept_chunks:
+            chunk = self.chunks[kept["id"]]
+            chunk["chunk_index"] = kept["chunk_index"]
+            for key in ("page_start", "page_end"):
+                chunk["metadata"].pop(key, None)
+            chunk["metadata"].update(kept.get("metadata", {}))
+        for chunk in self.chunks.values():
+            if chunk["document_id"] == doc_id:
+                chunk["metadata"].update(updates.get("chunk_metadata", {}))
+                chunk["metadata"].update(chunk_index=chunk["chunk_index"], total_chunks=total_chunks)
+        self.documents[doc_id].update(
+            total_chunks=total_chunks, file_hash=updates["file_hash"],
+            file_name=updates.get("file_name") or self.documents[doc_id]["file_name"],
+        )
+
+    def delete_chunks(self, chunk_ids) -> None:
+        for chunk_id in chunk_ids:
+            del self.chunks[chunk_id]
+
+@pytest.fixture
+def qa_system():
+    qa_system = QASystem.__new__(QASystem)
+    qa_system.vector_store = FakeVectorStore()
+    qa_system.vector_store.documents[1] = {
+        "id": 1, "title": "문서", "category": "general", "created_at": "2024-04-01T00:00:00",
+        "file_name": "doc.txt", "file_hash": None, "total_chunks": 0,
+    }
+    qa_system.ingest_batch_size = 2
+    qa_system.use_local_index = False
+    qa_system.embedded: List[str] = []
+
+    def create_embeddings(texts):
+        qa_system.embedded.extend(texts)
+        return [[float(len(text)), 1.0] for text in texts]
+
+    qa_system._create_embeddings = create_embeddings
+    return qa_system
+
+LOADER = DocumentLoader(chunk_size=40, chunk_overlap=0)
+SENTENCES = [f"Sentence number {i} here." for i in range(10)]
+
+def write(tmp_path, sentences) -> str:
+    path = tmp_path / "doc.txt"
+    path.write_text("\n".join(sentences), encoding="utf-8")
+    return str(path)
+
+def stored(qa_system) -> List[Dict[str, Any]]:
+    return sorted(qa_system.vector_store.chunks.values(), key=lambda chunk: chunk["chunk_index"])
+
+def test_only_changed_chunks_are_embedded(qa_system, tmp_path):
+    qa_system.update_document_from_file(1, write(tmp_path, SENTENCES), loader=LOADER)
+    ids_by_content = {chunk["content"]: chunk["id"] for chunk in stored(qa_system)}
+
+    qa_system.embedded.clear()
+    revised = SENTENCES[:3] + ["A brand new sentence."] + SENTENCES[3:7] + SENTENCES[8:]
+    path = write(tmp_path, revised)
+    result = qa_system.update_document_from_file(1, path, loader=LOADER)
+
+    assert result == {"unchanged": False, "kept": 9, "added": 1, "removed": 1}
+    assert qa_system.embedded == ["A brand new sentence"]
+    chunks = stored(qa_system)
+    assert [chunk["content"] for chunk in chunks] == [chunk["content"] for chunk in LOADER.iter_chunks(path)]
+    assert [chunk["chunk_index"] for chunk in chunks] == list(range(len(chunks)))
+    assert all(ids_by_content.get(chunk["content"], chunk["id"]) == chunk["id"] for chunk in chunks)
+
+    assert qa_system.update_document_from_file(1, path, loader=LOADER)["unchanged"]
+
+def test_failed_update_removes_inserted_chunks(qa_system, tmp_path):
+    qa_system.update_document_from_file(1, write(tmp_path, SENTENCES), loader=LOADER)
+    before = {chunk_id: dict(chunk) for chunk_id, chunk in qa_system.vector_store.chunks.items()}
+
+    # 새 청크가 기존 청크와 같은 chunk_index로 저장된 상태에서 실패
+    qa_system.vector_store.fail_apply = True
+    revised = [f"Changed sentence {i}." for i in range(5)] + SENTENCES
+    with pytest.raises(RuntimeError):
+        qa_system.update_document_from_file(1, write(tmp_path, revised), loader=LOADER)
+
+    assert qa_system.vector_store.chunks == before
+
+def test_kept_chunks_get_new_page_ranges_and_file_name(qa_system, tmp_path):
+    pages = [(f"Page {page} sentence one. Page {page} sentence two.", page) for page in range(1, 4)]
+    chunks = list(LOADER._iter_document_chunks(pages, {"file_type": "pdf"}))
+    shifted = [("Intro only.", 1)] + [(text, page + 1) for text, page in pages]
+    shifted_chunks = list(LOADER._iter_document_chunks(shifted, {"file_type": "pdf"}))
+
+    loads = iter([chunks, shifted_chunks])
+    loader = type("Loader", (), {"iter_chunks": lambda self, path, category: iter(next(loads))})()
+    path = tmp_path / "doc.pdf"
+    path.write_bytes(b"v1")
+    qa_system.update_document_from_file(1, str(path), file_name="v1.pdf", loader=loader)
+    path.write_bytes(b"v2")
+    qa_system.update_document_from_file(1, str(path), file_name="v2.pdf", loader=loader)
+
+    for row, chunk in zip(stored(qa_system), shifted_chunks):
+        assert row["content"] == chunk["content"]
+        assert (row["metadata"]["page_start"], row["metadata"]["page_end"]) == (
+            chunk["metadata"]["page_start"], chunk["metadata"]["page_end"]
+        )
+        assert row["metadata"]["original_filename"] == "v2.pdf"
+        assert "file_hash" not in row["metadata"]
+
+def test_kept_chunks_drop_page_ranges_when_file_has_none(qa_system, tmp_path):
+    pages = [(f"Page {page} sentence one. Page {page} sentence two.", page) for page in range(1, 4)]
+    pdf_chunks = list(LOADER._iter_document_chunks(pages, {"file_type": "pdf"}))
+    txt_chunks = [{"content": chunk["content"], "metadata": {"file_type": "txt"}} for chunk in pdf_chunks]
+
+    # PDF를 같은 내용의 TXT로 바꾸면 유지되는 청크에서도 페이지 범위가 사라져야 함
+    loads = iter([pdf_chunks, txt_chunks])
+    loader = type("Loader", (), {"iter_chunks": lambda self, path, category: iter(next(loads))})()
+    path = tmp_path / "doc"
+    path.write_bytes(b"v1")
+    qa_system.update_document_from_file(1, str(path), loader=loader)
+    path.write_bytes(b"v2")
+    result = qa_system.update_document_from_file(1, str(path), loader=loader)
+
+    assert result["kept"] == len(txt_chunks) and result["added"] == 0
+    for row in stored(qa_system):
+        assert "page_start" not in row["metadata"] and "page_end" not in row["metadata"]
+
+def test_unchanged_file_still_updates_file_name(qa_system, tmp_path):
+    path = write(tmp_path, SENTENCES)
+    qa_system.update_document_from_file(1, path, file_name="v1.txt", loader=LOADER)
+
+    qa_system.embedded.clear()
+    result = qa_system.update_document_from_file(1, path, file_name="v2.txt", loader=LOADER)
+
+    assert result["unchanged"] and qa_system.embedded == []
+    assert qa_system.vector_store.documents[1]["file_name"] == "v2.txt"
+    assert all(row["metadata"]["original_filename"] == "v2.txt" for row in stored(qa_system))